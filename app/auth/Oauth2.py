@@ -1,13 +1,15 @@
 from sqlalchemy import select
 from ..config import settings
 from datetime import datetime,timedelta
+from time import perf_counter
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from ..models import User, UserRole
+from ..models import User, Umbrella, UserRole
 from ..database import get_db
-from sqlalchemy.orm import selectinload
 from .schema import TokenData
+from .cache import Principal, principal_cache
+from ..metrics.instruments import jwt_decode_duration
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
@@ -30,7 +32,8 @@ def create_access_token(data: dict):
     return encoded_jwt
 
 # Verify Access Token
-async def verify_access_token(token: str, credentials_exception, db: AsyncSession):
+async def verify_access_token(token: str, credentials_exception, db: AsyncSession) -> Principal:
+    start = perf_counter()
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
@@ -39,20 +42,36 @@ async def verify_access_token(token: str, credentials_exception, db: AsyncSessio
         token_data = TokenData(email=email)
     except JWTError:
         raise credentials_exception
+    finally:
+        jwt_decode_duration.observe(perf_counter() - start)
 
-    # result = await db.execute(select(User).where(User.email == token_data.email))
+    # A valid signature is enough when the principal is already cached
+    principal = principal_cache.get(token_data.email)
+    if principal is not None:
+        return principal
+
+    # Load only the columns authorization needs, umbrella included, in one round trip
     result = await db.execute(
-        select(User)
-        .options(selectinload(User.umbrella))
+        select(User.id, User.email, User.role, User.is_approved, Umbrella.id)
+        .outerjoin(Umbrella, Umbrella.admin_id == User.id)
         .where(User.email == token_data.email)
     )
-    user = result.scalar_one_or_none()
-    if user is None:
+    row = result.first()
+    if row is None:
         raise credentials_exception
-    return user
+
+    principal = Principal(
+        id=row[0],
+        email=row[1],
+        role=row[2],
+        is_approved=bool(row[3]),
+        umbrella_id=row[4]
+    )
+    principal_cache.set(token_data.email, principal)
+    return principal
 
 # Get Current User
-async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail='Could not validate credentials!',
@@ -62,30 +81,18 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
     user = await verify_access_token(token, credentials_exception, db)
     return user
 
-# Get Current Admin with Eager Loading of Relationships
-async def get_current_admin( current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+# Get Current Admin, reusing the principal loaded by get_current_user
+async def get_current_admin(current_user: Principal = Depends(get_current_user)) -> Principal:
     # Check if the user has admin privileges
     if current_user.role != UserRole.ADMIN or not current_user.is_approved:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Admin privileges required"
         )
-
-    # Re-query the user to eagerly load relationships (e.g., umbrella)
-    result = await db.execute(
-        select(User).options(selectinload(User.umbrella))  # Eagerly load the umbrella relationship
-        .where(User.id == current_user.id)
-    )
-    admin = result.scalar_one_or_none()
-    if admin is None:
-        raise HTTPException(status_code=404, detail="Admin not found")
-    return admin
+    return current_user
 
 # Get Current Superuser
-async def get_current_superuser(current_user: User = Depends(get_current_user)):
+async def get_current_superuser(current_user: Principal = Depends(get_current_user)) -> Principal:
     if current_user.role != UserRole.SUPERUSER:
         raise HTTPException(status_code=403, detail="Superuser privileges required")
     return current_user
-
-
-
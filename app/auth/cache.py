@@ -0,0 +1,64 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from time import monotonic
+from ..config import settings
+from ..models import UserRole
+
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """
+    The authenticated caller, as needed by authorization checks.
+    Immutable so one instance can be shared between concurrent requests.
+    """
+    id: int
+    email: str
+    role: UserRole
+    is_approved: bool
+    umbrella_id: int | None
+
+
+class PrincipalCache:
+    """In-process LRU cache of principals keyed by the token subject, with a TTL per entry."""
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, Principal]] = OrderedDict()
+
+    def get(self, sub: str) -> Principal | None:
+        entry = self._entries.get(sub)
+        if entry is None:
+            return None
+        expires_at, principal = entry
+        if expires_at < monotonic():
+            del self._entries[sub]
+            return None
+        self._entries.move_to_end(sub)
+        return principal
+
+    def set(self, sub: str, principal: Principal):
+        if self.ttl_seconds <= 0 or self.max_size <= 0:
+            return
+        self._entries[sub] = (monotonic() + self.ttl_seconds, principal)
+        self._entries.move_to_end(sub)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, sub: str):
+        self._entries.pop(sub, None)
+
+    def invalidate_user(self, user_id: int):
+        """Drop every cached principal for a user, e.g. after approval or umbrella changes."""
+        for sub, (_, principal) in list(self._entries.items()):
+            if principal.id == user_id:
+                del self._entries[sub]
+
+    def clear(self):
+        self._entries.clear()
+
+
+principal_cache = PrincipalCache(
+    max_size=settings.principal_cache_max_size,
+    ttl_seconds=settings.principal_cache_ttl_seconds
+)
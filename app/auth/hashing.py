@@ -0,0 +1,108 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from time import perf_counter
+from fastapi import HTTPException, status
+from ..config import settings
+from ..utils import pwd_context
+from ..metrics.instruments import password_hash_duration, password_hash_rejected
+
+
+# Module-level so they can be pickled into a process pool
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+def _verify_and_update(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a worker pool so hashing never blocks the event loop.
+    At most `max_pending` operations may be queued or running; beyond that
+    callers get a 429 instead of piling up behind the pool.
+    """
+
+    def __init__(self, pool: str, workers: int, max_pending: int):
+        if pool not in ("thread", "process"):
+            raise ValueError(f"Unknown password hash pool: {pool}")
+        self.pool = pool
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: Executor | None = None
+
+        # Metrics
+        self.pending = 0
+        self.rejected = 0
+        self.operations = {"hash": 0, "verify": 0}
+        self.seconds_total = {"hash": 0.0, "verify": 0.0}
+        self.seconds_max = {"hash": 0.0, "verify": 0.0}
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.pool == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def _run(self, operation: str, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            password_hash_rejected.inc()
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many authentication requests, try again shortly",
+                headers={"Retry-After": "1"}
+            )
+
+        self.pending += 1
+        start = perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self.pending -= 1
+            elapsed = perf_counter() - start
+            self.operations[operation] += 1
+            self.seconds_total[operation] += elapsed
+            self.seconds_max[operation] = max(self.seconds_max[operation], elapsed)
+            password_hash_duration.observe(elapsed, operation)
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", _hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+        """
+        Verify a password. Returns (valid, new_hash), where new_hash is set when
+        the stored hash uses outdated parameters and should be replaced.
+        """
+        return await self._run("verify", _verify_and_update, plain_password, hashed_password)
+
+    def stats(self) -> dict:
+        return {
+            "pool": self.pool,
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "in_flight": min(self.pending, self.workers),
+            "queue_depth": max(0, self.pending - self.workers),
+            "rejected": self.rejected,
+            "operations": {
+                operation: {
+                    "count": count,
+                    "avg_seconds": self.seconds_total[operation] / count if count else 0.0,
+                    "max_seconds": self.seconds_max[operation],
+                }
+                for operation, count in self.operations.items()
+            },
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    pool=settings.password_hash_pool,
+    workers=settings.password_hash_workers,
+    max_pending=settings.password_hash_max_pending
+)
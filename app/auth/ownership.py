@@ -0,0 +1,45 @@
+from sqlalchemy import select, exists
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models import Block, MemberBlockAssociation
+from ..umbrellas.hierarchy import hierarchy_index
+
+
+# Ownership checks shared by the routers. Block and zone checks are answered
+# from the umbrella hierarchy, cached for reads and read afresh (`fresh=True`)
+# for writes; member checks use a single indexed EXISTS query, so callers
+# never load related rows just to authorize a request.
+
+async def block_in_umbrella(db: AsyncSession, block_id: int, umbrella_id: int | None, fresh: bool = False) -> bool:
+    if umbrella_id is None:
+        return False
+    hierarchy = await hierarchy_index.get(db, umbrella_id, fresh=fresh)
+    return block_id in hierarchy.block_ids
+
+
+async def zone_in_umbrella(db: AsyncSession, zone_id: int, umbrella_id: int | None, fresh: bool = False) -> bool:
+    if umbrella_id is None:
+        return False
+    hierarchy = await hierarchy_index.get(db, umbrella_id, fresh=fresh)
+    return zone_id in hierarchy.zone_blocks
+
+
+async def member_in_umbrella(db: AsyncSession, member_id: int, umbrella_id: int | None) -> bool:
+    """True if at least one of the member's block associations is in the umbrella."""
+    if umbrella_id is None:
+        return False
+    result = await db.execute(
+        select(exists().where(
+            MemberBlockAssociation.member_id == member_id,
+            MemberBlockAssociation.block_id == Block.id,
+            Block.parent_umbrella_id == umbrella_id
+        ))
+    )
+    return result.scalar()
+
+
+async def umbrella_block_ids(db: AsyncSession, umbrella_id: int | None, fresh: bool = False) -> frozenset[int]:
+    """Ids of all blocks in an umbrella, as a set for O(1) membership checks."""
+    if umbrella_id is None:
+        return frozenset()
+    hierarchy = await hierarchy_index.get(db, umbrella_id, fresh=fresh)
+    return hierarchy.block_ids
@@ -4,7 +4,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from ..database import get_db
 from ..models import User, UserRole
 from.schema import Token, AdminCreate, AdminResponse
-from ..utils import hash_password, verify_password
+from .hashing import password_hasher
 from sqlalchemy import select
 from .Oauth2 import create_access_token
 
@@ -24,7 +24,7 @@ async def register_admin(
     if existing_email.scalar_one_or_none():
         raise HTTPException(status_code=400, detail="Email already exists")
 
-    hashed_password = hash_password(admin.password)
+    hashed_password = await password_hasher.hash(admin.password)
     new_admin = User(
         **admin.dict(exclude={"password"}),
         password=hashed_password,
@@ -45,8 +45,17 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(),db: AsyncSessio
     )
     user = user.scalar_one_or_none()
     
-    if not user or not verify_password(form_data.password, user.password):
+    if not user:
         raise HTTPException(status_code=400, detail="Invalid credentials")
+
+    valid, new_hash = await password_hasher.verify(form_data.password, user.password)
+    if not valid:
+        raise HTTPException(status_code=400, detail="Invalid credentials")
+
+    # Transparently upgrade hashes created with outdated cost parameters
+    if new_hash:
+        user.password = new_hash
+        await db.commit()
     
     # Additional check for admin approval
     if user.role == UserRole.ADMIN and not user.is_approved:
@@ -0,0 +1,84 @@
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass
+from time import monotonic
+from sqlalchemy import select
+from sqlalchemy.exc import DBAPIError
+from ..config import settings
+from ..models import Bank, SeedState
+from ..database import async_session
+
+logger = logging.getLogger("app.banks")
+
+
+@dataclass(frozen=True, slots=True)
+class BankEntry:
+    id: int
+    name: str
+    paybill_no: str
+
+
+class BankCatalogue:
+    """
+    In-memory, versioned snapshot of the banks table. The table is tiny and
+    rarely changes, so it is read once and swapped whole on refresh.
+
+    Each process compares the banks.json hash recorded in seed_state with
+    the one its snapshot was read under, at most every
+    settings.bank_catalogue_check_seconds, and reloads when a new catalogue
+    was applied.
+    """
+
+    def __init__(self):
+        self.version: str | None = None
+        self.entries: tuple[BankEntry, ...] = ()
+        self._by_id: dict[int, BankEntry] = {}
+        self._seed_hash: str | None = None
+        self._checked_at = float("-inf")
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.version}"'
+
+    def get(self, bank_id: int | None) -> BankEntry | None:
+        return self._by_id.get(bank_id)
+
+    async def refresh(self):
+        async with async_session() as db:
+            seed_hash = await db.scalar(select(SeedState.content_hash).where(SeedState.name == "banks"))
+            result = await db.execute(select(Bank.id, Bank.name, Bank.paybill_no).order_by(Bank.id))
+            entries = tuple(BankEntry(*row) for row in result)
+
+        digest = hashlib.sha256()
+        for entry in entries:
+            digest.update(f"{entry.id}\0{entry.name}\0{entry.paybill_no}\n".encode())
+
+        # Readers see either the old or the new snapshot, never a mix
+        self._by_id = {entry.id: entry for entry in entries}
+        self.entries = entries
+        self.version = digest.hexdigest()[:16]
+        self._seed_hash = seed_hash
+        self._checked_at = monotonic()
+
+    async def check(self):
+        """Refresh if another catalogue was applied since the snapshot; throttled."""
+        if monotonic() - self._checked_at < settings.bank_catalogue_check_seconds:
+            return
+        self._checked_at = monotonic()
+        async with async_session() as db:
+            seed_hash = await db.scalar(select(SeedState.content_hash).where(SeedState.name == "banks"))
+        if seed_hash != self._seed_hash:
+            await self.refresh()
+
+    async def check_periodically(self):
+        """Keep the snapshot current in processes whose reads don't check it."""
+        while True:
+            await asyncio.sleep(settings.bank_catalogue_check_seconds)
+            try:
+                await self.check()
+            except DBAPIError:
+                logger.exception("Could not check the bank catalogue")
+
+
+bank_catalogue = BankCatalogue()
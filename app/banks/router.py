@@ -0,0 +1,63 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from ..auth.Oauth2 import get_current_user, get_current_superuser
+from ..auth.cache import Principal
+from .catalogue import bank_catalogue
+from .schema import BankResponse, CatalogueVersion
+
+
+router = APIRouter(prefix="/banks", tags=["Banks"])
+
+# Clients may cache responses but must revalidate them with If-None-Match
+CACHE_CONTROL = "private, no-cache"
+
+
+def _not_modified(request: Request) -> bool:
+    return request.headers.get("if-none-match") == bank_catalogue.etag
+
+
+@router.get("/", response_model=list[BankResponse])
+async def get_all_banks(
+    request: Request,
+    response: Response,
+    current_user: Principal = Depends(get_current_user)
+):
+    await bank_catalogue.check()
+    if _not_modified(request):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": bank_catalogue.etag})
+
+    response.headers["ETag"] = bank_catalogue.etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return bank_catalogue.entries
+
+
+@router.get("/{bank_id}", response_model=BankResponse)
+async def get_bank_by_id(
+    bank_id: int,
+    request: Request,
+    response: Response,
+    current_user: Principal = Depends(get_current_user)
+):
+    await bank_catalogue.check()
+    bank = bank_catalogue.get(bank_id)
+    if not bank:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Bank not found"
+        )
+
+    if _not_modified(request):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": bank_catalogue.etag})
+
+    response.headers["ETag"] = bank_catalogue.etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return bank
+
+
+@router.post("/refresh", response_model=CatalogueVersion)
+async def refresh_banks(
+    superuser: Principal = Depends(get_current_superuser)
+):
+    # Reload this worker's snapshot now, e.g. after the banks table was edited
+    # by hand; other workers reload only when seed_state records a new banks.json
+    await bank_catalogue.refresh()
+    return CatalogueVersion(version=bank_catalogue.version, banks=len(bank_catalogue.entries))
@@ -0,0 +1,15 @@
+from pydantic import BaseModel
+
+
+class BankResponse(BaseModel):
+    id: int
+    name: str
+    paybill_no: str
+
+    class Config:
+        from_attributes = True
+
+
+class CatalogueVersion(BaseModel):
+    version: str
+    banks: int
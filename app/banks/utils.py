@@ -1,49 +1,57 @@
+import hashlib
 import json
-from sqlalchemy.future import select
-from ..models import Bank
+from pathlib import Path
+from ..models import Bank, SeedState
 from ..database import async_session
+from ..utils import upsert_insert
+
+
+BANKS_FILE = Path(__file__).with_name("banks.json")
+
 
 async def import_initial_banks():
-    """Import initial banks during app initialization."""
+    """Upsert the bank catalogue from banks.json, skipping work when the file is unchanged."""
+    content = BANKS_FILE.read_bytes()
+    content_hash = hashlib.sha256(content).hexdigest()
+
     async with async_session() as db:
-        # Check if any banks exist
-        result = await db.execute(select(Bank))
-        if result.scalars().first() is not None:
-            print("Banks already exist. Skipping initial import.")
+        applied = await db.get(SeedState, "banks")
+        if applied is not None and applied.content_hash == content_hash:
+            print("Bank catalogue is up to date. Skipping import.")
             return
 
         try:
-            with open('app/banks/banks.json', 'r') as file:
-                data = json.load(file)
-
-            # Process both banks and DTMs
-            all_entries = data.get('banks', []) + data.get('dtms', [])
-            
-            created = 0
-            updated = 0
-
-            for entry in all_entries:
-                # Check existing by paybill_no
-                result = await db.execute(
-                    select(Bank).filter_by(paybill_no=entry['paybill_no'])
-                )
-                existing = result.scalar_one_or_none()
-
-                if existing:
-                    if existing.name != entry['name']:
-                        existing.name = entry['name']
-                        updated += 1
-                else:
-                    db.add(Bank(
-                        name=entry['name'],
-                        paybill_no=entry['paybill_no']
-                    ))
-                    created += 1
+            data = json.loads(content)
+
+            # Process both banks and DTMs; the last entry wins for a repeated paybill
+            entries = {
+                entry['paybill_no']: entry['name']
+                for entry in data.get('banks', []) + data.get('dtms', [])
+            }
+            dialect_name = db.bind.dialect.name
+
+            # One INSERT ... ON CONFLICT for the whole catalogue; unchanged rows are left alone
+            stmt = upsert_insert(Bank, dialect_name).values(
+                [{"paybill_no": paybill_no, "name": name} for paybill_no, name in entries.items()]
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Bank.paybill_no],
+                set_={"name": stmt.excluded.name},
+                where=Bank.name != stmt.excluded.name
+            )
+            result = await db.execute(stmt)
+
+            stmt = upsert_insert(SeedState, dialect_name).values(name="banks", content_hash=content_hash)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[SeedState.name],
+                set_={"content_hash": stmt.excluded.content_hash, "applied_at": stmt.excluded.applied_at}
+            )
+            await db.execute(stmt)
 
             await db.commit()
-            print(f"Successfully imported {created} banks, updated {updated}")
+            print(f"Bank catalogue applied: {result.rowcount} of {len(entries)} banks created or updated")
 
         except Exception as e:
             await db.rollback()
             print(f"Error importing banks: {str(e)}")
-            raise
\ No newline at end of file
+            raise
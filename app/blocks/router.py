@@ -1,8 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from ..database import get_db
-from ..models import User, Block, UserRole
+from ..models import Block, UserRole
 from .schema import BlockResponse, BlockCreate, BlockUpdate
+from .utils import block_rows
 from ..auth.Oauth2 import get_current_admin, get_current_user
+from ..auth.cache import Principal
+from ..umbrellas.hierarchy import hierarchy_index
+from ..umbrellas.versions import conditional_get, resource_versions
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from sqlalchemy.orm import selectinload
@@ -14,9 +18,9 @@ router = APIRouter(prefix="/blocks", tags=["Blocks"])
 async def create_block(
     block: BlockCreate,
     db: AsyncSession = Depends(get_db),
-    current_admin: User = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin)
 ):
-    if not current_admin.umbrella:
+    if current_admin.umbrella_id is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Admin has no umbrella"
@@ -24,17 +28,19 @@ async def create_block(
 
     new_block = Block(
         name=block.name,
-        parent_umbrella_id=current_admin.umbrella.id
+        parent_umbrella_id=current_admin.umbrella_id
     )
     
     db.add(new_block)
     await db.commit()
     await db.refresh(new_block)
+    await hierarchy_index.invalidate(new_block.parent_umbrella_id)
+    await resource_versions.bump("blocks", new_block.parent_umbrella_id)
     
     # Re-query the block with eager loading for its 'zones' relationship.
     result = await db.execute(
         select(Block)
-        .options(selectinload(Block.zones))
+        .options(selectinload(Block.zones), selectinload(Block.parent_umbrella))
         .where(Block.id == new_block.id)
     )
     block_with_zones = result.scalar_one_or_none()
@@ -46,42 +52,45 @@ async def create_block(
 
 @router.get("/", response_model=list[BlockResponse])
 async def get_all_blocks(
+    request: Request,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
+    # Unchanged since the client's copy, or already serialized: answer from the
+    # version counters without querying the resource
+    check = await conditional_get(request, db, "blocks", current_user)
+    if check.cached is not None:
+        return check.cached
+
+    # Column projections serialized straight to JSON, skipping ORM objects and response validation
     # Superusers get all blocks
     if current_user.role == UserRole.SUPERUSER:
-        result = await db.execute(
-            select(Block)
-            .options(selectinload(Block.zones))
-            .order_by(Block.created_at)
-        )
-        return result.scalars().all()
+        return check.respond(await block_rows(db))
 
     # Admins get only blocks belonging to their umbrella
-    if not current_user.umbrella:
+    if current_user.umbrella_id is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No umbrella found for this admin"
         )
 
-    result = await db.execute(
-        select(Block)
-        .options(selectinload(Block.zones))
-        .where(Block.parent_umbrella_id == current_user.umbrella.id)
-    )
-    return result.scalars().all()
+    return check.respond(await block_rows(db, current_user.umbrella_id))
 
 
 @router.get("/{block_id}", response_model=BlockResponse)
 async def get_block_by_id(
     block_id: int,
+    request: Request,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
+    check = await conditional_get(request, db, "blocks", current_user)
+    if check.cached is not None:
+        return check.cached
+
     result = await db.execute(
         select(Block)
-        .options(selectinload(Block.zones))
+        .options(selectinload(Block.zones), selectinload(Block.parent_umbrella))
         .where(Block.id == block_id)
     )
     block = result.scalar_one_or_none()
@@ -93,13 +102,13 @@ async def get_block_by_id(
         )
 
     # Authorization: Admins can only access their own blocks
-    if current_user.role == UserRole.ADMIN and block.parent_umbrella_id != current_user.umbrella.id:
+    if current_user.role == UserRole.ADMIN and block.parent_umbrella_id != current_user.umbrella_id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to access this block"
         )
 
-    return block
+    return check.respond(BlockResponse.model_validate(block))
 
 
 
@@ -109,11 +118,11 @@ async def update_block(
     block_id: int,
     block_data: BlockUpdate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     result = await db.execute(
         select(Block)
-        .options(selectinload(Block.zones))
+        .options(selectinload(Block.zones), selectinload(Block.parent_umbrella))
         .where(Block.id == block_id)
     )
     block = result.scalar_one_or_none()
@@ -121,7 +130,7 @@ async def update_block(
     if not block:
         raise HTTPException(status_code=404, detail="Block not found")
     
-    if current_user.role == UserRole.ADMIN and current_user.id != block.parent_umbrella.admin_id:
+    if current_user.role == UserRole.ADMIN and block.parent_umbrella_id != current_user.umbrella_id:
         raise HTTPException(status_code=403, detail="Not authorized to update this block")
     
     # Check for name uniqueness
@@ -141,6 +150,7 @@ async def update_block(
         await db.rollback()
         raise HTTPException(status_code=400, detail="Database integrity error")
     
+    await resource_versions.bump("blocks", block.parent_umbrella_id)
     return block
 
 # Delete Block
@@ -148,7 +158,7 @@ async def update_block(
 async def delete_block(
     block_id: int,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     result = await db.execute(
         select(Block)
@@ -160,7 +170,7 @@ async def delete_block(
     if not block:
         raise HTTPException(status_code=404, detail="Block not found")
     
-    if current_user.role == UserRole.ADMIN and current_user.id != block.parent_umbrella.admin_id:
+    if current_user.role == UserRole.ADMIN and block.parent_umbrella_id != current_user.umbrella_id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this block")
     
     if block.zones:
@@ -173,5 +183,8 @@ async def delete_block(
     except IntegrityError:
         await db.rollback()
         raise HTTPException(status_code=400, detail="Cannot delete block due to database constraints")
+
+    await hierarchy_index.invalidate(block.parent_umbrella_id)
+    await resource_versions.bump("blocks", block.parent_umbrella_id)
     
     return {"message": "Block deleted successfully"}
\ No newline at end of file
@@ -0,0 +1,36 @@
+from collections import defaultdict
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models import Block, Umbrella, Zone
+
+
+async def block_rows(db: AsyncSession, umbrella_id: int | None = None) -> list[dict]:
+    """
+    BlockResponse-shaped dicts built from two column projections (blocks with
+    their umbrella, then zones per block) instead of ORM objects, ready to be
+    serialized as-is. `umbrella_id` limits the blocks to one umbrella.
+    """
+    blocks_stmt = (
+        select(Block.id, Block.name, Block.created_at, Umbrella.id, Umbrella.name)
+        .join(Umbrella, Umbrella.id == Block.parent_umbrella_id)
+        .order_by(Block.created_at, Block.id)
+    )
+    zones_stmt = select(Zone.parent_block_id, Zone.id, Zone.name).order_by(Zone.id)
+    if umbrella_id is not None:
+        blocks_stmt = blocks_stmt.where(Block.parent_umbrella_id == umbrella_id)
+        zones_stmt = zones_stmt.join(Block, Block.id == Zone.parent_block_id).where(Block.parent_umbrella_id == umbrella_id)
+
+    zones = defaultdict(list)
+    for block_id, zone_id, zone_name in await db.execute(zones_stmt):
+        zones[block_id].append({"id": zone_id, "name": zone_name})
+
+    return [
+        {
+            "id": block_id,
+            "name": name,
+            "parent_umbrella": {"id": umbrella_id, "name": umbrella_name},
+            "created_at": created_at,
+            "zones": zones.get(block_id, []),
+        }
+        for block_id, name, created_at, umbrella_id, umbrella_name in await db.execute(blocks_stmt)
+    ]
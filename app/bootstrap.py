@@ -0,0 +1,74 @@
+"""
+One-off schema and seed setup, run once per deploy before starting workers:
+
+    python -m app.bootstrap
+"""
+import asyncio
+import zlib
+from contextlib import asynccontextmanager
+from pathlib import Path
+from sqlalchemy import text
+from .database import Base, engine
+from .banks.utils import import_initial_banks
+from .superuser.utils import create_initial_superuser
+from .auth.hashing import password_hasher
+from .migrations import run_migrations
+
+
+# Key for pg_advisory_lock, derived from a stable name
+BOOTSTRAP_LOCK_KEY = zlib.crc32(b"tabpay.bootstrap")
+
+
+@asynccontextmanager
+async def bootstrap_lock():
+    """
+    Cross-process lock so concurrent bootstraps (e.g. several nodes deploying
+    at once) run one after another. PostgreSQL uses an advisory lock; SQLite
+    uses an exclusive file lock next to the database file.
+    """
+    if engine.dialect.name == "postgresql":
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": BOOTSTRAP_LOCK_KEY})
+            try:
+                yield
+            finally:
+                await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": BOOTSTRAP_LOCK_KEY})
+        return
+
+    import fcntl
+
+    database = engine.url.database
+    lock_path = Path(f"{database}.bootstrap.lock" if database and database != ":memory:" else ".bootstrap.lock")
+    with open(lock_path, "w") as lock_file:
+        await asyncio.to_thread(fcntl.flock, lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+async def bootstrap():
+    """Create the schema and seed data. Safe to run repeatedly."""
+    async with bootstrap_lock():
+        # Create tables, then apply changes create_all cannot make
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(run_migrations)
+
+        # Import initial data
+        await import_initial_banks()
+
+        # Create superuser
+        await create_initial_superuser()
+
+
+async def main():
+    try:
+        await bootstrap()
+    finally:
+        password_hasher.shutdown()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,3 +1,5 @@
+from datetime import date
+from pydantic import field_validator
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -8,6 +10,111 @@ class Settings(BaseSettings):
     superuser_email: str
     superuser_password: str
 
+    # Database engine. Pool sizes default to an even share of db_max_connections
+    # across the web_concurrency worker processes running on a node.
+    db_echo: bool = False
+    db_max_connections: int = 100
+    web_concurrency: int = 1
+    db_pool_size: int | None = None
+    db_max_overflow: int | None = None
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    db_statement_cache_size: int = 500  # asyncpg prepared statements per connection
+    db_query_cache_size: int = 500  # SQLAlchemy compiled statement cache
+
+    # Run `python -m app.bootstrap` from the app lifespan (single-process development only)
+    bootstrap_on_startup: bool = False
+
+    # Authenticated principals are cached in-process to skip the user lookup
+    principal_cache_ttl_seconds: int = 60
+    principal_cache_max_size: int = 10000
+
+    # Umbrella -> block -> zone index, checked against the umbrella's version on each use
+    hierarchy_cache_ttl_seconds: int = 60
+
+    # ETags of the umbrella, block and zone reads come from version counters
+    # in the database, shared by all workers; they also roll over every window.
+    # Serialized bodies are kept per ETag.
+    resource_version_window_seconds: int = 60
+    response_cache_max_entries: int = 1024  # 0 disables the response cache
+
+    # Each process reloads its bank catalogue snapshot this soon after a new
+    # banks.json is applied by `python -m app.bootstrap`
+    bank_catalogue_check_seconds: float = 60
+
+    # Phone numbers are matched without this international prefix
+    phone_country_code: str = "254"
+
+    # Dates the meeting scheduler skips: "YYYY-MM-DD", or "MM-DD" for every year
+    meeting_holidays: list[str] = []
+
+    # Rate limiting per route class (auth, bulk, read, write). Every client gets
+    # a token bucket per class: "N/second|minute|hour" allows bursts of N,
+    # refilled over the period. Clients are principals (the bearer token's
+    # subject), or IP addresses for auth and anonymous requests. Requests in
+    # flight per class are capped on each worker; beyond the cap they are
+    # shed with 503 instead of queueing.
+    rate_limit_enabled: bool = True
+    rate_limits: dict[str, str] = {"auth": "20/minute", "bulk": "6/minute", "read": "50/second", "write": "20/second"}
+    concurrency_limits: dict[str, int] = {"auth": 16, "bulk": 4, "read": 128, "write": 64}
+    rate_limit_max_clients: int = 100000  # buckets kept per worker, least recently used evicted
+    rate_limit_trust_forwarded_for: bool = False  # key IPs by X-Forwarded-For (behind a trusted proxy only)
+
+    # Background jobs, run by `python -m app.jobs.worker`. Each worker process
+    # runs up to job_concurrency jobs, with CPU-bound steps (parsing uploads)
+    # in a pool of job_process_workers processes. A running job whose worker
+    # sends no heartbeat for job_stale_seconds is requeued, up to
+    # job_max_attempts times. Export files are written to job_files_dir, which
+    # the API workers serving downloads must share with the job workers, and
+    # deleted by the job workers after job_files_retention_hours.
+    job_concurrency: int = 4
+    job_process_workers: int = 2
+    job_poll_seconds: float = 1
+    job_heartbeat_seconds: float = 10
+    job_stale_seconds: float = 60
+    job_max_attempts: int = 3
+    job_files_dir: str = "job_files"
+    job_files_retention_hours: float = 24
+
+    # Password hashing runs off the event loop in a bounded worker pool
+    bcrypt_rounds: int = 12
+    password_hash_pool: str = "thread"  # "thread" or "process"
+    password_hash_workers: int = 4
+    password_hash_max_pending: int = 64
+
+    # Per-request SQL instrumentation: a Server-Timing header on every response,
+    # slow statements logged with redacted parameters, and a warning for
+    # requests that run more statements than the budget (usually an N+1)
+    query_instrumentation: bool = True
+    slow_query_ms: float = 200
+    request_query_budget: int = 50
+
+    # Prometheus metrics at GET /metrics. With several workers, set a directory
+    # shared by them so a scrape of any worker reports the whole node. A scrape
+    # token lets Prometheus authenticate without a superuser login.
+    metrics_enabled: bool = True
+    metrics_multiproc_dir: str | None = None
+    metrics_flush_seconds: float = 5
+    metrics_token: str | None = None
+
+    @field_validator("meeting_holidays")
+    @classmethod
+    def _check_meeting_holidays(cls, values: list[str]) -> list[str]:
+        # A bad entry fails at startup rather than in every schedule request
+        for value in values:
+            parts = value.split("-")
+            try:
+                if len(parts) == 2:
+                    date(2000, int(parts[0]), int(parts[1]))  # a leap year, so 02-29 passes
+                elif len(parts) == 3:
+                    date(int(parts[0]), int(parts[1]), int(parts[2]))
+                else:
+                    raise ValueError
+            except ValueError:
+                raise ValueError(f"{value!r} is not a YYYY-MM-DD or MM-DD date") from None
+        return values
+
     class Config:
         env_file = ".env"
 
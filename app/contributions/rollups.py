@@ -0,0 +1,182 @@
+"""
+Incremental maintenance of contribution_rollups, plus a full rebuild for
+backfills:
+
+    python -m app.contributions.rollups
+"""
+import asyncio
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import select, insert, delete, func, literal_column
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import engine, async_session
+from ..models import Contribution, ContributionRollup
+from ..utils import upsert_insert
+
+
+# Rows per multi-row upsert, keeping bind parameters well under driver limits
+UPSERT_BATCH_SIZE = 1000
+
+
+def period_of(date: datetime | None) -> str:
+    """Monthly rollup period, e.g. "2025-03"."""
+    return date.strftime("%Y-%m") if date else ""
+
+
+def _rollup_keys(row: dict):
+    # Without a meeting or payer a contribution only counts towards the block
+    # grains; a 0 there would land on the block total's key
+    block_id, meeting_id, member_id = row["block_id"], row["meeting_id"], row["payer_id"]
+    period = period_of(row["date"])
+    yield (block_id, 0, 0, "")
+    if meeting_id:
+        yield (block_id, meeting_id, 0, "")
+    if member_id:
+        yield (block_id, 0, member_id, "")
+    if period:
+        yield (block_id, 0, 0, period)
+        if member_id:
+            yield (block_id, 0, member_id, period)
+
+
+async def apply_rollup_deltas(db: AsyncSession, rows: list[dict]):
+    """
+    Add newly inserted contribution rows to the rollups with multi-row
+    upserts. Runs in the caller's transaction, so totals commit or roll back
+    together with the contributions.
+    """
+    deltas = defaultdict(lambda: [0, 0])
+    for row in rows:
+        for key in _rollup_keys(row):
+            deltas[key][0] += row["amount_minor"]
+            deltas[key][1] += 1
+    await _upsert_deltas(db, deltas)
+
+
+async def move_member_rollups(db: AsyncSession, merged: dict[int, int]):
+    """
+    Fold the rollups of merged duplicate members into those of the members
+    they were merged into (`merged` maps one to the other). The caller commits.
+    """
+    if not merged:
+        return
+    result = await db.execute(
+        select(
+            ContributionRollup.block_id,
+            ContributionRollup.member_id,
+            ContributionRollup.period,
+            ContributionRollup.total_minor,
+            ContributionRollup.count
+        ).where(ContributionRollup.member_id.in_(merged))
+    )
+    deltas = defaultdict(lambda: [0, 0])
+    for block_id, member_id, period, total_minor, count in result:
+        key = (block_id, 0, merged[member_id], period)
+        deltas[key][0] += total_minor
+        deltas[key][1] += count
+    await db.execute(delete(ContributionRollup).where(ContributionRollup.member_id.in_(merged)))
+    await _upsert_deltas(db, deltas)
+
+
+async def _upsert_deltas(db: AsyncSession, deltas: dict[tuple, list[int]]):
+    if not deltas:
+        return
+
+    # Sorted so concurrent writers lock rows in the same order
+    values = [
+        {
+            "block_id": block_id,
+            "meeting_id": meeting_id,
+            "member_id": member_id,
+            "period": period,
+            "total_minor": total_minor,
+            "count": count,
+        }
+        for (block_id, meeting_id, member_id, period), (total_minor, count) in sorted(deltas.items())
+    ]
+    for start in range(0, len(values), UPSERT_BATCH_SIZE):
+        stmt = upsert_insert(ContributionRollup, db.bind.dialect.name).values(values[start:start + UPSERT_BATCH_SIZE])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[
+                ContributionRollup.block_id,
+                ContributionRollup.meeting_id,
+                ContributionRollup.member_id,
+                ContributionRollup.period
+            ],
+            set_={
+                "total_minor": ContributionRollup.total_minor + stmt.excluded.total_minor,
+                "count": ContributionRollup.count + stmt.excluded.count,
+            }
+        )
+        await db.execute(stmt)
+
+
+def _period_expression(dialect_name: str):
+    if dialect_name == "postgresql":
+        return func.to_char(Contribution.date, "YYYY-MM")
+    return func.strftime("%Y-%m", Contribution.date)
+
+
+def rebuild_statements(dialect_name: str):
+    """
+    Statements that recompute every rollup from the contributions table with
+    set-based INSERT ... SELECT. Shared by rebuild_rollups and the migrations,
+    which run them on a sync connection.
+    """
+    period = _period_expression(dialect_name)
+    meeting_id, member_id = Contribution.meeting_id, Contribution.payer_id
+    zero, blank = literal_column("0"), literal_column("''")
+
+    grains = [
+        (zero, zero, blank),
+        (zero, zero, period),
+        (meeting_id, zero, blank),
+        (zero, member_id, blank),
+        (zero, member_id, period),
+    ]
+
+    yield delete(ContributionRollup)
+    for meeting_col, member_col, period_col in grains:
+        group_by = [col for col in (meeting_col, member_col, period_col) if col is not zero and col is not blank]
+        query = (
+            select(
+                Contribution.block_id,
+                meeting_col,
+                member_col,
+                period_col,
+                func.sum(Contribution.amount_minor),
+                func.count(Contribution.id)
+            )
+            .where(Contribution.block_id.is_not(None))
+            .group_by(Contribution.block_id, *group_by)
+        )
+        # Same grains as _rollup_keys: only contributions with the key parts
+        for col in (meeting_col, member_col):
+            if col is not zero:
+                query = query.where(col.is_not(None))
+        if period_col is period:
+            query = query.where(Contribution.date.is_not(None))
+        yield insert(ContributionRollup).from_select(
+            ["block_id", "meeting_id", "member_id", "period", "total_minor", "count"],
+            query
+        )
+
+
+async def rebuild_rollups(db: AsyncSession):
+    """Recompute every rollup from the contributions table. The caller commits."""
+    for stmt in rebuild_statements(db.bind.dialect.name):
+        await db.execute(stmt)
+
+
+async def main():
+    try:
+        async with async_session() as db:
+            await rebuild_rollups(db)
+            await db.commit()
+        print("Contribution rollups rebuilt")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
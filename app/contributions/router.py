@@ -0,0 +1,239 @@
+from datetime import datetime
+from decimal import Decimal
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from ..database import get_db
+from ..models import Contribution, ContributionBatch, ContributionRollup, MemberBlockAssociation, UserRole
+from .schema import ContributionBatchCreate, ContributionBatchResponse, ContributionResponse, ContributionTotal, BlockStatement
+from .utils import record_batch, batch_summary, payload_hash, cents, to_minor_units
+from .statements import block_statement
+from ..auth.Oauth2 import get_current_admin, get_current_user
+from ..auth.cache import Principal
+from ..auth.ownership import block_in_umbrella
+from ..meetings.utils import get_meeting
+from ..banks.catalogue import bank_catalogue
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+
+router = APIRouter(prefix="/contributions", tags=["Contributions"])
+
+# Rollup periods are calendar months
+PERIOD_PATTERN = r"^\d{4}-\d{2}$"
+
+
+async def _replay(
+    db: AsyncSession,
+    idempotency_key: str,
+    meeting_id: int,
+    submitted_by: int,
+    payments_hash: str
+) -> ContributionBatchResponse | None:
+    """Summary of an earlier batch the same admin submitted with the same key, if any."""
+    result = await db.execute(
+        select(ContributionBatch).where(
+            ContributionBatch.submitted_by == submitted_by,
+            ContributionBatch.idempotency_key == idempotency_key
+        )
+    )
+    batch = result.scalar_one_or_none()
+    if batch is None:
+        return None
+    if batch.meeting_id != meeting_id:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Idempotency key was already used for another meeting"
+        )
+    # Batches recorded before payload hashes were kept cannot be compared
+    if batch.payload_hash is not None and batch.payload_hash != payments_hash:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency key reused with a different payload"
+        )
+    return await batch_summary(db, batch, replayed=True)
+
+
+@router.post("/meetings/{meeting_id}", response_model=ContributionBatchResponse, status_code=201)
+async def record_meeting_contributions(
+    meeting_id: int,
+    batch: ContributionBatchCreate,
+    idempotency_key: str = Header(..., min_length=8, max_length=128),
+    db: AsyncSession = Depends(get_db),
+    current_admin: Principal = Depends(get_current_admin)
+):
+    meeting = await get_meeting(db, meeting_id, current_admin, fresh=True)
+
+    # A retried request returns the original result instead of inserting again
+    payments_hash = payload_hash(batch.payments)
+    replay = await _replay(db, idempotency_key, meeting_id, current_admin.id, payments_hash)
+    if replay:
+        return replay
+
+    # Every payer must be a member of the meeting's block: one set-based lookup
+    payer_ids = {payment.payer_id for payment in batch.payments}
+    result = await db.execute(
+        select(MemberBlockAssociation.member_id)
+        .where(
+            MemberBlockAssociation.block_id == meeting.block_id,
+            MemberBlockAssociation.member_id.in_(payer_ids)
+        )
+    )
+    unknown_payers = payer_ids - set(result.scalars())
+    if unknown_payers:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Payers are not members of this block: {sorted(unknown_payers)}"
+        )
+
+    unknown_banks = {
+        payment.bank_id for payment in batch.payments
+        if payment.bank_id is not None and not bank_catalogue.get(payment.bank_id)
+    }
+    if unknown_banks:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Unknown banks: {sorted(unknown_banks)}"
+        )
+
+    try:
+        new_batch = await record_batch(db, meeting, idempotency_key, batch.payments, current_admin.id)
+        await db.commit()
+    except IntegrityError:
+        # A concurrent retry with the same key committed first
+        await db.rollback()
+        replay = await _replay(db, idempotency_key, meeting_id, current_admin.id, payments_hash)
+        if replay:
+            return replay
+        raise HTTPException(status_code=400, detail="Could not record contributions")
+
+    return ContributionBatchResponse(
+        batch_id=new_batch.id,
+        meeting_id=meeting_id,
+        count=len(batch.payments),
+        total_amount=cents(sum(to_minor_units(payment.amount) for payment in batch.payments))
+    )
+
+
+@router.get("/meetings/{meeting_id}", response_model=list[ContributionResponse])
+async def get_meeting_contributions(
+    meeting_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    await get_meeting(db, meeting_id, current_user)
+
+    result = await db.execute(
+        select(
+            Contribution.id,
+            Contribution.payer_id,
+            Contribution.amount_minor,
+            Contribution.date,
+            Contribution.bank_id,
+            Contribution.batch_id
+        )
+        .where(Contribution.meeting_id == meeting_id)
+        .order_by(Contribution.id)
+    )
+    return [
+        ContributionResponse(
+            id=row.id,
+            payer_id=row.payer_id,
+            amount=cents(row.amount_minor),
+            date=row.date,
+            bank_id=row.bank_id,
+            batch_id=row.batch_id
+        )
+        for row in result
+    ]
+
+
+# -------------------
+# Summaries, answered from the rollups with a single unique-key lookup
+# -------------------
+async def _rollup_total(db: AsyncSession, block_id: int, meeting_id: int = 0, member_id: int = 0, period: str = "") -> ContributionTotal:
+    result = await db.execute(
+        select(ContributionRollup.total_minor, ContributionRollup.count)
+        .where(
+            ContributionRollup.block_id == block_id,
+            ContributionRollup.meeting_id == meeting_id,
+            ContributionRollup.member_id == member_id,
+            ContributionRollup.period == period
+        )
+    )
+    total_minor, count = result.one_or_none() or (0, 0)
+    return ContributionTotal(
+        block_id=block_id,
+        meeting_id=meeting_id or None,
+        member_id=member_id or None,
+        period=period or None,
+        total=cents(total_minor),
+        count=count
+    )
+
+
+async def _authorize_block(db: AsyncSession, block_id: int, current_user: Principal):
+    if current_user.role == UserRole.ADMIN and not await block_in_umbrella(db, block_id, current_user.umbrella_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized for this block"
+        )
+
+
+@router.get("/summary/blocks/{block_id}", response_model=ContributionTotal)
+async def get_block_total(
+    block_id: int,
+    period: str | None = Query(None, pattern=PERIOD_PATTERN),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    await _authorize_block(db, block_id, current_user)
+    return await _rollup_total(db, block_id, period=period or "")
+
+
+@router.get("/summary/meetings/{meeting_id}", response_model=ContributionTotal)
+async def get_meeting_total(
+    meeting_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    meeting = await get_meeting(db, meeting_id, current_user)
+    return await _rollup_total(db, meeting.block_id, meeting_id=meeting_id)
+
+
+@router.get("/summary/members/{member_id}", response_model=ContributionTotal)
+async def get_member_total(
+    member_id: int,
+    block_id: int,
+    period: str | None = Query(None, pattern=PERIOD_PATTERN),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    await _authorize_block(db, block_id, current_user)
+    return await _rollup_total(db, block_id, member_id=member_id, period=period or "")
+
+
+# -------------------
+# Statements
+# -------------------
+@router.get("/statements/blocks/{block_id}", response_model=BlockStatement)
+async def get_block_statement(
+    block_id: int,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    dues: Decimal | None = Query(None, gt=0, max_digits=12, decimal_places=2),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Balances for every member of a block over its meetings from start
+    (inclusive) to end (exclusive). With `dues`, the amount owed per meeting,
+    each member also gets expected, arrears and balance.
+    """
+    await _authorize_block(db, block_id, current_user)
+    return await block_statement(
+        db,
+        block_id,
+        start=start,
+        end=end,
+        dues_minor=to_minor_units(dues) if dues is not None else None
+    )
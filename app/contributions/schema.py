@@ -0,0 +1,68 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+from decimal import Decimal
+
+
+class PaymentCreate(BaseModel):
+    payer_id: int
+    amount: Decimal = Field(gt=0, max_digits=12, decimal_places=2)
+    bank_id: int | None = None
+    date: datetime | None = None
+
+
+class ContributionBatchCreate(BaseModel):
+    payments: list[PaymentCreate] = Field(min_length=1, max_length=5000)
+
+
+class ContributionBatchResponse(BaseModel):
+    batch_id: int
+    meeting_id: int
+    count: int
+    total_amount: Decimal
+    replayed: bool = False
+
+
+class ContributionResponse(BaseModel):
+    id: int
+    payer_id: int
+    amount: Decimal
+    date: datetime | None
+    bank_id: int | None
+    batch_id: int | None
+
+
+class ContributionTotal(BaseModel):
+    block_id: int
+    meeting_id: int | None = None
+    member_id: int | None = None
+    period: str | None = None
+    total: Decimal
+    count: int
+
+
+class StatementMember(BaseModel):
+    member_id: int
+    full_name: str | None
+    paid: Decimal
+    meetings_paid: int
+    expected: Decimal | None = None
+    arrears: Decimal | None = None
+    balance: Decimal | None = None
+
+
+class StatementMeeting(BaseModel):
+    meeting_id: int
+    meeting_date: datetime | None
+    collected: Decimal
+    contributors: int
+    running_total: Decimal
+
+
+class BlockStatement(BaseModel):
+    block_id: int
+    start: datetime | None
+    end: datetime | None
+    dues: Decimal | None
+    total: Decimal
+    members: list[StatementMember]
+    meetings: list[StatementMeeting]
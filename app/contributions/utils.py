@@ -0,0 +1,92 @@
+import hashlib
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import select, insert, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models import Contribution, ContributionBatch, Meeting
+from .schema import PaymentCreate, ContributionBatchResponse
+from .rollups import apply_rollup_deltas
+
+
+# Rows per multi-row INSERT
+INSERT_BATCH_SIZE = 1000
+
+# Amounts are stored as integer cents
+MINOR_UNITS = 100
+
+
+def to_minor_units(amount: Decimal) -> int:
+    return int(amount * MINOR_UNITS)
+
+
+def cents(amount_minor: int | None) -> Decimal | None:
+    """Exact decimal amount for cents, e.g. 10050 -> Decimal("100.50")."""
+    return Decimal(amount_minor).scaleb(-2) if amount_minor is not None else None
+
+
+def payload_hash(payments: list[PaymentCreate]) -> str:
+    """Digest of a batch's payments, the same whatever order they are listed in."""
+    lines = sorted(
+        f"{payment.payer_id}|{to_minor_units(payment.amount)}|{payment.bank_id or ''}|"
+        f"{payment.date.isoformat() if payment.date else ''}"
+        for payment in payments
+    )
+    return hashlib.sha256("\n".join(lines).encode()).hexdigest()
+
+
+async def insert_contributions(db: AsyncSession, rows: list[dict]):
+    """
+    Write contribution rows with batched multi-row INSERTs and add them to the
+    rollups in the same transaction. The caller commits.
+    """
+    for start in range(0, len(rows), INSERT_BATCH_SIZE):
+        await db.execute(insert(Contribution), rows[start:start + INSERT_BATCH_SIZE])
+    await apply_rollup_deltas(db, rows)
+
+
+async def record_batch(
+    db: AsyncSession,
+    meeting: Meeting,
+    idempotency_key: str,
+    payments: list[PaymentCreate],
+    submitted_by: int
+) -> ContributionBatch:
+    """Record a batch and its contributions in the current transaction."""
+    batch = ContributionBatch(
+        idempotency_key=idempotency_key,
+        payload_hash=payload_hash(payments),
+        meeting_id=meeting.id,
+        submitted_by=submitted_by
+    )
+    db.add(batch)
+    await db.flush()
+
+    now = datetime.now()
+    await insert_contributions(db, [
+        {
+            "amount_minor": to_minor_units(payment.amount),
+            "date": payment.date or now,
+            "meeting_id": meeting.id,
+            "payer_id": payment.payer_id,
+            "block_id": meeting.block_id,
+            "bank_id": payment.bank_id,
+            "batch_id": batch.id,
+        }
+        for payment in payments
+    ])
+    return batch
+
+
+async def batch_summary(db: AsyncSession, batch: ContributionBatch, replayed: bool = False) -> ContributionBatchResponse:
+    result = await db.execute(
+        select(func.count(Contribution.id), func.coalesce(func.sum(Contribution.amount_minor), 0))
+        .where(Contribution.batch_id == batch.id)
+    )
+    count, total_minor = result.one()
+    return ContributionBatchResponse(
+        batch_id=batch.id,
+        meeting_id=batch.meeting_id,
+        count=count,
+        total_amount=cents(total_minor),
+        replayed=replayed
+    )
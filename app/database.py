@@ -1,10 +1,12 @@
+import asyncio
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from typing import AsyncGenerator
 from .utils import Base, async_session, SQLALCHEMY_DATABASE_URL, engine
 from fastapi import FastAPI
-from .banks.utils import import_initial_banks
 from contextlib import asynccontextmanager
-from .superuser.utils import create_initial_superuser
+from .config import settings
+from .auth.hashing import password_hasher
+from .metrics.registry import REGISTRY
 
 
 
@@ -26,17 +28,43 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
     async with async_session() as session:
         yield session
 
-# Asynchronous function to create database tables
+
+async def check_schema():
+    """Refuse to start on a database that `python -m app.bootstrap` has not brought up to date."""
+    from .migrations import pending_migrations
+    async with engine.connect() as conn:
+        pending = await conn.run_sync(pending_migrations)
+    if pending:
+        raise RuntimeError(
+            f"Database schema is out of date ({', '.join(pending)} pending), run `python -m app.bootstrap` first"
+        )
+
+# Application lifespan. Schema and seed work lives in `python -m app.bootstrap`,
+# so each worker only checks that the database is reachable and bootstrapped.
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Create tables
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    
-    # Import initial data
-    await import_initial_banks()
-
-    # Create superuser
-    await create_initial_superuser()
-    
+    if settings.bootstrap_on_startup:
+        from .bootstrap import bootstrap
+        await bootstrap()
+
+    # Readiness check
+    await check_schema()
+
+    # Bank catalogue snapshot used by member serialization and /banks
+    from .banks.catalogue import bank_catalogue
+    await bank_catalogue.refresh()
+    catalogue_task = asyncio.create_task(bank_catalogue.check_periodically())
+
+    # Multi-worker metrics: publish this worker's snapshot for the others' scrapes
+    from .metrics.exporter import snapshot_files, flush_periodically
+    flush_task = None
+    if settings.metrics_enabled and snapshot_files is not None:
+        flush_task = asyncio.create_task(flush_periodically())
+
     yield
+
+    catalogue_task.cancel()
+    if flush_task is not None:
+        flush_task.cancel()
+        await asyncio.to_thread(snapshot_files.write, REGISTRY.snapshot())
+    password_hasher.shutdown()
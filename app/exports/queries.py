@@ -0,0 +1,107 @@
+"""
+The export datasets: a column projection, its header, the transform
+applied to each row and the file name. Shared by the streaming endpoints
+and the background export job.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Sequence
+from sqlalchemy import select
+from ..models import Block, Zone, Member, MemberBlockAssociation, Contribution
+from ..banks.catalogue import bank_catalogue
+from ..contributions.utils import cents
+
+MEMBER_COLUMNS = (
+    "member_id", "full_name", "bank", "block_id", "block", "zone_id", "zone",
+    "phone_number", "id_number", "acc_number", "registered_at"
+)
+
+CONTRIBUTION_COLUMNS = (
+    "contribution_id", "date", "block_id", "meeting_id", "payer_id", "payer",
+    "amount", "bank", "batch_id"
+)
+
+
+@dataclass(frozen=True, slots=True)
+class ExportQuery:
+    stmt: object
+    header: Sequence[str]
+    transform: Callable[[Sequence], Sequence]
+    name: str
+
+
+def _bank_name(bank_id: int | None) -> str | None:
+    bank = bank_catalogue.get(bank_id)
+    return bank.name if bank else None
+
+
+def members_export(umbrella_id: int | None) -> ExportQuery:
+    """Roster of an umbrella (or of all umbrellas), one row per block membership."""
+    # Column projection only, no ORM objects are built
+    stmt = (
+        select(
+            Member.id,
+            Member.full_name,
+            Member.bank_id,
+            Block.id,
+            Block.name,
+            Zone.id,
+            Zone.name,
+            MemberBlockAssociation.phone_number,
+            MemberBlockAssociation.id_number,
+            MemberBlockAssociation.acc_number,
+            Member.registered_at
+        )
+        .join(Member, Member.id == MemberBlockAssociation.member_id)
+        .join(Block, Block.id == MemberBlockAssociation.block_id)
+        .outerjoin(Zone, Zone.id == MemberBlockAssociation.zone_id)
+        .order_by(Block.id, Member.id)
+    )
+    if umbrella_id is not None:
+        stmt = stmt.where(Block.parent_umbrella_id == umbrella_id)
+
+    def transform(row):
+        member_id, full_name, bank_id, *rest = row
+        return (member_id, full_name, _bank_name(bank_id), *rest)
+
+    name = f"members-umbrella-{umbrella_id}" if umbrella_id is not None else "members"
+    return ExportQuery(stmt, MEMBER_COLUMNS, transform, name)
+
+
+def contributions_export(
+    umbrella_id: int | None,
+    block_id: int | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None
+) -> ExportQuery:
+    """Contribution ledger of an umbrella, optionally for one block and a date range."""
+    stmt = (
+        select(
+            Contribution.id,
+            Contribution.date,
+            Contribution.block_id,
+            Contribution.meeting_id,
+            Contribution.payer_id,
+            Member.full_name,
+            Contribution.amount_minor,
+            Contribution.bank_id,
+            Contribution.batch_id
+        )
+        .outerjoin(Member, Member.id == Contribution.payer_id)
+        .order_by(Contribution.id)
+    )
+    if umbrella_id is not None:
+        stmt = stmt.join(Block, Block.id == Contribution.block_id).where(Block.parent_umbrella_id == umbrella_id)
+    if block_id is not None:
+        stmt = stmt.where(Contribution.block_id == block_id)
+    if start is not None:
+        stmt = stmt.where(Contribution.date >= start)
+    if end is not None:
+        stmt = stmt.where(Contribution.date < end)
+
+    def transform(row):
+        *head, amount_minor, bank_id, batch_id = row
+        return (*head, cents(amount_minor), _bank_name(bank_id), batch_id)
+
+    name = f"contributions-umbrella-{umbrella_id}" if umbrella_id is not None else "contributions"
+    return ExportQuery(stmt, CONTRIBUTION_COLUMNS, transform, name)
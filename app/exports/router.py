@@ -0,0 +1,101 @@
+from datetime import datetime
+from typing import Literal
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+from ..database import get_db
+from ..models import UserRole
+from .queries import ExportQuery, members_export, contributions_export
+from .utils import MEDIA_TYPES, stream_csv, stream_xlsx, xlsx_available
+from ..auth.Oauth2 import get_current_user
+from ..auth.cache import Principal
+from ..jobs.utils import EXPORT, enqueue_job, job_accepted
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+router = APIRouter(prefix="/exports", tags=["Exports"])
+
+
+def _export_umbrella(current_user: Principal, umbrella_id: int | None) -> int | None:
+    """Umbrella to export. Admins are limited to their own; superusers may pick one or export all."""
+    if current_user.role == UserRole.SUPERUSER:
+        return umbrella_id
+    if current_user.umbrella_id is None or umbrella_id not in (None, current_user.umbrella_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized for this umbrella"
+        )
+    return current_user.umbrella_id
+
+
+def _check_format(fmt: str):
+    if fmt == "xlsx" and not xlsx_available():
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="XLSX export requires openpyxl, use format=csv"
+        )
+
+
+def _export_response(query: ExportQuery, fmt: str) -> StreamingResponse:
+    if fmt == "xlsx":
+        body = stream_xlsx(query.stmt, query.header, query.transform, title=query.name)
+    else:
+        body = stream_csv(query.stmt, query.header, query.transform)
+
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{query.name}.{fmt}"'}
+    )
+
+
+@router.get("/members")
+async def export_members(
+    format: Literal["csv", "xlsx"] = "csv",
+    umbrella_id: int | None = None,
+    background: bool = False,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Roster of an umbrella, one row per block membership. With `background`,
+    the file is written by a job and downloaded from /jobs/{id}/file.
+    """
+    umbrella_id = _export_umbrella(current_user, umbrella_id)
+    _check_format(format)
+
+    if background:
+        params = {"dataset": "members", "format": format, "umbrella_id": umbrella_id}
+        return job_accepted(await enqueue_job(db, EXPORT, params, current_user, umbrella_id=umbrella_id))
+    return _export_response(members_export(umbrella_id), format)
+
+
+@router.get("/contributions")
+async def export_contributions(
+    format: Literal["csv", "xlsx"] = "csv",
+    umbrella_id: int | None = None,
+    block_id: int | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    background: bool = False,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Contribution ledger of an umbrella, optionally for one block and a date
+    range. With `background`, the file is written by a job and downloaded
+    from /jobs/{id}/file.
+    """
+    umbrella_id = _export_umbrella(current_user, umbrella_id)
+    _check_format(format)
+
+    if background:
+        params = {
+            "dataset": "contributions",
+            "format": format,
+            "umbrella_id": umbrella_id,
+            "block_id": block_id,
+            "start": start.isoformat() if start else None,
+            "end": end.isoformat() if end else None,
+        }
+        return job_accepted(await enqueue_job(db, EXPORT, params, current_user, umbrella_id=umbrella_id))
+    return _export_response(contributions_export(umbrella_id, block_id, start, end), format)
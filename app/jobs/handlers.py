@@ -0,0 +1,181 @@
+"""
+Job handlers by kind. A handler gets a JobContext and returns the job's
+result, a JSON-serializable dict. Raising JobError fails the job with its
+message; any other exception fails it with a generic message, and the
+traceback goes to the worker log.
+
+A job may run again if its worker is presumed dead (see worker.py), so
+handlers leave nothing half-done behind: each writes in one transaction,
+committed only after JobContext.check_owner confirms the job is still
+theirs, and an export removes its partial file when it fails.
+"""
+import asyncio
+from concurrent.futures import Executor
+from datetime import datetime
+from time import monotonic
+from typing import Awaitable, Callable
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import async_session
+from ..models import Job, JobStatus
+from ..contributions.rollups import rebuild_statements
+from ..exports.queries import members_export, contributions_export
+from ..exports.utils import stream_csv, stream_xlsx
+from ..members.utils import read_import_file, import_members
+from ..umbrellas.versions import resource_versions
+from .utils import MEMBER_IMPORT, EXPORT, ROLLUP_REBUILD, job_file_path
+
+# Progress is written at most this often while a job runs
+PROGRESS_INTERVAL_SECONDS = 1
+
+
+class JobError(Exception):
+    """A job failed for a reason its creator should see."""
+
+
+class JobContext:
+    """A running job's parameters, progress, worker and the worker's process pool."""
+
+    def __init__(self, job_id: int, params: dict, worker: str, cpu_pool: Executor, live_progress: bool = True):
+        self.job_id = job_id
+        self.params = params
+        self.worker = worker
+        self.cpu_pool = cpu_pool
+        self.live_progress = live_progress  # else progress is only written when the job finishes
+        self.progress = 0
+        self.total: int | None = None
+        self._reported_at = 0.0
+
+    async def payload(self) -> bytes:
+        async with async_session() as db:
+            content = await db.scalar(select(Job.payload).where(Job.id == self.job_id))
+        if content is None:
+            raise JobError("The uploaded file is no longer available")
+        return content
+
+    async def check_owner(self, db: AsyncSession):
+        """
+        Lock the job row in the handler's transaction and raise JobError if
+        the job was requeued to another worker meanwhile. Called just before
+        committing, so the lock keeps it from being requeued until then.
+        """
+        owner = await db.scalar(
+            select(Job.id)
+            .where(Job.id == self.job_id, Job.worker == self.worker, Job.status == JobStatus.RUNNING)
+            .with_for_update()
+        )
+        if owner is None:
+            raise JobError("The job was taken over by another worker")
+
+    async def run_cpu(self, fn: Callable, *args):
+        """Run a CPU-bound, picklable function in the process pool."""
+        return await asyncio.get_running_loop().run_in_executor(self.cpu_pool, fn, *args)
+
+    async def report(self, progress: int, total: int | None = None):
+        """Record progress, and the total once known. Throttled, except when the total is set."""
+        self.progress = progress
+        if total is not None:
+            self.total = total
+        now = monotonic()
+        if not self.live_progress or (total is None and now - self._reported_at < PROGRESS_INTERVAL_SECONDS):
+            return
+        self._reported_at = now
+        async with async_session() as db:
+            await db.execute(
+                update(Job)
+                .where(Job.id == self.job_id)
+                .values(progress=self.progress, total=self.total)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+
+
+async def run_member_import(ctx: JobContext) -> dict:
+    params = ctx.params
+    content = await ctx.payload()
+    try:
+        parsed_rows = await ctx.run_cpu(read_import_file, content, params["filename"], params["content_type"])
+    except ValueError as e:
+        raise JobError(str(e))
+    await ctx.report(0, total=len(parsed_rows))
+
+    async with async_session() as db:
+        report = await import_members(
+            db,
+            parsed_rows,
+            params["umbrella_id"],
+            params["block_id"],
+            set(params["zone_ids"]),
+            default_zone_id=params["zone_id"],
+            link_duplicates=params["link_duplicates"],
+            progress=ctx.report
+        )
+        await ctx.check_owner(db)
+        try:
+            await db.commit()
+        except IntegrityError:
+            raise JobError("Member details changed in this block during the import, retry the import")
+    await resource_versions.bump("members", params["umbrella_id"])
+    return report.model_dump(mode="json")
+
+
+def _datetime(value: str | None) -> datetime | None:
+    return datetime.fromisoformat(value) if value else None
+
+
+async def run_export(ctx: JobContext) -> dict:
+    """Write an export file to settings.job_files_dir, served by GET /jobs/{id}/file."""
+    params = ctx.params
+    if params["dataset"] == "members":
+        query = members_export(params["umbrella_id"])
+    else:
+        query = contributions_export(
+            params["umbrella_id"], params["block_id"], _datetime(params["start"]), _datetime(params["end"])
+        )
+
+    rows = 0
+
+    def transform(row):
+        nonlocal rows
+        rows += 1
+        return query.transform(row)
+
+    fmt = params["format"]
+    if fmt == "xlsx":
+        body = stream_xlsx(query.stmt, query.header, transform, title=query.name)
+    else:
+        body = stream_csv(query.stmt, query.header, transform)
+
+    filename = f"{query.name}.{fmt}"
+    path = job_file_path(ctx.job_id, filename)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        with path.open("wb") as out:
+            async for chunk in body:
+                out.write(chunk.encode() if isinstance(chunk, str) else chunk)
+                await ctx.report(rows)
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    await ctx.report(rows, total=rows)
+    return {"filename": filename, "rows": rows, "size": path.stat().st_size}
+
+
+async def run_rollup_rebuild(ctx: JobContext) -> dict:
+    async with async_session() as db:
+        statements = list(rebuild_statements(db.bind.dialect.name))
+        await ctx.report(0, total=len(statements))
+        for done, stmt in enumerate(statements, start=1):
+            await db.execute(stmt)
+            await ctx.report(done)
+        await ctx.check_owner(db)
+        await db.commit()
+    return {"statements": len(statements)}
+
+
+JOB_HANDLERS: dict[str, Callable[[JobContext], Awaitable[dict]]] = {
+    MEMBER_IMPORT: run_member_import,
+    EXPORT: run_export,
+    ROLLUP_REBUILD: run_rollup_rebuild,
+}
@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import FileResponse
+from ..database import get_db
+from ..models import JobStatus
+from .schema import JobResponse
+from .utils import EXPORT, ROLLUP_REBUILD, enqueue_job, job_accepted, get_job, job_file_path
+from ..auth.Oauth2 import get_current_user, get_current_superuser
+from ..auth.cache import Principal
+from ..exports.utils import MEDIA_TYPES
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+
+@router.post("/rollups/rebuild", status_code=status.HTTP_202_ACCEPTED, response_model=JobResponse)
+async def rebuild_rollups(
+    db: AsyncSession = Depends(get_db),
+    superuser: Principal = Depends(get_current_superuser)
+):
+    # Recomputes every contribution rollup from the ledger
+    return job_accepted(await enqueue_job(db, ROLLUP_REBUILD, {}, superuser))
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job_status(
+    job_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    return await get_job(db, job_id, current_user)
+
+
+@router.get("/{job_id}/file")
+async def download_job_file(
+    job_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    job = await get_job(db, job_id, current_user)
+    if job.kind != EXPORT:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job has no file")
+    if job.status != JobStatus.SUCCEEDED:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Export is {job.status.value}")
+
+    filename = job.result["filename"]
+    path = job_file_path(job.id, filename)
+    if not path.is_file():
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Export file is no longer available")
+    return FileResponse(path, media_type=MEDIA_TYPES[job.params["format"]], filename=filename)
@@ -0,0 +1,20 @@
+from pydantic import BaseModel
+from datetime import datetime
+from ..models import JobStatus
+
+
+class JobResponse(BaseModel):
+    id: int
+    kind: str
+    status: JobStatus
+    progress: int
+    total: int | None
+    result: dict | None
+    error: str | None
+    attempts: int
+    created_at: datetime | None
+    started_at: datetime | None
+    finished_at: datetime | None
+
+    class Config:
+        from_attributes = True
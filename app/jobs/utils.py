@@ -0,0 +1,83 @@
+from contextlib import suppress
+from pathlib import Path
+from time import time
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..config import settings
+from ..models import Job, UserRole
+from ..auth.cache import Principal
+from .schema import JobResponse
+
+# Job kinds, each run by the handler of the same name in handlers.py
+MEMBER_IMPORT = "member_import"
+EXPORT = "export"
+ROLLUP_REBUILD = "rollup_rebuild"
+
+
+async def enqueue_job(
+    db: AsyncSession,
+    kind: str,
+    params: dict,
+    principal: Principal,
+    umbrella_id: int | None = None,
+    payload: bytes | None = None
+) -> Job:
+    """Queue a job for the workers and commit it."""
+    job = Job(
+        kind=kind,
+        params=params,
+        payload=payload,
+        umbrella_id=umbrella_id,
+        created_by=principal.id
+    )
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+
+def job_accepted(job: Job) -> JSONResponse:
+    """202 response for an enqueued job, pointing at its status."""
+    return JSONResponse(
+        JobResponse.model_validate(job).model_dump(mode="json"),
+        status_code=status.HTTP_202_ACCEPTED,
+        headers={"Location": f"/jobs/{job.id}"}
+    )
+
+
+async def get_job(db: AsyncSession, job_id: int, current_user: Principal) -> Job:
+    job = await db.get(Job, job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+
+    # Admins can only see their umbrella's jobs
+    if current_user.role != UserRole.SUPERUSER and (job.umbrella_id is None or job.umbrella_id != current_user.umbrella_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized for this job"
+        )
+    return job
+
+
+def job_file_path(job_id: int, filename: str) -> Path:
+    return Path(settings.job_files_dir) / f"{job_id}-{filename}"
+
+
+def remove_expired_job_files(max_age_seconds: float) -> int:
+    """Delete files in settings.job_files_dir older than max_age_seconds, returning how many."""
+    directory = Path(settings.job_files_dir)
+    if not directory.is_dir():
+        return 0
+    cutoff = time() - max_age_seconds
+    removed = 0
+    for path in directory.iterdir():
+        # Another worker may be sweeping the same directory
+        with suppress(FileNotFoundError):
+            if path.is_file() and path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+    return removed
@@ -0,0 +1,223 @@
+"""
+Background job worker. The jobs table is the queue: each worker slot
+claims the oldest queued job with UPDATE ... WHERE id = (SELECT ... FOR
+UPDATE SKIP LOCKED), so any number of worker processes can poll it
+without claiming a job twice or waiting on each other's locks.
+
+    python -m app.jobs.worker
+
+Each process runs settings.job_concurrency jobs at a time on its event
+loop, with CPU-bound steps in a pool of settings.job_process_workers
+processes. It records a heartbeat for its running jobs; a running job
+whose heartbeat is older than settings.job_stale_seconds belonged to a
+worker that died, and goes back to the queue until it has been attempted
+settings.job_max_attempts times. Files in settings.job_files_dir older
+than settings.job_files_retention_hours are deleted. SIGTERM or SIGINT
+stops claiming and lets running jobs finish.
+"""
+import asyncio
+import logging
+import os
+import signal
+import socket
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import suppress
+from datetime import datetime, timedelta
+from time import monotonic, perf_counter
+from sqlalchemy import select, update
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..config import settings
+from ..database import engine, async_session, check_schema
+from ..models import Job, JobStatus
+from ..banks.catalogue import bank_catalogue
+from .handlers import JOB_HANDLERS, JobContext, JobError
+from .utils import remove_expired_job_files
+
+logger = logging.getLogger("app.jobs")
+
+# How often each worker deletes expired job files
+FILE_SWEEP_SECONDS = 600
+
+# SQLite allows one writer at a time, so bookkeeping writes would wait for a
+# job's open transaction: there, jobs run one at a time and their heartbeat
+# and progress are only written when they finish (development only)
+SINGLE_WRITER = engine.dialect.name == "sqlite"
+
+
+class Worker:
+    def __init__(self, concurrency: int, process_workers: int):
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self.concurrency = 1 if SINGLE_WRITER else concurrency
+        self.cpu_pool = ProcessPoolExecutor(max_workers=process_workers)
+        self.running: set[int] = set()
+        self.stopping = asyncio.Event()
+        self._swept_at = float("-inf")
+        self._files_swept_at = float("-inf")
+
+    async def requeue_stale(self, db: AsyncSession):
+        """Requeue running jobs of dead workers, or fail them once out of attempts."""
+        now = datetime.now()
+        stale = (Job.status == JobStatus.RUNNING, Job.heartbeat_at < now - timedelta(seconds=settings.job_stale_seconds))
+        await db.execute(
+            update(Job)
+            .where(*stale, Job.attempts < settings.job_max_attempts)
+            .values(status=JobStatus.QUEUED, worker=None)
+            .execution_options(synchronize_session=False)
+        )
+        await db.execute(
+            update(Job)
+            .where(*stale)
+            .values(status=JobStatus.FAILED, error="Worker stopped responding", finished_at=now, payload=None)
+            .execution_options(synchronize_session=False)
+        )
+
+    async def claim(self) -> tuple[int, str, dict] | None:
+        """(id, kind, params) of the oldest queued job, now running on this worker."""
+        async with async_session() as db:
+            if monotonic() - self._swept_at >= settings.job_heartbeat_seconds:
+                self._swept_at = monotonic()
+                await self.requeue_stale(db)
+
+            # Rows locked by another worker's claim are skipped, not waited for
+            next_job = (
+                select(Job.id)
+                .where(Job.status == JobStatus.QUEUED)
+                .order_by(Job.id)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+                .scalar_subquery()
+            )
+            now = datetime.now()
+            result = await db.execute(
+                update(Job)
+                .where(Job.id == next_job, Job.status == JobStatus.QUEUED)
+                .values(
+                    status=JobStatus.RUNNING,
+                    worker=self.name,
+                    attempts=Job.attempts + 1,
+                    started_at=now,
+                    heartbeat_at=now
+                )
+                .returning(Job.id, Job.kind, Job.params)
+                .execution_options(synchronize_session=False)
+            )
+            job = result.first()
+            await db.commit()
+        return tuple(job) if job else None
+
+    async def finish(self, ctx: JobContext, status: JobStatus, result: dict | None = None, error: str | None = None):
+        # A job requeued as stale in the meantime belongs to another worker now
+        async with async_session() as db:
+            await db.execute(
+                update(Job)
+                .where(Job.id == ctx.job_id, Job.worker == self.name)
+                .values(
+                    status=status,
+                    result=result,
+                    error=error,
+                    progress=ctx.total if status == JobStatus.SUCCEEDED and ctx.total is not None else ctx.progress,
+                    total=ctx.total,
+                    finished_at=datetime.now(),
+                    payload=None
+                )
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+
+    async def run_job(self, job_id: int, kind: str, params: dict):
+        ctx = JobContext(job_id, params, self.name, self.cpu_pool, live_progress=not SINGLE_WRITER)
+        self.running.add(job_id)
+        start = perf_counter()
+        try:
+            handler = JOB_HANDLERS.get(kind)
+            if handler is None:
+                raise JobError(f"Unknown job kind: {kind}")
+            result = await handler(ctx)
+        except JobError as e:
+            logger.info("Job %s (%s) failed: %s", job_id, kind, e)
+            await self.finish(ctx, JobStatus.FAILED, error=str(e))
+        except Exception:
+            logger.exception("Job %s (%s) failed", job_id, kind)
+            await self.finish(ctx, JobStatus.FAILED, error="Job failed unexpectedly")
+        else:
+            logger.info("Job %s (%s) succeeded in %.1fs", job_id, kind, perf_counter() - start)
+            await self.finish(ctx, JobStatus.SUCCEEDED, result=result)
+        finally:
+            self.running.discard(job_id)
+
+    async def sweep_files(self):
+        if monotonic() - self._files_swept_at < FILE_SWEEP_SECONDS:
+            return
+        self._files_swept_at = monotonic()
+        try:
+            removed = await asyncio.to_thread(remove_expired_job_files, settings.job_files_retention_hours * 3600)
+        except OSError:
+            logger.exception("Could not delete expired job files")
+            return
+        if removed:
+            logger.info("Deleted %s expired job files", removed)
+
+    async def slot(self):
+        while not self.stopping.is_set():
+            await self.sweep_files()
+            try:
+                job = await self.claim()
+            except DBAPIError:
+                logger.exception("Could not claim a job")
+                job = None
+            if job is None:
+                with suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self.stopping.wait(), settings.job_poll_seconds)
+                continue
+            await self.run_job(*job)
+
+    async def heartbeat(self):
+        while True:
+            await asyncio.sleep(settings.job_heartbeat_seconds)
+            if not self.running:
+                continue
+            try:
+                async with async_session() as db:
+                    await db.execute(
+                        update(Job)
+                        .where(Job.id.in_(self.running), Job.worker == self.name)
+                        .values(heartbeat_at=datetime.now())
+                        .execution_options(synchronize_session=False)
+                    )
+                    await db.commit()
+            except DBAPIError:
+                logger.exception("Could not record job heartbeats")
+
+    async def run(self):
+        heartbeat = None if SINGLE_WRITER else asyncio.create_task(self.heartbeat())
+        # Bank names in exports
+        catalogue = asyncio.create_task(bank_catalogue.check_periodically())
+        try:
+            await asyncio.gather(*(self.slot() for _ in range(self.concurrency)))
+        finally:
+            catalogue.cancel()
+            if heartbeat is not None:
+                heartbeat.cancel()
+
+
+async def main():
+    worker = Worker(settings.job_concurrency, settings.job_process_workers)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stopping.set)
+
+    try:
+        await check_schema()
+        await bank_catalogue.refresh()
+        logger.info("Worker %s running up to %s jobs", worker.name, worker.concurrency)
+        await worker.run()
+        logger.info("Worker %s stopped", worker.name)
+    finally:
+        worker.cpu_pool.shutdown(cancel_futures=True)
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(main())
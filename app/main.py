@@ -7,12 +7,28 @@ from .blocks import router as blocks_router
 from .zones import router as zones_router
 from .members import router as members_router
 from .banks import router as banks_router
+from .contributions import router as contributions_router
+from .meetings import router as meetings_router
+from .exports import router as exports_router
+from .jobs import router as jobs_router
+from .metrics import router as metrics_router
+from .metrics.middleware import QueryStatsMiddleware, RequestMetricsMiddleware
+from .ratelimit.middleware import RateLimitMiddleware
+from .config import settings
 
 
 
 
 app = FastAPI(lifespan=lifespan, title="TabPay API")
 
+# Innermost of the middleware, so refused requests still show up in the metrics
+if settings.rate_limit_enabled:
+    app.add_middleware(RateLimitMiddleware)
+if settings.query_instrumentation:
+    app.add_middleware(QueryStatsMiddleware)
+if settings.metrics_enabled:
+    app.add_middleware(RequestMetricsMiddleware)
+
 
 
 app.include_router(auth_router.router)
@@ -21,11 +37,9 @@ app.include_router(umbrellas_router.router)
 app.include_router(blocks_router.router)
 app.include_router(zones_router.router)
 app.include_router(members_router.router)
-# app.include_router(banks_router.router)
-
-
-#TODOcheck for duplicates
-
-
-
-
+app.include_router(banks_router.router)
+app.include_router(meetings_router.router)
+app.include_router(contributions_router.router)
+app.include_router(exports_router.router)
+app.include_router(jobs_router.router)
+app.include_router(metrics_router.router)
@@ -0,0 +1,161 @@
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, status, Response
+from ..database import get_db
+from ..models import Contribution, Meeting, UserRole
+from .schema import MeetingCreate, MeetingUpdate, MeetingResponse, ScheduleCreate, ScheduleReport, PlannedMeeting
+from .scheduler import MAX_SCHEDULE_DAYS, plan_schedule, insert_meetings
+from .utils import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, get_meeting, ensure_host_in_block
+from ..auth.Oauth2 import get_current_admin, get_current_user
+from ..auth.cache import Principal
+from ..auth.ownership import block_in_umbrella
+from ..umbrellas.hierarchy import hierarchy_index
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, exists
+
+
+router = APIRouter(prefix="/meetings", tags=["Meetings"])
+
+
+@router.post("/create-meeting", response_model=MeetingResponse)
+async def create_meeting(
+    meeting: MeetingCreate,
+    db: AsyncSession = Depends(get_db),
+    current_admin: Principal = Depends(get_current_admin)
+):
+    if not await block_in_umbrella(db, meeting.block_id, current_admin.umbrella_id, fresh=True):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized for this block"
+        )
+    await ensure_host_in_block(db, meeting.host_id, meeting.block_id)
+
+    new_meeting = Meeting(
+        block_id=meeting.block_id,
+        meeting_date=meeting.meeting_date,
+        host_id=meeting.host_id
+    )
+    db.add(new_meeting)
+    await db.commit()
+    await db.refresh(new_meeting)
+    return new_meeting
+
+
+@router.post("/schedule", response_model=ScheduleReport)
+async def schedule_meetings(
+    schedule: ScheduleCreate,
+    preview: bool = False,
+    db: AsyncSession = Depends(get_db),
+    current_admin: Principal = Depends(get_current_admin)
+):
+    """
+    Generate a period's meetings for several blocks (all blocks of the
+    umbrella by default) in one go, rotating hosts through each block's
+    members and skipping holidays and days that already have a meeting.
+    With `preview`, the planned meetings are returned instead of saved.
+    """
+    if schedule.end < schedule.start:
+        raise HTTPException(status_code=400, detail="end is before start")
+    if (schedule.end - schedule.start).days > MAX_SCHEDULE_DAYS:
+        raise HTTPException(status_code=400, detail=f"A schedule spans at most {MAX_SCHEDULE_DAYS} days")
+
+    hierarchy = await hierarchy_index.get(db, current_admin.umbrella_id, fresh=True)
+    block_ids = schedule.block_ids or sorted(hierarchy.block_ids)
+    unauthorized = set(block_ids) - hierarchy.block_ids
+    if unauthorized:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Not authorized for blocks: {sorted(unauthorized)}"
+        )
+
+    plan = await plan_schedule(
+        db,
+        block_ids,
+        schedule.start,
+        schedule.end,
+        schedule.interval_days,
+        holidays=set(schedule.holidays)
+    )
+    if not preview:
+        await insert_meetings(db, plan.meetings)
+        await db.commit()
+
+    return ScheduleReport(
+        created=0 if preview else len(plan.meetings),
+        blocks=plan.blocks,
+        blocks_without_members=plan.blocks_without_members,
+        meetings=[PlannedMeeting(**meeting) for meeting in plan.meetings] if preview else None
+    )
+
+
+@router.get("/blocks/{block_id}", response_model=list[MeetingResponse])
+async def get_block_meetings(
+    block_id: int,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """A block's meetings from start (inclusive) to end (exclusive), in date order."""
+    if current_user.role == UserRole.ADMIN and not await block_in_umbrella(db, block_id, current_user.umbrella_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized for this block"
+        )
+
+    stmt = select(Meeting).where(Meeting.block_id == block_id)
+    if start is not None:
+        stmt = stmt.where(Meeting.meeting_date >= start)
+    if end is not None:
+        stmt = stmt.where(Meeting.meeting_date < end)
+    result = await db.execute(stmt.order_by(Meeting.meeting_date, Meeting.id).limit(limit))
+    return result.scalars().all()
+
+
+@router.get("/{meeting_id}", response_model=MeetingResponse)
+async def get_meeting_by_id(
+    meeting_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    return await get_meeting(db, meeting_id, current_user)
+
+
+@router.put("/{meeting_id}", response_model=MeetingResponse)
+async def update_meeting(
+    meeting_id: int,
+    meeting_update: MeetingUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_admin: Principal = Depends(get_current_admin)
+):
+    meeting = await get_meeting(db, meeting_id, current_admin, fresh=True)
+
+    if meeting_update.host_id is not None:
+        await ensure_host_in_block(db, meeting_update.host_id, meeting.block_id)
+        meeting.host_id = meeting_update.host_id
+    if meeting_update.meeting_date is not None:
+        meeting.meeting_date = meeting_update.meeting_date
+
+    await db.commit()
+    await db.refresh(meeting)
+    return meeting
+
+
+@router.delete("/{meeting_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_meeting(
+    meeting_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_admin: Principal = Depends(get_current_admin)
+):
+    meeting = await get_meeting(db, meeting_id, current_admin, fresh=True)
+
+    # Meetings with recorded contributions are part of the ledger
+    if await db.scalar(select(exists().where(Contribution.meeting_id == meeting_id))):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Meeting has contributions"
+        )
+
+    await db.delete(meeting)
+    await db.commit()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
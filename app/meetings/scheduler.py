@@ -0,0 +1,154 @@
+"""
+Meeting schedules: a period's meetings for many blocks, planned in memory
+and written with one bulk INSERT.
+
+Hosts rotate through each block's members, least recently hosted first, so
+nobody hosts twice before every other member has hosted once. The rotation
+carries on from the block's earlier meetings, and members who never
+hosted go to the front of the queue.
+
+Planning takes three queries whatever the number of blocks and meetings:
+the blocks' members, when each of them last hosted, and the meetings
+already in the period, whose dates are left as they are.
+"""
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..config import settings
+from ..models import Meeting, MemberBlockAssociation
+from .schema import BlockSchedule
+
+# Longest period one request may schedule
+MAX_SCHEDULE_DAYS = 731
+
+
+def _parse_holiday(value: str) -> tuple[int | None, int, int]:
+    """(year or None for every year, month, day) of a configured holiday."""
+    parts = [int(part) for part in value.split("-")]
+    if len(parts) == 2:
+        return (None, *parts)
+    year, month, day = parts
+    return (year, month, day)
+
+
+# Parsed once; the settings validator has already rejected malformed entries
+CONFIGURED_HOLIDAYS = [_parse_holiday(value) for value in settings.meeting_holidays]
+
+
+def configured_holidays(start: date, end: date) -> set[date]:
+    """settings.meeting_holidays falling between start and end."""
+    holidays = set()
+    for year, month, day in CONFIGURED_HOLIDAYS:
+        for candidate_year in ([year] if year else range(start.year, end.year + 1)):
+            try:
+                holiday = date(candidate_year, month, day)
+            except ValueError:  # 29 February outside leap years
+                continue
+            if start <= holiday <= end:
+                holidays.add(holiday)
+    return holidays
+
+
+def meeting_dates(start: datetime, end: datetime, interval_days: int) -> list[datetime]:
+    step = timedelta(days=interval_days)
+    count = (end - start) // step + 1
+    return [start + step * index for index in range(count)]
+
+
+@dataclass(slots=True)
+class SchedulePlan:
+    meetings: list[dict]  # block_id, meeting_date and host_id of each new meeting
+    blocks: list[BlockSchedule]
+    blocks_without_members: list[int]
+
+
+async def plan_schedule(
+    db: AsyncSession,
+    block_ids: list[int],
+    start: datetime,
+    end: datetime,
+    interval_days: int,
+    holidays: set[date] = frozenset()
+) -> SchedulePlan:
+    """Meetings every `interval_days` from start to end for each block, with their hosts."""
+    block_ids = list(dict.fromkeys(block_ids))
+
+    members = defaultdict(list)
+    result = await db.execute(
+        select(MemberBlockAssociation.block_id, MemberBlockAssociation.member_id)
+        .where(MemberBlockAssociation.block_id.in_(block_ids))
+        .order_by(MemberBlockAssociation.block_id, MemberBlockAssociation.member_id)
+    )
+    for block_id, member_id in result:
+        members[block_id].append(member_id)
+
+    last_hosted = {}
+    result = await db.execute(
+        select(Meeting.block_id, Meeting.host_id, func.max(Meeting.meeting_date))
+        .where(Meeting.block_id.in_(block_ids), Meeting.meeting_date < start)
+        .group_by(Meeting.block_id, Meeting.host_id)
+    )
+    for block_id, host_id, meeting_date in result:
+        last_hosted[block_id, host_id] = meeting_date
+
+    # Whole days, so a meeting at another time of a scheduled day counts too
+    first_day = datetime.combine(start.date(), datetime.min.time())
+    after_last_day = datetime.combine(end.date() + timedelta(days=1), datetime.min.time())
+    existing = defaultdict(list)
+    result = await db.execute(
+        select(Meeting.block_id, Meeting.meeting_date, Meeting.host_id)
+        .where(
+            Meeting.block_id.in_(block_ids),
+            Meeting.meeting_date >= first_day,
+            Meeting.meeting_date < after_last_day
+        )
+        .order_by(Meeting.block_id, Meeting.meeting_date, Meeting.id)
+    )
+    for block_id, meeting_date, host_id in result:
+        existing[block_id].append((meeting_date, host_id))
+
+    dates = meeting_dates(start, end, interval_days)
+    skipped = set(holidays) | configured_holidays(start.date(), end.date())
+
+    plan = SchedulePlan(meetings=[], blocks=[], blocks_without_members=[])
+    for block_id in block_ids:
+        if not members[block_id]:
+            plan.blocks_without_members.append(block_id)
+            continue
+
+        # The queue's first member hosts next and then moves to the back
+        queue = OrderedDict.fromkeys(sorted(
+            members[block_id],
+            key=lambda member_id: (last_hosted.get((block_id, member_id)) or datetime.min, member_id)
+        ))
+        taken = {meeting_date.date() for meeting_date, _ in existing[block_id]}
+        new_dates = [day for day in dates if day.date() not in skipped and day.date() not in taken]
+
+        # Meetings already in the period take their turn in the rotation too
+        timeline = sorted(
+            existing[block_id] + [(day, None) for day in new_dates],
+            key=lambda event: event[0]
+        )
+        for meeting_date, host_id in timeline:
+            if host_id is None:
+                host_id = next(iter(queue))
+                plan.meetings.append({"block_id": block_id, "meeting_date": meeting_date, "host_id": host_id})
+            if host_id in queue:
+                queue.move_to_end(host_id)
+
+        plan.blocks.append(BlockSchedule(
+            block_id=block_id,
+            meetings=len(new_dates),
+            skipped_dates=[day.date() for day in dates if day.date() in skipped or day.date() in taken]
+        ))
+    return plan
+
+
+async def insert_meetings(db: AsyncSession, meetings: list[dict]):
+    """Write a plan's meetings in one bulk INSERT (executemany). The caller commits."""
+    if not meetings:
+        return
+    scheduled_at = datetime.utcnow()
+    await db.execute(insert(Meeting.__table__), [{**meeting, "scheduled_at": scheduled_at} for meeting in meetings])
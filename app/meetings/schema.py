@@ -0,0 +1,52 @@
+from pydantic import BaseModel, Field
+from datetime import date, datetime
+
+
+class MeetingCreate(BaseModel):
+    block_id: int
+    meeting_date: datetime
+    host_id: int
+
+
+class MeetingUpdate(BaseModel):
+    meeting_date: datetime | None = None
+    host_id: int | None = None
+
+
+class MeetingResponse(BaseModel):
+    id: int
+    block_id: int
+    meeting_date: datetime | None
+    host_id: int
+    scheduled_at: datetime | None
+
+    class Config:
+        from_attributes = True
+
+
+class ScheduleCreate(BaseModel):
+    """Meetings every `interval_days` from start to end (both inclusive) for each block."""
+    block_ids: list[int] | None = Field(None, min_length=1)  # default: every block of the umbrella
+    start: datetime
+    end: datetime
+    interval_days: int = Field(7, ge=1, le=366)
+    holidays: list[date] = []  # skipped, in addition to the configured holidays
+
+
+class PlannedMeeting(BaseModel):
+    block_id: int
+    meeting_date: datetime
+    host_id: int
+
+
+class BlockSchedule(BaseModel):
+    block_id: int
+    meetings: int
+    skipped_dates: list[date]  # holidays and dates that already had a meeting
+
+
+class ScheduleReport(BaseModel):
+    created: int
+    blocks: list[BlockSchedule]
+    blocks_without_members: list[int]
+    meetings: list[PlannedMeeting] | None = None  # only for previews
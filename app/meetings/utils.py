@@ -0,0 +1,43 @@
+from fastapi import HTTPException, status
+from sqlalchemy import select, exists
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models import Meeting, MemberBlockAssociation, UserRole
+from ..auth.cache import Principal
+from ..auth.ownership import block_in_umbrella
+
+# Page size for a block's meetings
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+async def get_meeting(db: AsyncSession, meeting_id: int, current_user: Principal, fresh: bool = False) -> Meeting:
+    """The meeting, if the user may access it; writes pass `fresh` (see auth/ownership.py)."""
+    meeting = await db.get(Meeting, meeting_id)
+    if not meeting:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Meeting not found"
+        )
+
+    # Admins can only access meetings of blocks in their umbrella
+    if current_user.role == UserRole.ADMIN and not await block_in_umbrella(db, meeting.block_id, current_user.umbrella_id, fresh=fresh):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized for this meeting"
+        )
+    return meeting
+
+
+async def ensure_host_in_block(db: AsyncSession, host_id: int, block_id: int):
+    """Hosts are members of the meeting's block."""
+    result = await db.execute(
+        select(exists().where(
+            MemberBlockAssociation.member_id == host_id,
+            MemberBlockAssociation.block_id == block_id
+        ))
+    )
+    if not result.scalar():
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Host is not a member of this block"
+        )
@@ -0,0 +1,363 @@
+"""
+Duplicate member detection.
+
+A person who belongs to several blocks should be one Member with an
+association per block. Members are matched on the normalized keys of their
+associations (see normalize.py): the same ID number, or the same phone
+number. A match is only trusted when the names also agree phonetically,
+since phones are shared within families and ID numbers get mistyped.
+Matching never crosses umbrellas: a member is only matched from the
+umbrella all of its blocks belong to, so one umbrella's admins never see,
+link to or merge another umbrella's members.
+
+At create time the candidates come from two equality lookups on the
+indexed id_key and phone_key columns, whatever the size of the table.
+Historical duplicates are found in one streaming pass over
+member_block_associations and merged into the oldest member:
+
+    python -m app.members.dedup            # report only
+    python -m app.members.dedup --apply    # merge
+
+Merges bump the members version, so cached responses and the member search
+index of every API worker pick them up (see umbrellas/versions.py).
+"""
+import asyncio
+import sys
+from dataclasses import dataclass
+from sqlalchemy import case, delete, distinct, exists, false, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from ..contributions.rollups import move_member_rollups
+from ..database import engine, async_session
+from ..models import Block, BlockRole, Contribution, Meeting, Member, MemberBlockAssociation
+from ..umbrellas.versions import resource_versions
+from .normalize import names_agree, normalize_identifier, normalize_phone, phonetic_key
+
+# Associations read per candidate lookup; a phone shared by more people than
+# this is not a useful signal anyway
+MAX_CANDIDATE_ROWS = 50
+
+# Keys per IN list of a batched lookup, well under driver parameter limits
+LOOKUP_BATCH_SIZE = 500
+
+# Rows fetched per round trip by the streaming pass
+STREAM_BATCH_SIZE = 5000
+
+# Duplicate groups merged per transaction
+MERGE_BATCH_SIZE = 100
+
+# Groups listed by the command line report
+REPORT_LIMIT = 100
+
+
+@dataclass(frozen=True, slots=True)
+class DuplicateCandidate:
+    member_id: int
+    full_name: str
+    matched_on: tuple[str, ...]  # "id_number" and/or "phone"
+    names_agree: bool
+
+    @property
+    def confident(self) -> bool:
+        """Safe to link without asking: a matching identifier and a matching name."""
+        return self.names_agree
+
+
+@dataclass(slots=True)
+class DuplicateGroup:
+    member_id: int  # the oldest member, which the others are merged into
+    duplicate_ids: list[int]
+
+
+def _registered_elsewhere(member_id, umbrella_id: int):
+    """Whether the member also belongs to a block of another umbrella."""
+    association, block = aliased(MemberBlockAssociation), aliased(Block)
+    return exists().where(
+        association.member_id == member_id,
+        block.id == association.block_id,
+        block.parent_umbrella_id != umbrella_id
+    )
+
+
+async def _matching_associations(
+    db: AsyncSession,
+    umbrella_id: int,
+    id_keys: list[str],
+    phone_keys: list[str],
+    limit: int | None = None
+):
+    """
+    (member_id, full_name, id_key, phone_key) of associations sharing one of
+    the keys, of members registered only in the umbrella's blocks.
+    """
+    conditions = []
+    if id_keys:
+        conditions.append(MemberBlockAssociation.id_key.in_(id_keys))
+    if phone_keys:
+        conditions.append(MemberBlockAssociation.phone_key.in_(phone_keys))
+    stmt = (
+        select(
+            MemberBlockAssociation.member_id,
+            Member.full_name,
+            MemberBlockAssociation.id_key,
+            MemberBlockAssociation.phone_key
+        )
+        .join(Member, Member.id == MemberBlockAssociation.member_id)
+        .join(Block, Block.id == MemberBlockAssociation.block_id)
+        .where(
+            or_(false(), *conditions),
+            Block.parent_umbrella_id == umbrella_id,
+            ~_registered_elsewhere(MemberBlockAssociation.member_id, umbrella_id)
+        )
+        .order_by(MemberBlockAssociation.member_id)
+        .limit(limit)
+    )
+    return (await db.execute(stmt)).all()
+
+
+def _candidates(rows, full_name: str, id_key: str | None, phone_key: str | None) -> list[DuplicateCandidate]:
+    name_key = phonetic_key(full_name)
+    matches: dict[int, tuple[str, set[str]]] = {}
+    for member_id, other_name, other_id_key, other_phone_key in rows:
+        matched_on = matches.setdefault(member_id, (other_name, set()))[1]
+        if id_key and other_id_key == id_key:
+            matched_on.add("id_number")
+        if phone_key and other_phone_key == phone_key:
+            matched_on.add("phone")
+
+    candidates = [
+        DuplicateCandidate(
+            member_id=member_id,
+            full_name=other_name,
+            matched_on=tuple(field for field in ("id_number", "phone") if field in matched_on),
+            names_agree=names_agree(name_key, phonetic_key(other_name))
+        )
+        for member_id, (other_name, matched_on) in matches.items()
+        if matched_on
+    ]
+    # Confident matches first, then the oldest member
+    return sorted(candidates, key=lambda candidate: (not candidate.confident, candidate.member_id))
+
+
+async def find_candidates(
+    db: AsyncSession,
+    umbrella_id: int,
+    full_name: str,
+    phone_number: str | None,
+    id_number: str | None
+) -> list[DuplicateCandidate]:
+    """The umbrella's existing members sharing the ID or phone number of a new member, best first."""
+    id_key, phone_key = normalize_identifier(id_number), normalize_phone(phone_number)
+    if not id_key and not phone_key:
+        return []
+    rows = await _matching_associations(
+        db,
+        umbrella_id,
+        [id_key] if id_key else [],
+        [phone_key] if phone_key else [],
+        limit=MAX_CANDIDATE_ROWS
+    )
+    return _candidates(rows, full_name, id_key, phone_key)
+
+
+async def link_targets(
+    db: AsyncSession,
+    umbrella_id: int,
+    people: list[tuple[str, str | None, str | None]],
+    exclude_member_ids: set[int] = frozenset()
+) -> list[int | None]:
+    """
+    For each (full_name, phone_number, id_number), the umbrella's existing
+    member it should be linked to, if any: the oldest confident candidate
+    outside `exclude_member_ids`. Lookups are batched for bulk imports.
+    """
+    keys = [(normalize_identifier(id_number), normalize_phone(phone_number)) for _, phone_number, id_number in people]
+    id_keys = sorted({id_key for id_key, _ in keys if id_key})
+    phone_keys = sorted({phone_key for _, phone_key in keys if phone_key})
+
+    by_id_key, by_phone_key = {}, {}
+    for start in range(0, max(len(id_keys), len(phone_keys)), LOOKUP_BATCH_SIZE):
+        rows = await _matching_associations(
+            db,
+            umbrella_id,
+            id_keys[start:start + LOOKUP_BATCH_SIZE],
+            phone_keys[start:start + LOOKUP_BATCH_SIZE]
+        )
+        for row in rows:
+            by_id_key.setdefault(row.id_key, []).append(row)
+            by_phone_key.setdefault(row.phone_key, []).append(row)
+
+    targets = []
+    for (full_name, _, _), (id_key, phone_key) in zip(people, keys):
+        rows = (by_id_key.get(id_key, []) if id_key else []) + (by_phone_key.get(phone_key, []) if phone_key else [])
+        confident = [
+            candidate.member_id
+            for candidate in _candidates(rows, full_name, id_key, phone_key)
+            if candidate.confident and candidate.member_id not in exclude_member_ids
+        ]
+        targets.append(confident[0] if confident else None)
+    return targets
+
+
+class _DisjointSet:
+    """Union-find over member ids; the smallest id of a set is its root."""
+
+    def __init__(self):
+        self.parent: dict[int, int] = {}
+
+    def find(self, member_id: int) -> int:
+        root = member_id
+        while self.parent.get(root, root) != root:
+            root = self.parent[root]
+        while member_id != root:
+            self.parent[member_id], member_id = root, self.parent[member_id]
+        return root
+
+    def union(self, member_id: int, other_id: int):
+        root, other_root = self.find(member_id), self.find(other_id)
+        if root != other_root:
+            root, other_root = min(root, other_root), max(root, other_root)
+            self.parent[other_root] = root
+
+
+async def find_duplicate_groups(db: AsyncSession) -> list[DuplicateGroup]:
+    """
+    One streaming pass over the associations builds a blocking index from
+    each umbrella's normalized ID and phone numbers to the members that
+    have them. Only members sharing a key are compared, on the phonetic
+    keys of their names, so memory and work grow with the number of
+    distinct keys rather than with the number of possible pairs.
+    """
+    # Members already registered under several umbrellas are left as they are
+    result = await db.execute(
+        select(MemberBlockAssociation.member_id)
+        .join(Block, Block.id == MemberBlockAssociation.block_id)
+        .group_by(MemberBlockAssociation.member_id)
+        .having(func.count(distinct(Block.parent_umbrella_id)) > 1)
+    )
+    shared = set(result.scalars())
+
+    index: dict[int, int | list[int]] = {}  # hash of (field, umbrella, key) -> member(s) with it
+    stmt = (
+        select(
+            MemberBlockAssociation.member_id,
+            Block.parent_umbrella_id,
+            MemberBlockAssociation.id_key,
+            MemberBlockAssociation.phone_key
+        )
+        .join(Block, Block.id == MemberBlockAssociation.block_id)
+        .order_by(MemberBlockAssociation.member_id)
+        .execution_options(yield_per=STREAM_BATCH_SIZE)
+    )
+    result = await db.stream(stmt)
+    async for partition in result.partitions():
+        for member_id, umbrella_id, id_key, phone_key in partition:
+            if member_id in shared:
+                continue
+            for blocking_key in (("id", umbrella_id, id_key), ("phone", umbrella_id, phone_key)):
+                if blocking_key[2] is None:
+                    continue
+                key_hash = hash(blocking_key)
+                seen = index.setdefault(key_hash, member_id)
+                if seen == member_id:
+                    continue
+                if isinstance(seen, int):
+                    index[key_hash] = [seen, member_id]
+                elif member_id not in seen:
+                    seen.append(member_id)
+
+    blocks = [seen for seen in index.values() if isinstance(seen, list)]
+    del index
+    member_ids = sorted({member_id for block in blocks for member_id in block})
+    name_keys: dict[int, str] = {}
+    for start in range(0, len(member_ids), LOOKUP_BATCH_SIZE):
+        result = await db.execute(
+            select(Member.id, Member.full_name).where(Member.id.in_(member_ids[start:start + LOOKUP_BATCH_SIZE]))
+        )
+        name_keys.update((member_id, phonetic_key(full_name)) for member_id, full_name in result)
+
+    # Within a block, each member joins the first earlier member whose name agrees
+    groups = _DisjointSet()
+    for block in blocks:
+        people: list[int] = []
+        for member_id in block:
+            match = next((other_id for other_id in people if names_agree(name_keys[member_id], name_keys[other_id])), None)
+            if match is None:
+                people.append(member_id)
+            else:
+                groups.union(match, member_id)
+
+    merged: dict[int, list[int]] = {}
+    for member_id in sorted(groups.parent):
+        root = groups.find(member_id)
+        if root != member_id:
+            merged.setdefault(root, []).append(member_id)
+    return [DuplicateGroup(member_id, duplicate_ids) for member_id, duplicate_ids in merged.items()]
+
+
+async def merge_members(db: AsyncSession, groups: list[DuplicateGroup]):
+    """
+    Merge each group's duplicates into its member: block associations,
+    contributions, hosted meetings and block roles move over, then the
+    duplicates are deleted. The caller commits.
+    """
+    merged = {duplicate_id: group.member_id for group in groups for duplicate_id in group.duplicate_ids}
+    if not merged:
+        return
+
+    other = aliased(MemberBlockAssociation)
+    for duplicate_id, member_id in merged.items():
+        # In a block both belong to, the surviving member's details are kept
+        await db.execute(
+            delete(MemberBlockAssociation)
+            .where(
+                MemberBlockAssociation.member_id == duplicate_id,
+                MemberBlockAssociation.block_id.in_(select(other.block_id).where(other.member_id == member_id))
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await db.execute(
+            update(MemberBlockAssociation)
+            .where(MemberBlockAssociation.member_id == duplicate_id)
+            .values(member_id=member_id)
+            .execution_options(synchronize_session=False)
+        )
+
+    for column in (Contribution.payer_id, Meeting.host_id, BlockRole.member_id):
+        await db.execute(
+            update(column.class_)
+            .where(column.in_(merged))
+            .values({column.key: case(merged, value=column)})
+            .execution_options(synchronize_session=False)
+        )
+    await move_member_rollups(db, merged)
+    await db.execute(
+        delete(Member).where(Member.id.in_(merged)).execution_options(synchronize_session=False)
+    )
+
+
+async def main(apply: bool):
+    try:
+        async with async_session() as db:
+            groups = await find_duplicate_groups(db)
+            duplicates = sum(len(group.duplicate_ids) for group in groups)
+            print(f"Found {duplicates} duplicate members in {len(groups)} groups")
+            for group in groups[:REPORT_LIMIT]:
+                print(f"  {group.member_id} <- {', '.join(map(str, group.duplicate_ids))}")
+            if len(groups) > REPORT_LIMIT:
+                print(f"  ... and {len(groups) - REPORT_LIMIT} more")
+            if not apply:
+                print("Nothing merged; run with --apply to merge them")
+                return
+
+            for start in range(0, len(groups), MERGE_BATCH_SIZE):
+                await merge_members(db, groups[start:start + MERGE_BATCH_SIZE])
+                await db.commit()
+            await resource_versions.bump("members", None)
+            print(f"Merged {duplicates} duplicate members")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(apply="--apply" in sys.argv[1:]))
@@ -0,0 +1,88 @@
+"""
+Canonical forms of member details, used as lookup keys by search and
+duplicate detection. Raw values are stored as entered; the keys make
+"0712 345 678", "+254712345678" and "712345678" the same phone number.
+"""
+import re
+import unicodedata
+from ..config import settings
+
+_NON_DIGITS = re.compile(r"\D+")
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+_NON_LETTERS = re.compile(r"[^a-z]+")
+
+# Soundex digit of each consonant; vowels, h, w and y have none
+_SOUNDEX_DIGITS = {
+    **dict.fromkeys("bfpv", "1"),
+    **dict.fromkeys("cgjkqsxz", "2"),
+    **dict.fromkeys("dt", "3"),
+    "l": "4",
+    **dict.fromkeys("mn", "5"),
+    "r": "6",
+}
+
+
+def normalize_phone(value: str | None) -> str | None:
+    """Digits of the national number, without the international or trunk prefix."""
+    if value is None:
+        return None
+    digits = _NON_DIGITS.sub("", value)
+    if digits.startswith("00"):
+        digits = digits[2:]
+    country_code = settings.phone_country_code
+    if country_code and digits.startswith(country_code) and len(digits) > len(country_code) + 6:
+        digits = digits[len(country_code):]
+    return digits.removeprefix("0") or None
+
+
+def normalize_identifier(value: str | None) -> str | None:
+    """ID and account numbers compare case-insensitively and without separators."""
+    if value is None:
+        return None
+    return _NON_ALNUM.sub("", value.casefold()) or None
+
+
+def normalize_name(value: str | None) -> str:
+    """Lower-case words without accents or punctuation, single-spaced."""
+    if not value:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", value)
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(_NON_ALNUM.sub(" ", stripped.casefold()).split())
+
+
+def name_tokens(value: str | None) -> list[str]:
+    return normalize_name(value).split()
+
+
+def soundex(word: str) -> str:
+    """American Soundex of one lower-case word, e.g. "wanjiku" -> "W522"."""
+    letters = _NON_LETTERS.sub("", word)
+    if not letters:
+        return ""
+    code, previous = letters[0].upper(), _SOUNDEX_DIGITS.get(letters[0], "")
+    for letter in letters[1:]:
+        digit = _SOUNDEX_DIGITS.get(letter, "")
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        # h and w do not separate letters with the same digit, vowels do
+        if letter not in "hw":
+            previous = digit
+    return code.ljust(4, "0")
+
+
+def phonetic_key(full_name: str | None) -> str:
+    """Sorted Soundex codes of the words of a name, e.g. "Mwangi Kamau" -> "K500 M520"."""
+    return " ".join(sorted({code for code in map(soundex, name_tokens(full_name)) if code}))
+
+
+def names_agree(key: str, other: str) -> bool:
+    """
+    Whether two phonetic keys can name the same person: they share two words,
+    or every word of the shorter name when it has only one.
+    """
+    codes, other_codes = set(key.split()), set(other.split())
+    shared = len(codes & other_codes)
+    return shared > 0 and shared >= min(2, len(codes), len(other_codes))
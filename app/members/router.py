@@ -1,10 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Response
+from dataclasses import asdict
+from typing import Literal
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, status, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from ..database import get_db
-from ..models import User, Zone, Block, Member, MemberBlockAssociation, UserRole
-from .schema import MemberCreate, MemberResponse, MemberUpdate
+from ..models import Block, Zone, Member, MemberBlockAssociation, UserRole
+from .schema import MemberCreate, MemberResponse, MemberUpdate, MemberPage, MemberSearchPage, BulkImportReport
+from .utils import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, STREAM_CHUNK_SIZE, DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT, MAX_SEARCH_OFFSET,
+    encode_cursor, decode_cursor, read_import_file, import_members, member_rows
+)
+from .search import member_search
+from .dedup import find_candidates
 from ..auth.Oauth2 import get_current_admin, get_current_user
+from ..auth.cache import Principal
+from ..auth.ownership import member_in_umbrella, umbrella_block_ids
+from ..umbrellas.hierarchy import hierarchy_index
+from ..umbrellas.versions import resource_versions
+from ..jobs.utils import MEMBER_IMPORT, enqueue_job, job_accepted
+from ..utils import stream_partitions
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, or_
+from sqlalchemy import select, or_, tuple_
 from sqlalchemy.orm import selectinload
 from sqlalchemy.exc import IntegrityError
 
@@ -15,39 +30,65 @@ router = APIRouter(prefix="/members", tags=["Members"])
 async def create_member(
     member: MemberCreate,
     zone_id: int,
+    response: Response,
+    on_duplicate: Literal["link", "suggest", "create"] = "link",
     db: AsyncSession = Depends(get_db),
-    current_admin: User = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin)
 ):
-    # Get zone and verify it belongs to admin's umbrella
-    zone = await db.get(Zone, zone_id)
-    if not zone:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Zone not found"
-        )
-    
-    block = await db.get(Block, zone.parent_block_id)
-    if block.parent_umbrella_id != current_admin.umbrella.id:
+    # Resolve the zone's block from the admin's umbrella hierarchy
+    hierarchy = await hierarchy_index.get(db, current_admin.umbrella_id, fresh=True)
+    block_id = hierarchy.zone_blocks.get(zone_id)
+    if block_id is None:
+        if not await db.get(Zone, zone_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Zone not found"
+            )
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized for this zone"
         )
 
-    # Create member core record
-    new_member = Member(
-        full_name=member.full_name,
-        bank_id=member.bank_id
-    )
-    db.add(new_member)
-    await db.flush()
+    # The same person (ID or phone number, and a matching name) already
+    # registered elsewhere is linked to this block instead of created twice.
+    # Uncertain matches, or any match with on_duplicate=suggest, are returned
+    # with a 409: the client then uses add-to-block or on_duplicate=create.
+    linked_member_id = None
+    if on_duplicate != "create":
+        candidates = await find_candidates(
+            db, current_admin.umbrella_id, member.full_name, member.phone_number, member.id_number
+        )
+        if on_duplicate == "link" and candidates and candidates[0].confident:
+            linked_member_id = candidates[0].member_id
+        elif candidates:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={
+                    "message": "Possible duplicate of an existing member",
+                    "candidates": [asdict(candidate) for candidate in candidates]
+                }
+            )
+
+    if linked_member_id is None:
+        # Create member core record
+        new_member = Member(
+            full_name=member.full_name,
+            bank_id=member.bank_id
+        )
+        db.add(new_member)
+        await db.flush()
+        member_id = new_member.id
+    else:
+        member_id = linked_member_id
+        response.headers["X-Linked-Member"] = str(member_id)
 
-    # Create first association
+    # Create the association with this block
     association = MemberBlockAssociation(
-        member_id=new_member.id,
+        member_id=member_id,
         phone_number=member.phone_number,
         id_number=member.id_number,
         acc_number=member.acc_number,
-        block_id=block.id,
+        block_id=block_id,
         zone_id=zone_id
     )
     db.add(association)
@@ -60,12 +101,13 @@ async def create_member(
             status_code=400,
             detail="Duplicate member details in block"
         )
+    await resource_versions.bump("members", current_admin.umbrella_id)
 
     # Return full member data
     result = await db.execute(
         select(Member)
         .options(selectinload(Member.block_associations))
-        .where(Member.id == new_member.id)
+        .where(Member.id == member_id)
     )
     return MemberResponse.from_member(result.scalar_one())
 
@@ -77,20 +119,13 @@ async def add_to_block(
     id_number: str,
     acc_number: str,
     db: AsyncSession = Depends(get_db),
-    current_admin: User = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin)
 ):
     # Validate zone and block ownership
-    result = await db.execute(
-        select(Zone)
-        .join(Block)
-        .where(
-            Zone.id == zone_id,
-            Block.parent_umbrella_id == current_admin.umbrella.id
-        )
-    )
-    zone = result.scalar_one_or_none()
+    hierarchy = await hierarchy_index.get(db, current_admin.umbrella_id, fresh=True)
+    block_id = hierarchy.zone_blocks.get(zone_id)
     
-    if not zone:
+    if block_id is None:
         raise HTTPException(status_code=403, detail="Unauthorized zone")
 
     # Get existing member with associations
@@ -105,7 +140,7 @@ async def add_to_block(
         raise HTTPException(status_code=404, detail="Member not found")
 
     # Check if already in block
-    if any(a.block_id == zone.parent_block_id for a in member.block_associations):
+    if any(a.block_id == block_id for a in member.block_associations):
         raise HTTPException(
             status_code=400,
             detail="Member already in this block"
@@ -114,7 +149,7 @@ async def add_to_block(
     # Create new association
     new_association = MemberBlockAssociation(
         member_id=member_id,
-        block_id=zone.parent_block_id,
+        block_id=block_id,
         zone_id=zone_id,
         phone_number=phone_number,
         id_number=id_number,
@@ -130,13 +165,13 @@ async def add_to_block(
             status_code=400,
             detail="Duplicate details in block or already exists in block"
         )
+    await resource_versions.bump("members", current_admin.umbrella_id)
 
     # Return updated member data
     result = await db.execute(
         select(Member)
         .options(
-            selectinload(Member.block_associations),
-            selectinload(Member.bank)
+            selectinload(Member.block_associations)
         )
         .where(Member.id == member_id)
     )
@@ -144,65 +179,213 @@ async def add_to_block(
     
     return MemberResponse.from_member(updated_member)
 
+@router.post("/bulk-import", response_model=BulkImportReport)
+async def bulk_import_members(
+    file: UploadFile,
+    zone_id: int | None = None,
+    block_id: int | None = None,
+    on_duplicate: Literal["link", "create"] = "link",
+    background: bool = False,
+    db: AsyncSession = Depends(get_db),
+    current_admin: Principal = Depends(get_current_admin)
+):
+    # Import into a single zone, or into a block with a zone_id per row
+    if (zone_id is None) == (block_id is None):
+        raise HTTPException(status_code=400, detail="Provide exactly one of zone_id or block_id")
+
+    hierarchy = await hierarchy_index.get(db, current_admin.umbrella_id, fresh=True)
+    if zone_id is not None:
+        block_id = hierarchy.zone_blocks.get(zone_id)
+        if block_id is None:
+            raise HTTPException(status_code=403, detail="Unauthorized zone")
+        block_zone_ids = {zone_id}
+    else:
+        if block_id not in hierarchy.block_ids:
+            raise HTTPException(status_code=403, detail="Unauthorized block")
+        block_zone_ids = hierarchy.zones_in_block(block_id)
+
+    # Large files: a job parses and imports the file, polled at /jobs/{id}
+    if background:
+        params = {
+            "umbrella_id": current_admin.umbrella_id,
+            "block_id": block_id,
+            "zone_ids": sorted(block_zone_ids),
+            "zone_id": zone_id,
+            "link_duplicates": on_duplicate == "link",
+            "filename": file.filename,
+            "content_type": file.content_type,
+        }
+        job = await enqueue_job(
+            db, MEMBER_IMPORT, params, current_admin, umbrella_id=current_admin.umbrella_id, payload=await file.read()
+        )
+        return job_accepted(job)
+
+    try:
+        parsed_rows = read_import_file(await file.read(), file.filename, file.content_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    report = await import_members(
+        db,
+        parsed_rows,
+        current_admin.umbrella_id,
+        block_id,
+        block_zone_ids,
+        default_zone_id=zone_id,
+        link_duplicates=on_duplicate == "link"
+    )
+
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=409,
+            detail="Member details changed in this block during the import, retry the import"
+        )
+    await resource_versions.bump("members", current_admin.umbrella_id)
+
+    return report
+
 #TODO Add try except blocks
 
-@router.get("/", response_model=list[MemberResponse])
+@router.get("/", response_model=MemberPage)
 async def get_all_members(
+    cursor: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    stream: bool = False,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
-    # For superusers: return all members with their associations
+    # For superusers: all members
     if current_user.role == UserRole.SUPERUSER:
-        result = await db.execute(
-            select(Member)
-            .options(
-                selectinload(Member.block_associations),
-                selectinload(Member.bank)  # Eager load bank relationship
+        filters = []
+
+    # For admins: only members associated with blocks in admin's umbrella.
+    # A semi-join keeps one row per member, so no de-duplication is needed,
+    # and the umbrella's blocks are joined in the same query.
+    elif current_user.role == UserRole.ADMIN:
+        if current_user.umbrella_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="No umbrella found for this admin"
+            )
+
+        filters = [
+            Member.id.in_(
+                select(MemberBlockAssociation.member_id)
+                .join(Block, Block.id == MemberBlockAssociation.block_id)
+                .where(Block.parent_umbrella_id == current_user.umbrella_id)
             )
-            .order_by(Member.registered_at)
+        ]
+
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to access members"
         )
-        members = result.scalars().all()
-        return [MemberResponse.from_member(member) for member in members]
 
-    # For admins: return only members associated with blocks in admin's umbrella
-    if current_user.role == UserRole.ADMIN:
-        if not current_user.umbrella:
+    # Opt-in NDJSON streaming of the whole result set
+    if stream:
+        stmt = (
+            select(Member)
+            .options(selectinload(Member.block_associations))
+            .where(*filters)
+            .order_by(Member.registered_at, Member.id)
+        )
+        return StreamingResponse(_stream_members(stmt), media_type="application/x-ndjson")
+
+    # Pages are built from column projections and serialized straight to JSON
+    stmt = (
+        select(Member.id, Member.full_name, Member.bank_id, Member.registered_at)
+        .where(*filters)
+        .order_by(Member.registered_at, Member.id)
+    )
+
+    # Keyset pagination on (registered_at, id)
+    if cursor:
+        try:
+            registered_at, last_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        stmt = stmt.where(tuple_(Member.registered_at, Member.id) > tuple_(registered_at, last_id))
+
+    # Fetch one extra row to know whether another page exists
+    result = await db.execute(stmt.limit(limit + 1))
+    members = result.all()
+
+    next_cursor = None
+    if len(members) > limit:
+        members = members[:limit]
+        next_cursor = encode_cursor(members[-1].registered_at, members[-1].id)
+
+    return ORJSONResponse({
+        "items": await member_rows(db, members),
+        "next_cursor": next_cursor
+    })
+
+
+async def _stream_members(stmt):
+    """Yield members as NDJSON in fixed-size chunks from a server-side cursor."""
+    async for members in stream_partitions(stmt, STREAM_CHUNK_SIZE, scalars=True):
+        yield "".join(
+            MemberResponse.from_member(member).model_dump_json() + "\n"
+            for member in members
+        )
+
+
+@router.get("/search", response_model=MemberSearchPage)
+async def search_members(
+    q: str = Query(min_length=1, max_length=100),
+    field: Literal["name", "phone", "id_number", "acc_number"] | None = None,
+    limit: int = Query(DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_SEARCH_LIMIT),
+    offset: int = Query(0, ge=0, le=MAX_SEARCH_OFFSET),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Ranked member search within the caller's umbrella: exact phone, ID or
+    account number matches first, then name matches. Without `field` the
+    query is tried against all of them.
+    """
+    scope = None
+    if current_user.role != UserRole.SUPERUSER:
+        if current_user.umbrella_id is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="No umbrella found for this admin"
             )
-        
+        scope = await hierarchy_index.get(db, current_user.umbrella_id)
+
+    hits, has_more = await member_search.search(db, q, field, scope, limit, offset)
+
+    items = []
+    if hits:
         result = await db.execute(
-            select(Member)
-            .join(MemberBlockAssociation)
-            .join(Block)
-            .where(Block.parent_umbrella_id == current_user.umbrella.id)
-            .options(
-                selectinload(Member.block_associations),
-                selectinload(Member.bank)  # Eager load bank relationship
-            )
+            select(Member.id, Member.full_name, Member.bank_id, Member.registered_at)
+            .where(Member.id.in_([hit.member_id for hit in hits]))
         )
-        members = result.scalars().unique().all()
-        return [MemberResponse.from_member(member) for member in members]
+        rows = {row["id"]: row for row in await member_rows(db, result.all())}
+        # Members deleted since the index was read are skipped
+        items = [{**rows[hit.member_id], "matched_on": hit.matched_on} for hit in hits if hit.member_id in rows]
 
-    raise HTTPException(
-        status_code=status.HTTP_403_FORBIDDEN,
-        detail="Not authorized to access members"
-    )
+    return ORJSONResponse({
+        "items": items,
+        "next_offset": offset + limit if has_more else None
+    })
 
 
 @router.get("/{member_id}", response_model=MemberResponse)
 async def get_member_by_id(
     member_id: int,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     result = await db.execute(
         select(Member)
         .options(
-            selectinload(Member.block_associations),            
-            selectinload(Member.bank)
-)
+            selectinload(Member.block_associations)
+        )
         .where(Member.id == member_id)
     )
     member = result.scalar_one_or_none()
@@ -215,21 +398,12 @@ async def get_member_by_id(
     # For admins, verify that at least one of the member's block associations
     # belongs to a block under the admin's umbrella.
     if current_user.role == UserRole.ADMIN:
-        if not current_user.umbrella:
+        if current_user.umbrella_id is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="No umbrella found for this admin"
             )
-        authorized = False
-    
-        for assoc in member.block_associations:
-            # We can load the block if not already loaded:
-            block = await db.get(Block, assoc.block_id)
-            if block and block.parent_umbrella_id == current_user.umbrella.id:
-                authorized = True
-                break
-
-        if not authorized:
+        if not await member_in_umbrella(db, member_id, current_user.umbrella_id):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Not authorized to access this member"
@@ -244,14 +418,13 @@ async def update_member(
     member_id: int,
     member_data: MemberUpdate,
     db: AsyncSession = Depends(get_db),
-    current_admin: User = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin)
 ):
     # Fetch member along with its associations and bank data
     result = await db.execute(
         select(Member)
         .options(
-            selectinload(Member.block_associations),
-            selectinload(Member.bank)
+            selectinload(Member.block_associations)
         )
         .where(Member.id == member_id)
     )
@@ -261,11 +434,7 @@ async def update_member(
         raise HTTPException(status_code=404, detail="Member not found")
     
     # Verify member belongs to an admin-approved block (umbrella)
-    valid_blocks_result = await db.execute(
-        select(Block.id)
-        .where(Block.parent_umbrella_id == current_admin.umbrella.id)
-    )
-    valid_block_ids = valid_blocks_result.scalars().all()
+    valid_block_ids = await umbrella_block_ids(db, current_admin.umbrella_id, fresh=True)
     
     if not any(assoc.block_id in valid_block_ids for assoc in member.block_associations):
         raise HTTPException(status_code=403, detail="Not authorized")
@@ -293,6 +462,8 @@ async def update_member(
             zone = await db.get(Zone, new_zone_id)
             if not zone:
                 raise HTTPException(status_code=400, detail=f"Zone with id {new_zone_id} does not exist")
+            if zone.parent_block_id not in valid_block_ids:
+                raise HTTPException(status_code=403, detail="Not authorized for this zone")
             association.zone_id = new_zone_id
         
         # Update the other association fields if provided
@@ -320,8 +491,7 @@ async def update_member(
         result = await db.execute(
             select(Member)
             .options(
-                selectinload(Member.block_associations),
-                selectinload(Member.bank)
+                selectinload(Member.block_associations)
             )
             .where(Member.id == member_id)
         )
@@ -330,6 +500,8 @@ async def update_member(
         await db.rollback()
         raise HTTPException(status_code=400, detail="Database error during commit")
     
+    await resource_versions.bump("members", current_admin.umbrella_id)
+
     # Return the updated member using the conversion method defined on MemberResponse
     return MemberResponse.from_member(updated_member)
 
@@ -339,7 +511,7 @@ async def update_member(
 async def delete_member(
     member_id: int,
     db: AsyncSession = Depends(get_db),
-    current_admin: User = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin)
 ):
     # Fetch member with relationships
     result = await db.execute(
@@ -356,13 +528,7 @@ async def delete_member(
         raise HTTPException(status_code=404, detail="Member not found")
 
     # Verify member belongs to an admin-approved block (umbrella)
-    valid_blocks_result = await db.execute(
-        select(Block.id)
-        .where(Block.parent_umbrella_id == current_admin.umbrella.id)
-    )
-    valid_block_ids = valid_blocks_result.scalars().all()
-    
-    if not any(a.block_id in valid_block_ids for a in member.block_associations):
+    if not await member_in_umbrella(db, member_id, current_admin.umbrella_id):
         raise HTTPException(status_code=403, detail="Not authorized")
 
     # Delete member and associations
@@ -374,4 +540,7 @@ async def delete_member(
         await db.rollback()
         raise HTTPException(status_code=400, detail="Cannot delete member with existing contributions")
 
+    # The member's other blocks may belong to other umbrellas
+    await resource_versions.bump("members", None)
+
     return Response(status_code=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
@@ -1,6 +1,7 @@
 from pydantic import BaseModel
 from datetime import datetime
 from ..models import Member
+from ..banks.catalogue import bank_catalogue
 
 class MemberBase(BaseModel):
     full_name: str
@@ -32,7 +33,7 @@ class MemberBlockAssociationResponse(BaseModel):
 class MemberResponse(BaseModel):
     id: int
     full_name: str
-    bank: Bank
+    bank: Bank | None
     registered_at: datetime
     associations: list[MemberBlockAssociationResponse]
 
@@ -41,7 +42,8 @@ class MemberResponse(BaseModel):
         return cls(
             id=member.id,
             full_name=member.full_name,
-            bank=member.bank,
+            # Resolved from the in-memory catalogue rather than a join per request
+            bank=bank_catalogue.get(member.bank_id),
             registered_at=member.registered_at,
             associations=[
                 MemberBlockAssociationResponse(
@@ -54,6 +56,21 @@ class MemberResponse(BaseModel):
                 for assoc in member.block_associations
             ]
         )
+
+
+class MemberPage(BaseModel):
+    items: list[MemberResponse]
+    next_cursor: str | None = None
+
+
+class MemberSearchHit(MemberResponse):
+    matched_on: str  # "phone", "id_number", "acc_number" or "name"
+
+
+class MemberSearchPage(BaseModel):
+    items: list[MemberSearchHit]
+    next_offset: int | None = None
+
     
 class MemberUpdate(BaseModel):
     full_name: str | None = None
@@ -62,3 +79,22 @@ class MemberUpdate(BaseModel):
     id_number: str | None = None
     acc_number: str | None = None
     zone_id: int | None = None
+
+
+class MemberImportRow(MemberCreate):
+    zone_id: int | None = None
+
+
+class BulkImportRowResult(BaseModel):
+    row: int
+    status: str  # "created", "linked" (to a member registered in another block) or "error"
+    member_id: int | None = None
+    errors: list[str] = []
+
+
+class BulkImportReport(BaseModel):
+    total: int
+    created: int
+    linked: int = 0
+    failed: int
+    results: list[BulkImportRowResult]
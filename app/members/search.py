@@ -0,0 +1,265 @@
+"""
+Member search for GET /members/search.
+
+Identifiers (phone, ID and account numbers) are looked up exactly on their
+normalized keys. Names are matched word by word on prefixes: an FTS5 table
+on SQLite, a trigram index (pg_trgm) on PostgreSQL, which also tolerates
+typos, or an in-process index when neither exists. Identifier matches rank
+first, then name matches by relevance.
+
+Broad name queries are ranked among their first MAX_RANKED_MATCHES matches
+only, which keeps their cost flat however many members share a name prefix.
+"""
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Iterable, Protocol
+from sqlalchemy import column, func, literal, literal_column, or_, select, table, text, true
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models import Member, MemberBlockAssociation
+from ..umbrellas.hierarchy import UmbrellaHierarchy
+from ..umbrellas.versions import resource_versions
+from .normalize import name_tokens, normalize_identifier, normalize_phone
+
+# Identifier fields, with their normalized key column and normalizer
+IDENTIFIER_FIELDS = {
+    "phone": (MemberBlockAssociation.phone_key, normalize_phone),
+    "id_number": (MemberBlockAssociation.id_key, normalize_identifier),
+    "acc_number": (MemberBlockAssociation.acc_key, normalize_identifier),
+}
+
+# Only the first few words of a query are matched
+MAX_QUERY_TOKENS = 5
+
+# Name matches ranked per query; deeper than the deepest page the API serves
+MAX_RANKED_MATCHES = 2000
+
+
+@dataclass(frozen=True, slots=True)
+class SearchHit:
+    member_id: int
+    matched_on: str
+
+
+def _scoped(member_ids, scope: UmbrellaHierarchy | None):
+    """Restrict a member id column to members of the umbrella (None: all)."""
+    if scope is None:
+        return true()
+    return member_ids.in_(
+        select(MemberBlockAssociation.member_id)
+        .where(MemberBlockAssociation.block_id.in_(scope.block_ids))
+    )
+
+
+async def identifier_hits(
+    db: AsyncSession,
+    query: str,
+    fields: Iterable[str],
+    scope: UmbrellaHierarchy | None
+) -> list[SearchHit]:
+    """Members whose normalized phone, ID or account number equals the query's."""
+    conditions = []
+    for field in fields:
+        key_column, normalize = IDENTIFIER_FIELDS[field]
+        key = normalize(query)
+        if key:
+            conditions.append((field, key_column == key))
+    if not conditions:
+        return []
+
+    stmt = select(
+        MemberBlockAssociation.member_id,
+        *(condition.label(field) for field, condition in conditions)
+    ).where(or_(*(condition for _, condition in conditions)))
+    if scope is not None:
+        stmt = stmt.where(MemberBlockAssociation.block_id.in_(scope.block_ids))
+
+    matched: dict[int, str] = {}
+    for row in await db.execute(stmt.order_by(MemberBlockAssociation.member_id)):
+        field = next(field for field, _ in conditions if row._mapping[field])
+        matched.setdefault(row.member_id, field)
+    return [SearchHit(member_id, field) for member_id, field in matched.items()]
+
+
+class NameSearch(Protocol):
+    async def search(
+        self,
+        db: AsyncSession,
+        tokens: list[str],
+        scope: UmbrellaHierarchy | None,
+        exclude: list[int],
+        limit: int,
+        offset: int
+    ) -> list[int]:
+        """Member ids matching every token, best first."""
+        ...
+
+
+class SQLiteNameSearch:
+    """FTS5 prefix queries over members_fts, ranked by bm25 on the name."""
+
+    fts = table("members_fts", column("rowid"), column("rank"))
+
+    async def search(self, db, tokens, scope, exclude, limit, offset):
+        # Every word must match as a prefix of some word of the name
+        match = " ".join(f'full_name : "{token}"*' for token in tokens)
+        if scope is not None:
+            match += f' AND umbrellas : "u{scope.umbrella_id}"'
+
+        # Matches stream out of the index in rowid order, so only the
+        # candidates kept by the limit are ever scored
+        candidates = (
+            select(self.fts.c.rowid.label("member_id"), self.fts.c.rank)
+            .where(literal_column("members_fts").op("MATCH")(match))
+            .limit(MAX_RANKED_MATCHES)
+        )
+        if exclude:
+            candidates = candidates.where(self.fts.c.rowid.not_in(exclude))
+        candidates = candidates.subquery()
+
+        stmt = (
+            select(candidates.c.member_id)
+            .order_by(candidates.c.rank, candidates.c.member_id)
+            .limit(limit)
+            .offset(offset)
+        )
+        return list((await db.execute(stmt)).scalars())
+
+
+class PostgresNameSearch:
+    """Trigram word similarity (pg_trgm), so near misses match too; prefix matches rank first."""
+
+    async def search(self, db, tokens, scope, exclude, limit, offset):
+        query = " ".join(tokens)
+        prefix = Member.full_name.ilike(f"{query}%")
+        candidates = (
+            select(
+                Member.id.label("member_id"),
+                prefix.label("is_prefix"),
+                func.word_similarity(query, Member.full_name).label("similarity")
+            )
+            .where(or_(prefix, literal(query).op("<%")(Member.full_name)), _scoped(Member.id, scope))
+            .limit(MAX_RANKED_MATCHES)
+        )
+        if exclude:
+            candidates = candidates.where(Member.id.not_in(exclude))
+        candidates = candidates.subquery()
+
+        stmt = (
+            select(candidates.c.member_id)
+            .order_by(candidates.c.is_prefix.desc(), candidates.c.similarity.desc(), candidates.c.member_id)
+            .limit(limit)
+            .offset(offset)
+        )
+        return list((await db.execute(stmt)).scalars())
+
+
+class LocalNameSearch:
+    """
+    In-process fallback: a sorted (word, member id) list searched by prefix
+    with bisect. It is rebuilt when a member write bumps the members version
+    (see umbrellas/versions.py), which also happens every version window.
+    """
+
+    VERSION_KEYS = ("members:*", "members:all")
+
+    def __init__(self):
+        self._version: str | None = None
+        self._words: list[tuple[str, int]] = []
+        self._names: dict[int, list[str]] = {}
+        self._blocks: dict[int, set[int]] = {}
+
+    async def _refresh(self, db: AsyncSession):
+        version = await resource_versions.token(db, self.VERSION_KEYS)
+        if version == self._version:
+            return
+        words, names, blocks = [], {}, {}
+        result = await db.stream(select(Member.id, Member.full_name))
+        async for member_id, full_name in result:
+            names[member_id] = name_tokens(full_name)
+            words.extend((word, member_id) for word in names[member_id])
+        result = await db.stream(select(MemberBlockAssociation.member_id, MemberBlockAssociation.block_id))
+        async for member_id, block_id in result:
+            blocks.setdefault(member_id, set()).add(block_id)
+        words.sort()
+        self._words, self._names, self._blocks, self._version = words, names, blocks, version
+
+    def _prefix_matches(self, token: str) -> set[int]:
+        matches = set()
+        for index in range(bisect_left(self._words, (token, 0)), len(self._words)):
+            word, member_id = self._words[index]
+            if not word.startswith(token):
+                break
+            matches.add(member_id)
+        return matches
+
+    def _score(self, member_id: int, tokens: list[str]) -> float:
+        # Whole-word matches beat prefix matches, shorter names beat longer ones
+        words = self._names[member_id]
+        exact = sum(1 for token in tokens if token in words)
+        return exact + len(tokens) / len(words)
+
+    async def search(self, db, tokens, scope, exclude, limit, offset):
+        await self._refresh(db)
+        candidates = self._prefix_matches(tokens[0])
+        for token in tokens[1:]:
+            candidates &= self._prefix_matches(token)
+        candidates.difference_update(exclude)
+        if scope is not None:
+            candidates = {
+                member_id for member_id in candidates
+                if not self._blocks.get(member_id, set()).isdisjoint(scope.block_ids)
+            }
+        ranked = sorted(candidates, key=lambda member_id: (-self._score(member_id, tokens), member_id))
+        return ranked[offset:offset + limit]
+
+
+class MemberSearch:
+    def __init__(self):
+        self._names: NameSearch | None = None
+
+    async def name_search(self, db: AsyncSession) -> NameSearch:
+        """The database's name index if it has one (checked once per process), else the local index."""
+        if self._names is None:
+            dialect = db.bind.dialect.name
+            if dialect == "sqlite":
+                found = await db.scalar(text("SELECT 1 FROM sqlite_master WHERE name = 'members_fts'"))
+                self._names = SQLiteNameSearch() if found else LocalNameSearch()
+            elif dialect == "postgresql":
+                found = await db.scalar(text("SELECT 1 FROM pg_indexes WHERE indexname = 'ix_members_full_name_trgm'"))
+                self._names = PostgresNameSearch() if found else LocalNameSearch()
+            else:
+                self._names = LocalNameSearch()
+        return self._names
+
+    async def search(
+        self,
+        db: AsyncSession,
+        query: str,
+        field: str | None,
+        scope: UmbrellaHierarchy | None,
+        limit: int,
+        offset: int
+    ) -> tuple[list[SearchHit], bool]:
+        """One page of hits, and whether there are more."""
+        hits: list[SearchHit] = []
+        if field != "name":
+            hits = await identifier_hits(db, query, [field] if field else IDENTIFIER_FIELDS, scope)
+        page = hits[offset:offset + limit + 1]
+
+        tokens = name_tokens(query)[:MAX_QUERY_TOKENS]
+        if field in (None, "name") and tokens and len(page) <= limit:
+            names = await self.name_search(db)
+            member_ids = await names.search(
+                db,
+                tokens,
+                scope,
+                exclude=[hit.member_id for hit in hits],
+                limit=limit + 1 - len(page),
+                offset=max(0, offset - len(hits))
+            )
+            page.extend(SearchHit(member_id, "name") for member_id in member_ids)
+
+        return page[:limit], len(page) > limit
+
+
+member_search = MemberSearch()
@@ -0,0 +1,283 @@
+import base64
+import csv
+import io
+import json
+from collections import defaultdict
+from datetime import datetime
+from typing import Awaitable, Callable
+from pydantic import ValidationError
+from sqlalchemy import select, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models import Bank, Member, MemberBlockAssociation
+from ..banks.catalogue import bank_catalogue
+from .schema import MemberImportRow, BulkImportRowResult, BulkImportReport
+from .dedup import link_targets
+
+
+# Page sizes for GET /members/
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Page sizes and deepest offset for GET /members/search
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+MAX_SEARCH_OFFSET = 1000
+
+# Number of members fetched per round trip when streaming NDJSON
+STREAM_CHUNK_SIZE = 500
+
+# Rows per multi-row INSERT during bulk imports
+IMPORT_BATCH_SIZE = 1000
+
+# Association fields that must be unique within a block
+UNIQUE_FIELDS = ("phone_number", "id_number", "acc_number")
+
+
+def encode_cursor(registered_at: datetime, member_id: int) -> str:
+    """Encode the keyset position (registered_at, id) of the last member on a page."""
+    raw = json.dumps([registered_at.isoformat(), member_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Decode a cursor produced by encode_cursor. Raises ValueError if it is malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        registered_at, member_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(registered_at), int(member_id)
+    except (TypeError, ValueError, json.JSONDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+async def member_rows(db: AsyncSession, members) -> list[dict]:
+    """
+    MemberResponse-shaped dicts for (id, full_name, bank_id, registered_at)
+    rows, with one projection query for the page's associations instead of
+    loading ORM objects.
+    """
+    associations = defaultdict(list)
+    if members:
+        result = await db.execute(
+            select(
+                MemberBlockAssociation.member_id,
+                MemberBlockAssociation.block_id,
+                MemberBlockAssociation.zone_id,
+                MemberBlockAssociation.phone_number,
+                MemberBlockAssociation.id_number,
+                MemberBlockAssociation.acc_number
+            )
+            .where(MemberBlockAssociation.member_id.in_([member.id for member in members]))
+            .order_by(MemberBlockAssociation.id)
+        )
+        for member_id, block_id, zone_id, phone_number, id_number, acc_number in result:
+            associations[member_id].append({
+                "block_id": block_id,
+                "zone_id": zone_id,
+                "phone_number": phone_number,
+                "id_number": id_number,
+                "acc_number": acc_number,
+            })
+
+    rows = []
+    for member_id, full_name, bank_id, registered_at in members:
+        bank = bank_catalogue.get(bank_id)
+        rows.append({
+            "id": member_id,
+            "full_name": full_name,
+            "bank": {"id": bank.id, "name": bank.name} if bank else None,
+            "registered_at": registered_at,
+            "associations": associations.get(member_id, []),
+        })
+    return rows
+
+
+def parse_import_file(content: bytes, filename: str | None, content_type: str | None) -> list[dict]:
+    """Parse an uploaded CSV or JSON Lines file into raw row dicts. Raises ValueError if unreadable."""
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError as e:
+        raise ValueError("File must be UTF-8 encoded") from e
+
+    name = (filename or "").lower()
+    if name.endswith((".jsonl", ".ndjson")) or content_type in ("application/x-ndjson", "application/jsonl"):
+        rows = []
+        for line_no, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON on line {line_no}") from e
+            if not isinstance(row, dict):
+                raise ValueError(f"Line {line_no} is not a JSON object")
+            rows.append(row)
+        return rows
+
+    if name.endswith(".csv") or content_type in ("text/csv", "application/csv"):
+        # Blank CSV cells mean "not provided"
+        return [
+            {key: (value if value != "" else None) for key, value in row.items()}
+            for row in csv.DictReader(io.StringIO(text))
+        ]
+
+    raise ValueError("Unsupported file type, upload a .csv or .jsonl file")
+
+
+def validate_import_rows(raw_rows: list[dict]) -> list[MemberImportRow | list[str]]:
+    """Each row as a MemberImportRow, or its field errors."""
+    rows = []
+    for raw in raw_rows:
+        try:
+            rows.append(MemberImportRow.model_validate(raw))
+        except ValidationError as e:
+            rows.append([
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+                for error in e.errors()
+            ])
+    return rows
+
+
+def read_import_file(content: bytes, filename: str | None, content_type: str | None) -> list[MemberImportRow | list[str]]:
+    """
+    Parse and validate an upload. CPU-bound and picklable, so import jobs
+    run it in their process pool rather than on the event loop.
+    """
+    return validate_import_rows(parse_import_file(content, filename, content_type))
+
+
+async def import_members(
+    db: AsyncSession,
+    parsed_rows: list[MemberImportRow | list[str]],
+    umbrella_id: int,
+    block_id: int,
+    block_zone_ids: set[int],
+    default_zone_id: int | None = None,
+    link_duplicates: bool = True,
+    progress: Callable[[int], Awaitable[None]] | None = None
+) -> BulkImportReport:
+    """
+    Check rows from read_import_file against one block and insert the valid
+    ones with batched multi-row INSERTs. Invalid rows are reported and
+    skipped. With `link_duplicates`, rows for people already registered in
+    another block of the umbrella are linked to those members (see
+    dedup.py). `progress` is awaited with the number of rows saved after
+    each batch. The caller commits the transaction.
+    """
+    results = [BulkImportRowResult(row=row_no, status="error") for row_no in range(1, len(parsed_rows) + 1)]
+    rows: list[tuple[int, MemberImportRow]] = []
+
+    # Rows that failed field validation carry their errors
+    for index, row in enumerate(parsed_rows):
+        if isinstance(row, list):
+            results[index].errors = row
+            continue
+
+        if row.zone_id is None:
+            row.zone_id = default_zone_id
+        if row.zone_id is None:
+            results[index].errors.append("zone_id: Field required")
+        elif row.zone_id not in block_zone_ids:
+            results[index].errors.append(f"zone_id: Zone {row.zone_id} is not in block {block_id}")
+        else:
+            rows.append((index, row))
+
+    # One lookup each for the referenced banks and the block's existing unique details
+    bank_ids = {row.bank_id for _, row in rows}
+    known_banks = set((await db.execute(select(Bank.id).where(Bank.id.in_(bank_ids)))).scalars()) if bank_ids else set()
+
+    existing = await db.execute(
+        select(
+            MemberBlockAssociation.member_id,
+            MemberBlockAssociation.phone_number,
+            MemberBlockAssociation.id_number,
+            MemberBlockAssociation.acc_number
+        ).where(MemberBlockAssociation.block_id == block_id)
+    )
+    block_member_ids = set()
+    taken = {field: set() for field in UNIQUE_FIELDS}
+    for member_id, phone_number, id_number, acc_number in existing:
+        block_member_ids.add(member_id)
+        taken["phone_number"].add(phone_number)
+        taken["id_number"].add(id_number)
+        taken["acc_number"].add(acc_number)
+
+    # Uniqueness against the block and against earlier rows of the same file
+    valid: list[tuple[int, MemberImportRow]] = []
+    for index, row in rows:
+        errors = []
+        if row.bank_id not in known_banks:
+            errors.append(f"bank_id: Bank {row.bank_id} does not exist")
+        for field in UNIQUE_FIELDS:
+            if getattr(row, field) in taken[field]:
+                errors.append(f"{field}: Already used in this block")
+        if errors:
+            results[index].errors = errors
+            continue
+        for field in UNIQUE_FIELDS:
+            taken[field].add(getattr(row, field))
+        valid.append((index, row))
+
+    # People already registered in other blocks join this one as they are
+    targets = [None] * len(valid)
+    if link_duplicates and valid:
+        targets = await link_targets(
+            db,
+            umbrella_id,
+            [(row.full_name, row.phone_number, row.id_number) for _, row in valid],
+            exclude_member_ids=block_member_ids
+        )
+    new_rows: list[tuple[int, MemberImportRow]] = []
+    linked_rows: list[tuple[int, int, MemberImportRow]] = []
+    linked_by_row: dict[int, int] = {}
+    for (index, row), member_id in zip(valid, targets):
+        if member_id is None:
+            new_rows.append((index, row))
+        elif member_id in linked_by_row:
+            results[index].errors = [f"Same member as row {linked_by_row[member_id] + 1}"]
+        else:
+            linked_by_row[member_id] = index
+            linked_rows.append((index, member_id, row))
+
+    # Batched inserts; RETURNING gives member ids in parameter order
+    for start in range(0, len(new_rows), IMPORT_BATCH_SIZE):
+        batch = new_rows[start:start + IMPORT_BATCH_SIZE]
+        member_ids = (await db.scalars(
+            insert(Member).returning(Member.id, sort_by_parameter_order=True),
+            [{"full_name": row.full_name, "bank_id": row.bank_id} for _, row in batch]
+        )).all()
+        for member_id, (index, row) in zip(member_ids, batch):
+            linked_rows.append((index, member_id, row))
+            results[index].status = "created"
+
+    for start in range(0, len(linked_rows), IMPORT_BATCH_SIZE):
+        batch = linked_rows[start:start + IMPORT_BATCH_SIZE]
+        await db.execute(
+            insert(MemberBlockAssociation),
+            [
+                {
+                    "member_id": member_id,
+                    "block_id": block_id,
+                    "zone_id": row.zone_id,
+                    "phone_number": row.phone_number,
+                    "id_number": row.id_number,
+                    "acc_number": row.acc_number,
+                }
+                for _, member_id, row in batch
+            ]
+        )
+        for index, member_id, _ in batch:
+            if results[index].status != "created":
+                results[index].status = "linked"
+            results[index].member_id = member_id
+        if progress is not None:
+            await progress(start + len(batch))
+
+    created = len(new_rows)
+    linked = len(linked_rows) - created
+    return BulkImportReport(
+        total=len(parsed_rows),
+        created=created,
+        linked=linked,
+        failed=len(parsed_rows) - created - linked,
+        results=results
+    )
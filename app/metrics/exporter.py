@@ -0,0 +1,47 @@
+import asyncio
+from ..config import settings
+from ..utils import pool_stats
+from ..auth.hashing import password_hasher
+from .registry import REGISTRY, SnapshotFiles, merge, render
+from .instruments import db_pool_connections, password_hash_pending
+
+
+# Shared snapshot directory, when several workers serve the same node
+snapshot_files = (
+    SnapshotFiles(settings.metrics_multiproc_dir, stale_after_seconds=3 * settings.metrics_flush_seconds)
+    if settings.metrics_multiproc_dir else None
+)
+
+
+@REGISTRY.on_collect
+def _refresh_gauges():
+    stats = pool_stats()
+    for state in ("size", "checked_out", "overflow"):
+        if state in stats:
+            db_pool_connections.set(stats[state], state)
+    password_hash_pending.set(password_hasher.pending)
+
+
+def _merged_exposition(snapshot: dict) -> str:
+    snapshot_files.write(snapshot)
+    return render(merge(snapshot_files.read_all()))
+
+
+async def exposition() -> str:
+    """Metrics for this worker, or for every worker sharing the snapshot directory."""
+    snapshot = REGISTRY.snapshot()
+    if snapshot_files is None:
+        return render(snapshot)
+    # File access runs off the event loop
+    return await asyncio.to_thread(_merged_exposition, snapshot)
+
+
+async def flush_periodically():
+    """
+    Keep this worker's snapshot file current so scrapes of other workers
+    include it, and archive the files of workers that have exited.
+    """
+    while True:
+        await asyncio.sleep(settings.metrics_flush_seconds)
+        await asyncio.to_thread(snapshot_files.write, REGISTRY.snapshot())
+        await asyncio.to_thread(snapshot_files.remove_exited)
@@ -0,0 +1,50 @@
+from .registry import Counter, Gauge, Histogram
+
+# Metric definitions, shared by the modules that record them
+
+http_requests = Counter(
+    "tabpay_http_requests_total", "HTTP requests by route template, method and status.",
+    ("method", "route", "status")
+)
+http_request_duration = Histogram(
+    "tabpay_http_request_duration_seconds", "HTTP request latency by route template and method.",
+    ("method", "route")
+)
+http_requests_in_progress = Gauge(
+    "tabpay_http_requests_in_progress", "HTTP requests currently being handled."
+)
+
+db_pool_connections = Gauge(
+    "tabpay_db_pool_connections", "Database pool connections by state (size, checked_out, overflow).",
+    ("state",)
+)
+db_pool_checkout_wait = Histogram(
+    "tabpay_db_pool_checkout_wait_seconds", "Time spent waiting to check a connection out of the pool.",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+)
+
+password_hash_duration = Histogram(
+    "tabpay_password_hash_seconds", "bcrypt hash/verify time including the wait for a worker.",
+    ("operation",),
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0)
+)
+password_hash_rejected = Counter(
+    "tabpay_password_hash_rejected_total", "bcrypt operations refused with 429 because the pool was saturated."
+)
+password_hash_pending = Gauge(
+    "tabpay_password_hash_pending", "bcrypt operations queued or running."
+)
+
+jwt_decode_duration = Histogram(
+    "tabpay_jwt_decode_seconds", "Access token decode and signature check time.",
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01)
+)
+
+rate_limit_requests = Counter(
+    "tabpay_rate_limit_requests_total", "Requests seen by the rate limiter by route class and decision (allowed, limited, shed).",
+    ("route_class", "decision")
+)
+rate_limit_in_flight = Gauge(
+    "tabpay_rate_limit_in_flight", "Requests in flight by route class.",
+    ("route_class",)
+)
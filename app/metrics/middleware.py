@@ -0,0 +1,114 @@
+import json
+import logging
+from time import perf_counter
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from ..config import settings
+from ..utils import QueryStats, request_query_stats, compact_statement
+from .instruments import http_requests, http_request_duration, http_requests_in_progress
+
+logger = logging.getLogger("app.requests")
+
+
+def server_timing(stats: QueryStats, elapsed: float) -> str:
+    """Server-Timing header value, shown per request in browser dev tools."""
+    timings = [
+        f'db;desc="{stats.count} queries";dur={stats.seconds_total * 1000:.2f}',
+        f"app;dur={elapsed * 1000:.2f}",
+    ]
+    if stats.count:
+        timings.insert(1, f"db-slowest;dur={stats.slowest_seconds * 1000:.2f}")
+    return ", ".join(timings)
+
+
+class QueryStatsMiddleware:
+    """
+    Counts the SQL statements and database time of each HTTP request, using
+    the engine events in app.utils. Adds a Server-Timing header and logs a
+    structured summary: at DEBUG normally, at WARNING when the request ran
+    more statements than settings.request_query_budget.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats(f"{scope['method']} {scope['path']}")
+        token = request_query_stats.set(stats)
+        started = perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                # Streamed bodies may run more statements after this point;
+                # those still count towards the logged summary
+                MutableHeaders(scope=message).append("Server-Timing", server_timing(stats, perf_counter() - started))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_query_stats.reset(token)
+            self._log(scope, stats, status_code, perf_counter() - started)
+
+    def _log(self, scope: Scope, stats: QueryStats, status_code: int, elapsed: float):
+        over_budget = stats.count > settings.request_query_budget
+        level = logging.WARNING if over_budget else logging.DEBUG
+        if not logger.isEnabledFor(level):
+            return
+
+        # Route template (e.g. /members/{member_id}) groups requests better than the raw path
+        route = scope.get("route")
+        summary = {
+            "event": "request",
+            "method": scope["method"],
+            "path": getattr(route, "path", scope["path"]),
+            "status": status_code,
+            "duration_ms": round(elapsed * 1000, 2),
+            "queries": stats.count,
+            "db_ms": round(stats.seconds_total * 1000, 2),
+            "slowest_ms": round(stats.slowest_seconds * 1000, 2),
+        }
+        if over_budget:
+            summary["slowest_statement"] = compact_statement(stats.slowest_statement or "")
+        logger.log(level, json.dumps(summary))
+
+
+class RequestMetricsMiddleware:
+    """
+    Request count and latency per route template and method. Templates
+    (e.g. /members/{member_id}) keep label cardinality bounded; requests that
+    match no route are grouped under "unmatched".
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = perf_counter()
+        status_code = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_progress.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_progress.dec()
+            route = getattr(scope.get("route"), "path", "unmatched")
+            http_requests.inc(scope["method"], route, status_code)
+            http_request_duration.observe(perf_counter() - started, scope["method"], route)
@@ -0,0 +1,303 @@
+"""
+Minimal in-process metrics (counters, gauges, histograms) rendered in the
+Prometheus text exposition format.
+
+With several worker processes each worker only sees its own requests. When
+METRICS_MULTIPROC_DIR is set, every worker periodically writes a snapshot
+to <dir>/<pid>-<start time>.json and a scrape of any worker merges all
+snapshots: counters and histograms are summed, gauges are reported per
+worker with a `pid` label (and only for workers that have written
+recently). Snapshots of exited workers are folded into <dir>/exited.json.
+"""
+import fcntl
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import Callable, Iterable
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series: dict[tuple[str, ...], list] = {}
+        REGISTRY.register(self)
+
+    def _new_series(self) -> list:
+        return [0.0]
+
+    def _get(self, labelvalues: tuple) -> list:
+        if len(labelvalues) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        key = tuple(str(value) for value in labelvalues)
+        series = self._series.get(key)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(key, self._new_series())
+        return series
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            series = [[list(key), list(value)] for key, value in self._series.items()]
+        return {"kind": self.kind, "help": self.documentation, "labelnames": list(self.labelnames), "series": series}
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labelvalues, amount: float = 1.0):
+        series = self._get(labelvalues)
+        with self._lock:
+            series[0] += amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, *labelvalues):
+        series = self._get(labelvalues)
+        with self._lock:
+            series[0] = value
+
+    def inc(self, *labelvalues, amount: float = 1.0):
+        series = self._get(labelvalues)
+        with self._lock:
+            series[0] += amount
+
+    def dec(self, *labelvalues, amount: float = 1.0):
+        self.inc(*labelvalues, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_series(self) -> list:
+        # Per-bucket counts (the last one is +Inf), then sum and count
+        return [0] * (len(self.buckets) + 1) + [0.0, 0]
+
+    def observe(self, value: float, *labelvalues):
+        series = self._get(labelvalues)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self) -> dict:
+        snapshot = super().snapshot()
+        snapshot["buckets"] = list(self.buckets)
+        return snapshot
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._collect_hooks: list[Callable[[], None]] = []
+
+    def register(self, metric: _Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+
+    def on_collect(self, hook: Callable[[], None]):
+        """Run `hook` before every snapshot, e.g. to refresh gauges from live state."""
+        self._collect_hooks.append(hook)
+        return hook
+
+    def snapshot(self) -> dict:
+        for hook in self._collect_hooks:
+            hook()
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+
+REGISTRY = Registry()
+
+
+# -------------------
+# Multi-process mode
+# -------------------
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class SnapshotFiles:
+    """
+    One JSON snapshot file per worker process in a shared directory, named
+    by PID and start time so a process reusing an exited worker's PID never
+    overwrites its counters. remove_exited folds the files of exited
+    workers into one archive of their counters and histograms, so the
+    directory does not grow with every restart and totals never go
+    backwards. File access blocks, so callers run these methods in a thread.
+    """
+
+    ARCHIVE = "exited.json"
+
+    def __init__(self, directory: str, stale_after_seconds: float):
+        self.directory = Path(directory)
+        self.stale_after_seconds = stale_after_seconds
+        self._pid: int | None = None
+        self._name = ""
+
+    @property
+    def name(self) -> str:
+        """This process's file name, renewed after a fork."""
+        pid = os.getpid()
+        if pid != self._pid:
+            self._pid, self._name = pid, f"{pid}-{time.time_ns()}.json"
+        return self._name
+
+    def _locked(self, operation: int):
+        """Open lock file, held until closed: shared for reads, exclusive to change the archive."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        lock = open(self.directory / "exited.lock", "a")
+        fcntl.flock(lock, operation)
+        return lock
+
+    def _archive(self) -> dict:
+        try:
+            return json.loads((self.directory / self.ARCHIVE).read_text())
+        except FileNotFoundError:
+            return {"files": [], "metrics": {}}
+
+    def write(self, snapshot: dict):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / self.name
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(snapshot))
+        os.replace(tmp, path)
+
+    def read_all(self) -> list[tuple[str, dict, bool]]:
+        """(pid, snapshot, fresh) for every worker that has written a snapshot, exited ones as one."""
+        now = time.time()
+        with self._locked(fcntl.LOCK_SH):
+            archive = self._archive()
+            snapshots = [("exited", archive["metrics"], False)]
+            for path in self.directory.glob("*-*.json"):
+                if path.name in archive["files"]:
+                    continue
+                try:
+                    fresh = now - path.stat().st_mtime <= self.stale_after_seconds
+                    snapshots.append((path.stem.split("-")[0], json.loads(path.read_text()), fresh))
+                except (OSError, ValueError):
+                    # Removed or being replaced by its worker; it is picked up next scrape
+                    continue
+        return snapshots
+
+    def remove_exited(self):
+        """Fold the snapshot files of exited workers (on this node) into the archive and delete them."""
+        with self._locked(fcntl.LOCK_EX):
+            archive = self._archive()
+            exited = []
+            for path in self.directory.glob("*-*.json"):
+                if path.name in archive["files"]:
+                    # Archived by a sweep that stopped before deleting it
+                    path.unlink(missing_ok=True)
+                    continue
+                pid = path.stem.split("-")[0]
+                if not pid.isdigit():
+                    continue
+                if int(pid) == os.getpid() and path.name != self.name or not _alive(int(pid)):
+                    exited.append(path)
+            if not exited:
+                return
+
+            snapshots = [("exited", archive["metrics"], False)]
+            for path in exited:
+                try:
+                    snapshots.append(("exited", json.loads(path.read_text()), False))
+                except ValueError:
+                    # Cut short when its worker died; its last counts are lost
+                    continue
+            metrics = {name: metric for name, metric in merge(snapshots).items() if metric["kind"] != "gauge"}
+
+            # The archive lists the files it includes until they are gone, so
+            # they are never counted twice
+            archive_path = self.directory / self.ARCHIVE
+            tmp = archive_path.with_suffix(".tmp")
+            tmp.write_text(json.dumps({"files": [path.name for path in exited], "metrics": metrics}))
+            os.replace(tmp, archive_path)
+            for path in exited:
+                path.unlink(missing_ok=True)
+
+
+def merge(snapshots: list[tuple[str, dict, bool]]) -> dict:
+    """
+    Combine worker snapshots. Counters and histograms of exited workers are
+    kept so totals never go backwards; gauges only come from fresh files.
+    """
+    merged: dict = {}
+    for pid, snapshot, fresh in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.setdefault(name, {**metric, "series": {}})
+            if metric["kind"] == "gauge":
+                if not fresh:
+                    continue
+                target["labelnames"] = metric["labelnames"] + ["pid"]
+                for labels, value in metric["series"]:
+                    target["series"][tuple(labels) + (pid,)] = value
+                continue
+            for labels, value in metric["series"]:
+                current = target["series"].get(tuple(labels))
+                target["series"][tuple(labels)] = value if current is None else [a + b for a, b in zip(current, value)]
+
+    for metric in merged.values():
+        metric["series"] = [[list(key), value] for key, value in metric["series"].items()]
+    return merged
+
+
+# -------------------
+# Exposition
+# -------------------
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != float("inf") else "+Inf"
+
+
+def render(snapshot: dict) -> str:
+    """Prometheus text exposition format, version 0.0.4."""
+    lines = []
+    for name, metric in sorted(snapshot.items()):
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        names = metric["labelnames"]
+        for labels, value in metric["series"]:
+            if metric["kind"] != "histogram":
+                lines.append(f"{name}{_labels(names, labels)} {_number(value[0])}")
+                continue
+            cumulative = 0
+            for bound, count in zip(metric["buckets"] + [float("inf")], value[:-2]):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{name}_bucket{_labels(names, labels, le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(names, labels)} {_number(value[-2])}")
+            lines.append(f"{name}_count{_labels(names, labels)} {value[-1]}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,70 @@
+import secrets
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..config import settings
+from ..database import get_db
+from ..models import UserRole
+from ..auth.Oauth2 import get_current_superuser, verify_access_token
+from ..auth.cache import Principal
+from ..auth.hashing import password_hasher
+from ..ratelimit.limiter import rate_limiter
+from ..utils import pool_stats
+from .exporter import exposition
+
+
+router = APIRouter(prefix="/metrics", tags=["Metrics"])
+
+
+async def authorize_scrape(
+    authorization: str | None = Header(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """Accept the configured scrape token, or a superuser's access token."""
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials!",
+        headers={"WWW-Authenticate": "Bearer"}
+    )
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise credentials_exception
+
+    if settings.metrics_token and secrets.compare_digest(token.encode(), settings.metrics_token.encode()):
+        return
+
+    principal = await verify_access_token(token, credentials_exception, db)
+    if principal.role != UserRole.SUPERUSER:
+        raise HTTPException(status_code=403, detail="Superuser privileges required")
+
+
+@router.get("", response_class=PlainTextResponse, dependencies=[Depends(authorize_scrape)])
+async def get_prometheus_metrics():
+    # Prometheus text exposition format
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(await exposition(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@router.get("/hashing")
+async def get_hashing_metrics(
+    superuser: Principal = Depends(get_current_superuser)
+):
+    # Queue depth and latency of the bcrypt worker pool
+    return password_hasher.stats()
+
+
+@router.get("/db-pool")
+async def get_db_pool_metrics(
+    superuser: Principal = Depends(get_current_superuser)
+):
+    # Checked-out/overflow connections and checkout wait time for this worker
+    return pool_stats()
+
+
+@router.get("/rate-limits")
+async def get_rate_limit_metrics(
+    superuser: Principal = Depends(get_current_superuser)
+):
+    # Allowed, limited (429) and shed (503) requests per route class on this worker
+    return rate_limiter.stats()
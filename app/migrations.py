@@ -0,0 +1,198 @@
+"""
+Schema changes that create_all cannot make on an existing database, such as
+new columns or index changes. `python -m app.bootstrap` applies them in order
+after create_all and records each one in schema_migrations.
+
+Each migration must be idempotent: on a fresh database create_all has already
+built the current schema, and the migration only needs to be recorded.
+"""
+from datetime import datetime
+from typing import Callable
+from sqlalchemy import MetaData, bindparam, inspect, insert, select, update
+from sqlalchemy.engine import Connection
+from .models import (
+    Base, SchemaMigration, ContributionBatch, ContributionRollup, Member, MemberBlockAssociation,
+    MEMBERS_FTS_DDL, MEMBER_UMBRELLAS_FTS_DDL, MEMBERS_FTS_REBUILD
+)
+from .contributions.rollups import rebuild_statements
+from .members.normalize import normalize_phone, normalize_identifier
+
+
+def _add_column(conn: Connection, table: str, column: str, ddl: str):
+    columns = {col["name"] for col in inspect(conn).get_columns(table)}
+    if column not in columns:
+        conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+
+
+def _contribution_batches(conn: Connection):
+    _add_column(conn, "contributions", "batch_id", "INTEGER REFERENCES contribution_batches (id)")
+
+
+def _money_minor_units(conn: Connection):
+    # Float amounts become integer cents, rounded once here
+    columns = {col["name"] for col in inspect(conn).get_columns("contributions")}
+    if "amount" in columns:
+        _add_column(conn, "contributions", "amount_minor", "BIGINT")
+        conn.exec_driver_sql("UPDATE contributions SET amount_minor = CAST(ROUND(amount * 100) AS BIGINT)")
+        conn.exec_driver_sql("ALTER TABLE contributions DROP COLUMN amount")
+
+
+# Superseded by the composite and unique indexes declared on the models
+REDUNDANT_INDEXES = [
+    "ix_users_id",
+    "ix_umbrellas_id",
+    "ix_blocks_id",
+    "ix_zones_id",
+    "ix_members_id",
+    "ix_meetings_id",
+    "ix_meetings_block_id",
+    "ix_banks_id",
+    "ix_member_block_associations_phone_number",
+    "ix_member_block_associations_id_number",
+    "ix_member_block_associations_acc_number",
+]
+
+
+def _index_plan(conn: Connection):
+    # Plain CREATE INDEX locks writes to the table on PostgreSQL while it
+    # builds; on large tables run this during a quiet period
+    for name in REDUNDANT_INDEXES:
+        conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+    for table in Base.metadata.sorted_tables:
+        columns = {col["name"] for col in inspect(conn).get_columns(table.name)}
+        for index in table.indexes:
+            # Indexes on columns added by later migrations are created there
+            if all(column.name in columns for column in index.columns):
+                index.create(conn, checkfirst=True)
+
+
+# Rows per executemany UPDATE when backfilling derived columns
+BACKFILL_BATCH_SIZE = 1000
+
+
+def _member_search(conn: Connection):
+    for column in ("phone_key", "id_key", "acc_key"):
+        _add_column(conn, "member_block_associations", column, "VARCHAR")
+
+    # Search keys of existing associations
+    table = MemberBlockAssociation.__table__
+    result = conn.execute(
+        select(table.c.id, table.c.phone_number, table.c.id_number, table.c.acc_number)
+        .where(table.c.phone_key.is_(None), table.c.id_key.is_(None), table.c.acc_key.is_(None))
+    )
+    rows = [
+        {
+            "row_id": row_id,
+            "phone_key": normalize_phone(phone_number),
+            "id_key": normalize_identifier(id_number),
+            "acc_key": normalize_identifier(acc_number),
+        }
+        for row_id, phone_number, id_number, acc_number in result
+    ]
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam("row_id"))
+        .values(
+            phone_key=bindparam("phone_key"),
+            id_key=bindparam("id_key"),
+            acc_key=bindparam("acc_key")
+        )
+    )
+    for start in range(0, len(rows), BACKFILL_BATCH_SIZE):
+        conn.execute(stmt, rows[start:start + BACKFILL_BATCH_SIZE])
+
+    # Name search index; on PostgreSQL creating the trigram index also creates the extension
+    if conn.dialect.name == "sqlite":
+        for statement in MEMBERS_FTS_DDL + MEMBER_UMBRELLAS_FTS_DDL + MEMBERS_FTS_REBUILD:
+            conn.exec_driver_sql(statement)
+    for index in list(table.indexes) + list(Member.__table__.indexes):
+        index.create(conn, checkfirst=True)
+
+
+def _rollup_backfill(conn: Connection):
+    # Rollups are derived data: recreate a table from before amounts were in
+    # cents, then compute every rollup from the existing contributions (on an
+    # upgrade, create_all has just built the table empty)
+    rollup_columns = {col["name"] for col in inspect(conn).get_columns("contribution_rollups")}
+    if "total_minor" not in rollup_columns:
+        ContributionRollup.__table__.drop(conn)
+        ContributionRollup.__table__.create(conn)
+    for stmt in rebuild_statements(conn.dialect.name):
+        conn.execute(stmt)
+
+
+# Registration date given to members created before it was recorded
+LEGACY_REGISTERED_AT = datetime(1970, 1, 1)
+
+
+def _member_registered_at(conn: Connection):
+    # The (registered_at, id) keyset of GET /members/ cannot hold NULLs: legacy
+    # members get the epoch, so they come first. SQLite cannot add NOT NULL to
+    # an existing column; the model's default covers new rows there.
+    table = Member.__table__
+    conn.execute(
+        update(table).where(table.c.registered_at.is_(None)).values(registered_at=LEGACY_REGISTERED_AT)
+    )
+    if conn.dialect.name == "postgresql":
+        conn.exec_driver_sql("ALTER TABLE members ALTER COLUMN registered_at SET NOT NULL")
+
+
+def _batch_idempotency_scope(conn: Connection):
+    # Idempotency keys become unique per submitter, and batches keep a hash of
+    # their payments. Batches recorded before keep a NULL hash.
+    _add_column(conn, "contribution_batches", "payload_hash", "VARCHAR")
+    table = ContributionBatch.__table__
+    global_keys = [
+        constraint["name"] for constraint in inspect(conn).get_unique_constraints(table.name)
+        if constraint["column_names"] == ["idempotency_key"]
+    ]
+    if not global_keys:
+        return
+    if conn.dialect.name == "sqlite":
+        # SQLite cannot drop a constraint: copy the rows into a table built
+        # from the model and put it in place of the old one
+        columns = ", ".join(column.name for column in table.columns)
+        metadata = MetaData()
+        for foreign_key in table.foreign_keys:  # referenced tables, for the REFERENCES clauses
+            foreign_key.column.table.to_metadata(metadata)
+        rebuilt = table.to_metadata(metadata, name=f"{table.name}_rebuilt")
+        rebuilt.create(conn)
+        conn.exec_driver_sql(f"INSERT INTO {rebuilt.name} ({columns}) SELECT {columns} FROM {table.name}")
+        conn.exec_driver_sql(f"DROP TABLE {table.name}")
+        conn.exec_driver_sql(f"ALTER TABLE {rebuilt.name} RENAME TO {table.name}")
+    else:
+        for name in global_keys:
+            conn.exec_driver_sql(f"ALTER TABLE {table.name} DROP CONSTRAINT {name}")
+        conn.exec_driver_sql(
+            f"ALTER TABLE {table.name} ADD CONSTRAINT _batch_submitter_key_uc UNIQUE (submitted_by, idempotency_key)"
+        )
+
+
+MIGRATIONS: list[tuple[str, Callable[[Connection], None]]] = [
+    ("0001_contribution_batches", _contribution_batches),
+    ("0002_money_minor_units", _money_minor_units),
+    ("0003_index_plan", _index_plan),
+    ("0004_member_search", _member_search),
+    ("0005_rollup_backfill", _rollup_backfill),
+    ("0006_member_registered_at", _member_registered_at),
+    ("0007_batch_idempotency_scope", _batch_idempotency_scope),
+]
+
+
+def pending_migrations(conn: Connection) -> list[str]:
+    """Names of the migrations not yet applied, all of them on an empty database."""
+    if not inspect(conn).has_table(SchemaMigration.__tablename__):
+        return [name for name, _ in MIGRATIONS]
+    applied = set(conn.execute(select(SchemaMigration.name)).scalars())
+    return [name for name, _ in MIGRATIONS if name not in applied]
+
+
+def run_migrations(conn: Connection):
+    """Apply pending migrations. Run inside a transaction via AsyncConnection.run_sync."""
+    applied = set(conn.execute(select(SchemaMigration.name)).scalars())
+    for name, migrate in MIGRATIONS:
+        if name in applied:
+            continue
+        migrate(conn)
+        conn.execute(insert(SchemaMigration).values(name=name))
+        print(f"Applied migration {name}")
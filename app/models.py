@@ -1,11 +1,12 @@
-from sqlalchemy import Column, ForeignKey, Integer, String, DateTime, Float, Enum, UniqueConstraint, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, ForeignKey, Integer, BigInteger, String, DateTime, Enum, UniqueConstraint, Boolean, Index, DDL, event, JSON, LargeBinary
+from sqlalchemy.orm import relationship, validates, deferred
 from sqlalchemy.sql import func
 from enum import Enum as PyEnum
 from datetime import datetime
 
 # Base class for all models
 from .utils import Base
+from .members.normalize import normalize_phone, normalize_identifier
 
 
 class RoleType(PyEnum):
@@ -17,6 +18,12 @@ class UserRole(PyEnum):
     SUPERUSER = "superuser"
     ADMIN = "admin"
 
+class JobStatus(PyEnum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
 # -------------------
 # User Models
 # -------------------
@@ -27,7 +34,7 @@ class User(Base):
     """
     __tablename__ = "users"
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     full_name = Column(String, index=True)
     email = Column(String, unique=True, index=True)
     phone_number = Column(String, unique=True, index=True)
@@ -41,13 +48,18 @@ class User(Base):
     # Relationships
     umbrella = relationship("Umbrella", back_populates="admin", uselist=False)
 
+    __table_args__ = (
+        # Only pending admins are indexed; the query must use `is_approved IS false` to match
+        Index('ix_users_pending_admins', role, postgresql_where=is_approved.is_(False), sqlite_where=is_approved.is_(False)),
+    )
+
 class Umbrella(Base):
     """
     An umbrella is the top‐level grouping in TabPay. An admin creates an umbrella,which contains blocks
     """
     __tablename__ = "umbrellas"
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     name = Column(String, unique=True, index=True)
     location = Column(String)
     created_at = Column(DateTime, default=datetime.now())
@@ -59,6 +71,10 @@ class Umbrella(Base):
     admin = relationship("User", back_populates="umbrella")
     blocks = relationship("Block", back_populates="parent_umbrella")
 
+    __table_args__ = (
+        Index('ix_umbrellas_admin_id', 'admin_id'),
+    )
+
 # -------------------
 # Organizational Structure
 # -------------------
@@ -68,7 +84,7 @@ class Block(Base):
     """
     __tablename__ = "blocks"
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     name = Column(String, index=True)
     created_at = Column(DateTime, default=datetime.now())
     
@@ -81,13 +97,17 @@ class Block(Base):
     meetings = relationship("Meeting", back_populates="block")
     roles = relationship("BlockRole", back_populates="block")
 
+    __table_args__ = (
+        Index('ix_blocks_parent_umbrella_created', 'parent_umbrella_id', 'created_at'),
+    )
+
 class Zone(Base):
     """
     Zones are subdivisions of a block. Members are added to zones.
     """
     __tablename__ = "zones"
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     name = Column(String, index=True)
     created_at = Column(DateTime, default=datetime.now())
 
@@ -98,6 +118,10 @@ class Zone(Base):
     # Relationships
     parent_block = relationship("Block", back_populates="zones")
     members = relationship("MemberBlockAssociation", back_populates="zone")
+
+    __table_args__ = (
+        Index('ix_zones_parent_block_created', 'parent_block_id', 'created_at'),
+    )
     
 
 # -------------------
@@ -109,17 +133,96 @@ class Member(Base):
     """
     __tablename__ = "members"
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     full_name = Column(String, index=True)
     bank_id = Column(Integer, ForeignKey("banks.id"))
-    registered_at = Column(DateTime, default=datetime.now())
+    registered_at = Column(DateTime, nullable=False, default=datetime.now)
     
     # Relationships
     block_associations = relationship("MemberBlockAssociation", back_populates="member")
     contributions = relationship("Contribution", back_populates="member")
     bank = relationship("Bank",back_populates="members")
+
+    __table_args__ = (
+        # Keyset pagination order of GET /members/
+        Index('ix_members_registered_at_id', 'registered_at', 'id'),
+    )
     
 
+# Name search indexes for GET /members/search. PostgreSQL uses a trigram
+# index (pg_trgm). SQLite uses an FTS5 table with one row per member: the
+# name, plus a "u<id>" token per umbrella the member belongs to, so a search
+# is narrowed to the caller's umbrella inside the index. Triggers on members
+# and member_block_associations keep it current.
+members_name_trgm_index = Index(
+    'ix_members_full_name_trgm',
+    Member.full_name,
+    postgresql_using='gin',
+    postgresql_ops={'full_name': 'gin_trgm_ops'}
+).ddl_if(dialect='postgresql')
+
+event.listen(
+    members_name_trgm_index,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
+
+
+def _member_umbrellas_sql(member_id: str) -> str:
+    return (
+        "(SELECT coalesce(group_concat('u' || parent_umbrella_id, ' '), '') FROM ("
+        "SELECT DISTINCT blocks.parent_umbrella_id FROM member_block_associations "
+        "JOIN blocks ON blocks.id = member_block_associations.block_id "
+        f"WHERE member_block_associations.member_id = {member_id}))"
+    )
+
+
+def _refresh_member_umbrellas_sql(member_id: str) -> str:
+    return f"UPDATE members_fts SET umbrellas = {_member_umbrellas_sql(member_id)} WHERE rowid = {member_id};"
+
+
+MEMBERS_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS members_fts USING fts5("
+    "full_name, umbrellas, tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    # Relevance comes from the name only
+    "INSERT INTO members_fts (members_fts, rank) VALUES ('rank', 'bm25(1.0, 0.0)')",
+    "CREATE TRIGGER IF NOT EXISTS members_fts_insert AFTER INSERT ON members BEGIN "
+    "INSERT INTO members_fts (rowid, full_name, umbrellas) VALUES (new.id, new.full_name, ''); END",
+    "CREATE TRIGGER IF NOT EXISTS members_fts_delete AFTER DELETE ON members BEGIN "
+    "DELETE FROM members_fts WHERE rowid = old.id; END",
+    "CREATE TRIGGER IF NOT EXISTS members_fts_rename AFTER UPDATE OF full_name ON members BEGIN "
+    "UPDATE members_fts SET full_name = new.full_name WHERE rowid = new.id; END",
+]
+
+MEMBER_UMBRELLAS_FTS_DDL = [
+    "CREATE TRIGGER IF NOT EXISTS members_fts_association_insert AFTER INSERT ON member_block_associations BEGIN "
+    f"{_refresh_member_umbrellas_sql('new.member_id')} END",
+    "CREATE TRIGGER IF NOT EXISTS members_fts_association_delete AFTER DELETE ON member_block_associations BEGIN "
+    f"{_refresh_member_umbrellas_sql('old.member_id')} END",
+    "CREATE TRIGGER IF NOT EXISTS members_fts_association_update "
+    "AFTER UPDATE OF member_id, block_id ON member_block_associations BEGIN "
+    f"{_refresh_member_umbrellas_sql('old.member_id')} {_refresh_member_umbrellas_sql('new.member_id')} END",
+]
+
+# Refills members_fts from scratch, e.g. for an existing database
+MEMBERS_FTS_REBUILD = [
+    "DELETE FROM members_fts",
+    "INSERT INTO members_fts (rowid, full_name, umbrellas) "
+    f"SELECT members.id, members.full_name, {_member_umbrellas_sql('members.id')} FROM members",
+]
+
+for statement in MEMBERS_FTS_DDL:
+    event.listen(Member.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+event.listen(Member.__table__, "before_drop", DDL("DROP TABLE IF EXISTS members_fts").execute_if(dialect="sqlite"))
+
+
+def _search_key(column: str, normalize):
+    """Insert default deriving a search key from a raw column, for Core inserts such as bulk imports."""
+    def default(context):
+        return normalize(context.get_current_parameters().get(column))
+    return default
+
+
 
 class MemberBlockAssociation(Base):
     """
@@ -135,10 +238,15 @@ class MemberBlockAssociation(Base):
     block_id = Column(Integer, ForeignKey("blocks.id"))
     zone_id = Column(Integer, ForeignKey("zones.id"))
     
-    # Unique member details per block
-    phone_number = Column(String, index=True)
-    id_number = Column(String, index=True)
-    acc_number = Column(String, index=True)
+    # Unique member details per block; the unique constraints below index them
+    phone_number = Column(String)
+    id_number = Column(String)
+    acc_number = Column(String)
+
+    # Normalized forms of the details above, for search (see members/normalize.py)
+    phone_key = Column(String, default=_search_key("phone_number", normalize_phone))
+    id_key = Column(String, default=_search_key("id_number", normalize_identifier))
+    acc_key = Column(String, default=_search_key("acc_number", normalize_identifier))
     
     # Relationships
     member = relationship("Member", back_populates="block_associations")
@@ -151,8 +259,29 @@ class MemberBlockAssociation(Base):
         UniqueConstraint('block_id', 'phone_number', name='_block_phone_uc'),
         UniqueConstraint('block_id', 'id_number', name='_block_id_uc'),
         UniqueConstraint('block_id', 'acc_number', name='_block_acc_uc'),
+        # _member_block_uc leads with member_id; this serves "members of these blocks"
+        Index('ix_member_block_associations_block_member', 'block_id', 'member_id'),
+        Index('ix_member_block_associations_zone_id', 'zone_id'),
+        Index('ix_member_block_associations_phone_key', 'phone_key'),
+        Index('ix_member_block_associations_id_key', 'id_key'),
+        Index('ix_member_block_associations_acc_key', 'acc_key'),
     )
 
+    @validates('phone_number', 'id_number', 'acc_number')
+    def _update_search_key(self, key, value):
+        # Keeps the keys current when details are set through the ORM
+        if key == 'phone_number':
+            self.phone_key = normalize_phone(value)
+        elif key == 'id_number':
+            self.id_key = normalize_identifier(value)
+        else:
+            self.acc_key = normalize_identifier(value)
+        return value
+
+
+for statement in MEMBER_UMBRELLAS_FTS_DDL:
+    event.listen(MemberBlockAssociation.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+
 # -------------------
 # Roles & Permissions
 # -------------------
@@ -184,12 +313,12 @@ class Meeting(Base):
     """
     __tablename__ = "meetings"
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     meeting_date = Column(DateTime)
     scheduled_at = Column(DateTime, default=datetime.utcnow)
     
     # Foreign Keys
-    block_id = Column(Integer, ForeignKey('blocks.id'), nullable=False, index=True)
+    block_id = Column(Integer, ForeignKey('blocks.id'), nullable=False)
     host_id = Column(Integer, ForeignKey('members.id'), nullable=False, index=True)
     
     # Relationships
@@ -197,11 +326,15 @@ class Meeting(Base):
     host = relationship("Member")
     contributions = relationship("Contribution", back_populates="meeting")
 
+    __table_args__ = (
+        Index('ix_meetings_block_date', 'block_id', 'meeting_date'),
+    )
+
 class Contribution(Base):
     __tablename__ = "contributions"
     
     id = Column(Integer, primary_key=True)
-    amount = Column(Float)
+    amount_minor = Column(BigInteger)  # in cents, so sums are exact
     date = Column(DateTime)
     
     # Foreign Keys
@@ -209,18 +342,149 @@ class Contribution(Base):
     payer_id = Column(Integer, ForeignKey("members.id"))
     block_id = Column(Integer, ForeignKey("blocks.id"))
     bank_id = Column(Integer, ForeignKey("banks.id"))
+    batch_id = Column(Integer, ForeignKey("contribution_batches.id"))
     
     # Relationships
     meeting = relationship("Meeting", back_populates="contributions")
     member = relationship("Member", back_populates="contributions")
     block = relationship("Block")
+    batch = relationship("ContributionBatch", back_populates="contributions")
+
+    __table_args__ = (
+        # Covers meeting listings and statement aggregation without touching the table
+        Index('ix_contributions_meeting_payer_amount', 'meeting_id', 'payer_id', 'amount_minor'),
+        Index('ix_contributions_payer_date', 'payer_id', 'date'),
+        Index('ix_contributions_block_date', 'block_id', 'date'),
+        Index('ix_contributions_batch_id', 'batch_id'),
+    )
+
+
+class ContributionBatch(Base):
+    """
+    A meeting's worth of contributions submitted in one request. The client's
+    idempotency key is unique per submitter, so a retried submission is
+    recorded only once; payload_hash tells a retry from a reused key.
+    """
+    __tablename__ = "contribution_batches"
+
+    id = Column(Integer, primary_key=True)
+    idempotency_key = Column(String, nullable=False)
+    payload_hash = Column(String)  # NULL for batches recorded before it was kept
+    created_at = Column(DateTime, default=datetime.now)
+
+    # Foreign Keys
+    meeting_id = Column(Integer, ForeignKey("meetings.id"), nullable=False)
+    submitted_by = Column(Integer, ForeignKey("users.id"))
+
+    # Relationships
+    meeting = relationship("Meeting")
+    contributions = relationship("Contribution", back_populates="batch")
+
+    __table_args__ = (
+        UniqueConstraint('submitted_by', 'idempotency_key', name='_batch_submitter_key_uc'),
+    )
+
+
+class ContributionRollup(Base):
+    """
+    Pre-aggregated contribution totals, updated in the same transaction that
+    writes the contributions. Key parts that do not apply to a grain are 0
+    (or "" for period) rather than NULL, so the unique constraint covers all
+    grains:
+        (block, 0, 0, "")             block total
+        (block, 0, 0, "2025-03")      block total for a month
+        (block, meeting, 0, "")       meeting total
+        (block, 0, member, "")        member total within a block
+        (block, 0, member, "2025-03") member total for a month
+    """
+    __tablename__ = "contribution_rollups"
+
+    id = Column(Integer, primary_key=True)
+    block_id = Column(Integer, nullable=False)
+    meeting_id = Column(Integer, nullable=False, default=0)
+    member_id = Column(Integer, nullable=False, default=0)
+    period = Column(String, nullable=False, default="")
+    total_minor = Column(BigInteger, nullable=False, default=0)  # in cents
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint('block_id', 'meeting_id', 'member_id', 'period', name='_rollup_key_uc'),
+    )
 
 
 class Bank(Base):
     __tablename__ = 'banks'
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     name = Column(String, nullable=False, unique=True)
     paybill_no = Column(String, nullable=False, unique=True)
     
     # Relationship
     members = relationship("Member", back_populates="bank")
+
+
+# -------------------
+# Bootstrap Bookkeeping
+# -------------------
+class SeedState(Base):
+    """
+    Records the content hash of the last applied seed file (e.g. banks.json),
+    so unchanged seed data is not re-applied on every start.
+    """
+    __tablename__ = "seed_state"
+
+    name = Column(String, primary_key=True)
+    content_hash = Column(String, nullable=False)
+    applied_at = Column(DateTime, default=datetime.now)
+
+
+class ResourceVersion(Base):
+    """A change counter behind the ETags and caches of umbrellas/versions.py, shared by all workers."""
+    __tablename__ = "resource_versions"
+
+    key = Column(String, primary_key=True)  # e.g. "zones:umbrella:3"
+    version = Column(BigInteger, nullable=False, default=0)
+
+
+class SchemaMigration(Base):
+    """A schema change from app.migrations that has been applied to this database."""
+    __tablename__ = "schema_migrations"
+
+    name = Column(String, primary_key=True)
+    applied_at = Column(DateTime, default=datetime.now)
+
+
+# -------------------
+# Background Jobs
+# -------------------
+class Job(Base):
+    """
+    A long-running operation (import, export, rollup rebuild) queued by the
+    API and run by `python -m app.jobs.worker`. The table is the queue:
+    workers claim queued rows with FOR UPDATE SKIP LOCKED.
+    """
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    status = Column(Enum(JobStatus), nullable=False, default=JobStatus.QUEUED)
+    params = Column(JSON, nullable=False, default=dict)
+    payload = deferred(Column(LargeBinary))  # uploaded file, dropped once the job finishes
+    progress = Column(Integer, nullable=False, default=0)
+    total = Column(Integer)  # None while unknown
+    result = Column(JSON)
+    error = Column(String)
+    attempts = Column(Integer, nullable=False, default=0)
+    worker = Column(String)  # host:pid of the worker running it
+    created_at = Column(DateTime, default=datetime.now)
+    started_at = Column(DateTime)
+    heartbeat_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+    # Foreign Keys
+    umbrella_id = Column(Integer, ForeignKey("umbrellas.id"))
+    created_by = Column(Integer, ForeignKey("users.id"))
+
+    __table_args__ = (
+        # Claiming the oldest queued job, and finding running jobs whose worker died
+        Index('ix_jobs_status_id', 'status', 'id'),
+    )
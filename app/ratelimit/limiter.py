@@ -0,0 +1,182 @@
+"""
+Token-bucket rate limits and concurrency caps per route class.
+
+Every request falls into a route class by method and path. Each client
+gets one token bucket per class, holding up to N tokens that refill over
+the configured period (settings.rate_limits). A request spends a token or
+is refused with 429. Clients are principals, read from the subject of a
+bearer token whose signature checks out, or IP addresses. Forged or
+expired tokens count against their IP, so nobody can drain another user's
+bucket or mint fresh buckets with made-up subjects.
+
+Separately, each class caps the requests in flight on this worker
+(settings.concurrency_limits). Requests over the cap are shed with 503
+before they queue behind the event loop, the database pool or bcrypt.
+"""
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from time import monotonic
+from typing import Protocol
+from jose import JWTError, jwt
+from starlette.types import Scope
+from ..config import settings
+from ..metrics.instruments import rate_limit_requests, rate_limit_in_flight
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600}
+
+
+def parse_rate(value: str) -> tuple[int, float]:
+    """'10/minute' -> (10 tokens, refilled over 60 seconds)."""
+    count, _, period = value.partition("/")
+    return int(count), PERIODS[period.strip()]
+
+
+@dataclass(frozen=True, slots=True)
+class RouteClass:
+    name: str
+    pattern: re.Pattern
+    methods: frozenset[str] | None = None  # None matches any method
+    by_ip: bool = False  # key by IP even when a bearer token is sent
+
+
+# First match wins; requests matching none (metrics scrapes, docs) are not limited
+ROUTE_CLASSES = (
+    RouteClass("exempt", re.compile(r"^/(metrics|docs|redoc|openapi\.json)(/|$)")),
+    # bcrypt: login and registration
+    RouteClass("auth", re.compile(r"^/auth/"), methods=frozenset({"POST"}), by_ip=True),
+    # Imports, exports, statements and schedules touch whole blocks
+    RouteClass("bulk", re.compile(r"^/(members/bulk-import|exports|contributions/statements|meetings/schedule)(/|$)")),
+    RouteClass("read", re.compile(r"^/"), methods=frozenset({"GET", "HEAD"})),
+    RouteClass("write", re.compile(r"^/")),
+)
+
+
+class BucketStore(Protocol):
+    """
+    Token buckets by key, each holding up to `capacity` tokens and refilled
+    at `capacity / period` per second. `take` refills and spends in one
+    atomic step: two workers taking from the same bucket at once must never
+    both spend its last token. Buckets nobody has used yet start full.
+    """
+
+    async def take(self, key: str, capacity: int, period: float) -> float:
+        """Spend a token from bucket `key`: 0 if there was one, else seconds until there is."""
+        ...
+
+
+class LocalBucketStore:
+    """In-process buckets; the least recently used are evicted (and so start full again)."""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()  # key -> (tokens, updated at)
+
+    async def take(self, key: str, capacity: int, period: float) -> float:
+        now = monotonic()
+        tokens, updated_at = self._buckets.pop(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated_at) * capacity / period)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) * period / capacity
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+@dataclass(frozen=True, slots=True)
+class Rejection:
+    status_code: int
+    detail: str
+    retry_after: float
+
+
+def _header(scope: Scope, name: bytes) -> str | None:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+class RateLimiter:
+    def __init__(self, store: BucketStore, rates: dict[str, str], concurrency: dict[str, int]):
+        self.store = store
+        self.rates = {name: parse_rate(value) for name, value in rates.items()}
+        self.concurrency = dict(concurrency)
+        self.in_flight: dict[str, int] = {}
+        self.decisions: dict[str, dict[str, int]] = {}
+
+    def classify(self, method: str, path: str) -> RouteClass | None:
+        """The route class of a request, or None when it is not limited."""
+        for route_class in ROUTE_CLASSES:
+            if route_class.pattern.match(path) and (route_class.methods is None or method in route_class.methods):
+                return route_class if route_class.name != "exempt" else None
+        return None
+
+    def client(self, route_class: RouteClass, scope: Scope) -> str:
+        if not route_class.by_ip:
+            scheme, _, token = (_header(scope, b"authorization") or "").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                try:
+                    subject = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm]).get("sub")
+                except JWTError:
+                    subject = None
+                if subject:
+                    return f"user:{subject}"
+
+        forwarded = _header(scope, b"x-forwarded-for") if settings.rate_limit_trust_forwarded_for else None
+        if forwarded:
+            return f"ip:{forwarded.split(',')[0].strip()}"
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}"
+
+    def _record(self, route_class: str, decision: str):
+        counts = self.decisions.setdefault(route_class, {"allowed": 0, "limited": 0, "shed": 0})
+        counts[decision] += 1
+        rate_limit_requests.inc(route_class, decision)
+
+    async def admit(self, route_class: RouteClass, scope: Scope) -> Rejection | None:
+        """Take a token and a concurrency slot, or say why the request is refused. Pair with release()."""
+        name = route_class.name
+        rate = self.rates.get(name)
+        if rate is not None:
+            wait = await self.store.take(f"{name}:{self.client(route_class, scope)}", *rate)
+            if wait > 0:
+                self._record(name, "limited")
+                return Rejection(429, "Too many requests, try again shortly", wait)
+
+        cap = self.concurrency.get(name)
+        in_flight = self.in_flight.get(name, 0)
+        if cap is not None and in_flight >= cap:
+            self._record(name, "shed")
+            return Rejection(503, "Server busy, try again shortly", 1)
+
+        self.in_flight[name] = in_flight + 1
+        rate_limit_in_flight.inc(name)
+        self._record(name, "allowed")
+        return None
+
+    def release(self, route_class: RouteClass):
+        self.in_flight[route_class.name] -= 1
+        rate_limit_in_flight.dec(route_class.name)
+
+    def stats(self) -> dict:
+        return {
+            name: {
+                "rate": settings.rate_limits.get(name),
+                "max_concurrency": self.concurrency.get(name),
+                "in_flight": self.in_flight.get(name, 0),
+                **self.decisions.get(name, {"allowed": 0, "limited": 0, "shed": 0}),
+            }
+            for name in dict.fromkeys([*self.rates, *self.concurrency])
+        }
+
+
+rate_limiter = RateLimiter(
+    LocalBucketStore(max_keys=settings.rate_limit_max_clients),
+    rates=settings.rate_limits,
+    concurrency=settings.concurrency_limits
+)
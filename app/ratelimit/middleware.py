@@ -0,0 +1,41 @@
+import math
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+from .limiter import rate_limiter
+
+
+class RateLimitMiddleware:
+    """
+    Applies the rate limits and concurrency caps of app.ratelimit.limiter
+    before the request reaches routing, dependencies or the database.
+    Refused requests get 429 or 503 with a Retry-After header.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route_class = rate_limiter.classify(scope["method"], scope["path"])
+        if route_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        rejection = await rate_limiter.admit(route_class, scope)
+        if rejection is not None:
+            response = JSONResponse(
+                {"detail": rejection.detail},
+                status_code=rejection.status_code,
+                headers={"Retry-After": str(max(1, math.ceil(rejection.retry_after)))}
+            )
+            await response(scope, receive, send)
+            return
+
+        # The slot is held until the response, streamed bodies included, is sent
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            rate_limiter.release(route_class)
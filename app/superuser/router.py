@@ -6,6 +6,7 @@ from .schema import SuperuserCreate
 from sqlalchemy import select
 from ..utils import hash_password
 from ..auth.Oauth2 import get_current_superuser
+from ..auth.cache import Principal, principal_cache
 from .schema import AdminResponse 
 
 
@@ -15,12 +16,12 @@ router = APIRouter(prefix="/superuser", tags=["Superuser"])
 @router.get("/pending-admins/", response_model=list[AdminResponse])
 async def get_pending_admins(
     db: AsyncSession = Depends(get_db),
-    superuser: User = Depends(get_current_superuser)
+    superuser: Principal = Depends(get_current_superuser)
 ):
     result = await db.execute(
         select(User).where(
             User.role == UserRole.ADMIN,
-            User.is_approved == False
+            User.is_approved.is_(False)
         )
     )
     pending_admins = result.scalars().all()  
@@ -31,7 +32,7 @@ async def get_pending_admins(
 async def approve_admin(
     admin_id: int,
     db: AsyncSession = Depends(get_db),
-    superuser: User = Depends(get_current_superuser)
+    superuser: Principal = Depends(get_current_superuser)
 ):
     superuser = await db.execute(
         select(User).where(
@@ -47,5 +48,8 @@ async def approve_admin(
         user.is_approved = True
         await db.commit()
         await db.refresh(user)
+
+        # Drop the stale unapproved principal so the approval applies at once
+        principal_cache.invalidate_user(user.id)
         return user
     raise HTTPException(status_code=404,detail="Superuser not found")
\ No newline at end of file
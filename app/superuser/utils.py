@@ -2,7 +2,7 @@ from sqlalchemy.future import select
 from ..models import User, UserRole
 from ..database import async_session
 from ..config import settings
-from ..utils import hash_password
+from ..auth.hashing import password_hasher
 
 
 async def create_initial_superuser():
@@ -28,7 +28,7 @@ async def create_initial_superuser():
 
         # Create new superuser
         try:
-            hashed_password = hash_password(settings.superuser_password)
+            hashed_password = await password_hasher.hash(settings.superuser_password)
             superuser = User(
                 email=settings.superuser_email,
                 password=hashed_password,
@@ -0,0 +1,136 @@
+from dataclasses import dataclass, field
+from time import monotonic
+from typing import Mapping, Protocol
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..config import settings
+from ..models import Block, Zone
+from .versions import hierarchy_keys, resource_versions
+
+
+@dataclass(frozen=True, slots=True)
+class UmbrellaHierarchy:
+    """The block and zone ids under one umbrella."""
+    umbrella_id: int | None
+    block_ids: frozenset[int]
+    zone_blocks: Mapping[int, int] = field(default_factory=dict)  # zone id -> block id
+    version: str = ""  # blocks version of the umbrella it was built at
+
+    @property
+    def zone_ids(self) -> frozenset[int]:
+        return frozenset(self.zone_blocks)
+
+    def zones_in_block(self, block_id: int) -> set[int]:
+        return {zone_id for zone_id, parent_id in self.zone_blocks.items() if parent_id == block_id}
+
+
+class HierarchyBackend(Protocol):
+    """
+    Storage for built hierarchies. A shared implementation (e.g. backed by a
+    cache server) keeps several workers consistent; LocalHierarchyBackend is
+    the in-process stand-in.
+    """
+
+    async def get(self, umbrella_id: int) -> UmbrellaHierarchy | None: ...
+
+    async def set(self, hierarchy: UmbrellaHierarchy) -> None: ...
+
+    async def invalidate(self, umbrella_id: int) -> None: ...
+
+
+class LocalHierarchyBackend:
+    """
+    In-process backend. Invalidations only reach this worker; HierarchyIndex
+    checks each entry against the database version, and entries also expire
+    after a TTL.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._entries: dict[int, tuple[float, UmbrellaHierarchy]] = {}
+
+    async def get(self, umbrella_id: int) -> UmbrellaHierarchy | None:
+        entry = self._entries.get(umbrella_id)
+        if entry is None:
+            return None
+        expires_at, hierarchy = entry
+        if expires_at < monotonic():
+            del self._entries[umbrella_id]
+            return None
+        return hierarchy
+
+    async def set(self, hierarchy: UmbrellaHierarchy) -> None:
+        self._entries[hierarchy.umbrella_id] = (monotonic() + self.ttl_seconds, hierarchy)
+
+    async def invalidate(self, umbrella_id: int) -> None:
+        self._entries.pop(umbrella_id, None)
+
+
+class HierarchyIndex:
+    """
+    Lazily built umbrella -> blocks -> zones index. Block, zone and umbrella
+    writes bump the umbrella's blocks version (see versions.py), and a cached
+    entry built at an older version is rebuilt, so a change made on any
+    worker is seen by the next request.
+    """
+
+    def __init__(self, backend: HierarchyBackend):
+        self.backend = backend
+
+    async def get(
+        self,
+        db: AsyncSession,
+        umbrella_id: int | None,
+        fresh: bool = False,
+        version: str | None = None
+    ) -> UmbrellaHierarchy:
+        """
+        The umbrella's blocks and zones. Writes pass `fresh` to read them from
+        the database: between a commit and its version bump, a cached entry can
+        still list a deleted block or zone whose id has been reused elsewhere.
+        Reads that already have the umbrella's version (ConditionalGet's
+        hierarchy_version) pass it as `version` to skip looking it up again;
+        otherwise it is read on `db`, so no second connection is checked out.
+        """
+        # Admins without an umbrella own nothing
+        if umbrella_id is None:
+            return UmbrellaHierarchy(umbrella_id=None, block_ids=frozenset())
+
+        # Built without reading the version, so it is not cached
+        if fresh:
+            return await self._build(db, umbrella_id, "")
+
+        if version is None:
+            version = await resource_versions.token(db, hierarchy_keys(umbrella_id))
+        hierarchy = await self.backend.get(umbrella_id)
+        if hierarchy is None or hierarchy.version != version:
+            hierarchy = await self._build(db, umbrella_id, version)
+            await self.backend.set(hierarchy)
+        return hierarchy
+
+    async def invalidate(self, umbrella_id: int | None):
+        if umbrella_id is not None:
+            await self.backend.invalidate(umbrella_id)
+
+    async def _build(self, db: AsyncSession, umbrella_id: int, version: str) -> UmbrellaHierarchy:
+        # One query for the whole tree; blocks without zones come back with a NULL zone
+        result = await db.execute(
+            select(Block.id, Zone.id)
+            .outerjoin(Zone, Zone.parent_block_id == Block.id)
+            .where(Block.parent_umbrella_id == umbrella_id)
+        )
+        block_ids = set()
+        zone_blocks = {}
+        for block_id, zone_id in result:
+            block_ids.add(block_id)
+            if zone_id is not None:
+                zone_blocks[zone_id] = block_id
+        return UmbrellaHierarchy(
+            umbrella_id=umbrella_id,
+            block_ids=frozenset(block_ids),
+            zone_blocks=zone_blocks,
+            version=version
+        )
+
+
+hierarchy_index = HierarchyIndex(LocalHierarchyBackend(ttl_seconds=settings.hierarchy_cache_ttl_seconds))
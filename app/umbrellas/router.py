@@ -1,8 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from ..database import get_db
-from ..models import User, Umbrella, UserRole
+from ..models import Umbrella, UserRole
 from .schema import UmbrellaCreate, UmbrellaResponse, UmbrellaUpdate
 from ..auth.Oauth2 import get_current_admin, get_current_user
+from ..auth.cache import Principal, principal_cache
+from .hierarchy import hierarchy_index
+from .versions import conditional_get, resource_versions
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
@@ -15,10 +18,10 @@ router = APIRouter(prefix="/umbrellas", tags=["Umbrellas"])
 async def create_umbrella(
     umbrella: UmbrellaCreate,
     db: AsyncSession = Depends(get_db),
-    current_admin: User = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin)
 ):
-    # current_admin.umbrella is now eagerly loaded in get_current_admin.
-    if current_admin.umbrella:
+    # The umbrella id is part of the cached principal.
+    if current_admin.umbrella_id is not None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Admin already has an umbrella"
@@ -34,6 +37,10 @@ async def create_umbrella(
     db.add(new_umbrella)
     await db.commit()
     await db.refresh(new_umbrella)
+
+    # The admin's cached principal no longer reflects their umbrella
+    principal_cache.invalidate_user(current_admin.id)
+    await resource_versions.bump("umbrellas", new_umbrella.id)
     
     # Re-query the umbrella to eagerly load the 'blocks' relationship.
     result = await db.execute(
@@ -51,9 +58,16 @@ async def create_umbrella(
 
 @router.get("/", response_model=list[UmbrellaResponse])
 async def get_all_umbrellas(
+    request: Request,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
+    # Unchanged since the client's copy, or already serialized: answer from the
+    # version counters without querying the resource
+    check = await conditional_get(request, db, "umbrellas", current_user)
+    if check.cached is not None:
+        return check.cached
+
     # For superusers, return all umbrellas
     if current_user.role == UserRole.SUPERUSER:
         result = await db.execute(
@@ -61,11 +75,10 @@ async def get_all_umbrellas(
             .options(selectinload(Umbrella.blocks))
             .order_by(Umbrella.created_at)
         )
-        return result.scalars().all()
+        return check.respond([UmbrellaResponse.model_validate(umbrella) for umbrella in result.scalars()])
     
     # For admins, return their own umbrella
-    umbrella = current_user.umbrella
-    if not umbrella:
+    if current_user.umbrella_id is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No umbrella found for this admin"
@@ -75,17 +88,22 @@ async def get_all_umbrellas(
     result = await db.execute(
         select(Umbrella)
         .options(selectinload(Umbrella.blocks))
-        .where(Umbrella.id == umbrella.id)
+        .where(Umbrella.id == current_user.umbrella_id)
     )
-    return [result.scalar_one()]
+    return check.respond([UmbrellaResponse.model_validate(result.scalar_one())])
 
 
 @router.get("/{umbrella_id}", response_model=UmbrellaResponse)
 async def get_umbrella_by_id(
     umbrella_id: int,
+    request: Request,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
+    check = await conditional_get(request, db, "umbrellas", current_user)
+    if check.cached is not None:
+        return check.cached
+
     # Get umbrella with blocks
     result = await db.execute(
         select(Umbrella)
@@ -102,14 +120,13 @@ async def get_umbrella_by_id(
     
     # Authorization check
     if current_user.role == UserRole.ADMIN:
-        user_umbrella = current_user.umbrella
-        if not user_umbrella or user_umbrella.id != umbrella_id:
+        if current_user.umbrella_id != umbrella_id:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Not authorized to access this umbrella"
             )
     
-    return umbrella
+    return check.respond(UmbrellaResponse.model_validate(umbrella))
 
 
 @router.put("/{umbrella_id}", response_model=UmbrellaResponse)
@@ -117,7 +134,7 @@ async def update_umbrella(
     umbrella_id: int,
     umbrella_data: UmbrellaUpdate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     # Get umbrella with blocks
     result = await db.execute(
@@ -162,13 +179,14 @@ async def update_umbrella(
         await db.rollback()
         raise HTTPException(status_code=400, detail="Database integrity error")
 
+    await resource_versions.bump("umbrellas", umbrella_id)
     return updated_umbrella
 
 @router.delete("/{umbrella_id}")
 async def delete_umbrella(
     umbrella_id: int,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     # Get umbrella with blocks
     result = await db.execute(
@@ -203,4 +221,8 @@ async def delete_umbrella(
             detail="Cannot delete umbrella due to database constraints"
         )
 
+    principal_cache.invalidate_user(umbrella.admin_id)
+    await hierarchy_index.invalidate(umbrella_id)
+    await resource_versions.bump("umbrellas", umbrella_id)
+
     return {"message": "Umbrella deleted successfully"}
\ No newline at end of file
@@ -0,0 +1,231 @@
+"""
+Version counters and conditional GETs for the umbrella, block and zone read
+endpoints.
+
+Every write to an umbrella, block, zone or member bumps the counters of the
+responses that embed it. A read derives a weak ETag from the counters of its
+principal's scope, so a matching If-None-Match is answered with 304 before
+the resource is queried, and a serialized body can be reused while the
+version is unchanged. The counters live in the database: a 304 still costs
+one primary-key lookup, made on the request's session so it reuses that
+connection instead of checking out a second one.
+"""
+import hashlib
+from collections import OrderedDict
+from time import time
+from typing import Protocol, Sequence
+import orjson
+from fastapi import Request, Response, status
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from ..auth.cache import Principal
+from ..config import settings
+from ..models import ResourceVersion, UserRole
+from ..utils import async_session, upsert_insert
+
+# Clients may cache responses but must revalidate them with If-None-Match
+CACHE_CONTROL = "private, no-cache"
+
+# A change to one kind of resource also changes the responses that embed it:
+# umbrellas list their blocks, blocks embed their umbrella and list their
+# zones, zones embed their block and list their members. The members
+# version itself drives the in-process member search index.
+DEPENDENTS = {
+    "umbrellas": ("umbrellas", "blocks"),
+    "blocks": ("blocks", "umbrellas", "zones"),
+    "zones": ("zones", "blocks"),
+    "members": ("zones", "members"),
+}
+
+# Bodies larger than this are serialized on every request instead of cached
+MAX_CACHED_BODY_BYTES = 1024 * 1024
+
+
+def hierarchy_keys(umbrella_id: int) -> tuple[str, str]:
+    """Counters behind the umbrella's cached hierarchy (see hierarchy.py)."""
+    return (f"blocks:umbrella:{umbrella_id}", "blocks:all")
+
+
+def principal_scope(principal: Principal) -> str:
+    """Superusers see every umbrella, admins only their own."""
+    if principal.role == UserRole.SUPERUSER:
+        return "*"
+    return f"umbrella:{principal.umbrella_id}"
+
+
+class VersionBackend(Protocol):
+    """Storage for the counters, which every worker must see the same."""
+
+    async def tokens(self, db: AsyncSession, key_sets: Sequence[Sequence[str]]) -> list[str]:
+        """For each set of keys, an opaque value that changes whenever one of them is bumped."""
+        ...
+
+    async def bump(self, keys: Sequence[str]) -> None: ...
+
+
+class DatabaseVersionBackend:
+    """
+    Counters in the resource_versions table, so a bump on one worker (or by
+    a job or command line tool) is seen by all of them on their next read.
+    Tokens also roll over every `window_seconds` of wall-clock time, so a
+    process that died between its commit and its bump is caught up within
+    a window. Reads go through the caller's session; a bump commits on a
+    session of its own, so it never adds to the caller's transaction.
+    """
+
+    def __init__(self, sessionmaker: async_sessionmaker, window_seconds: float):
+        self.sessionmaker = sessionmaker
+        self.window_seconds = window_seconds
+
+    async def tokens(self, db: AsyncSession, key_sets: Sequence[Sequence[str]]) -> list[str]:
+        # All the sets in one lookup
+        all_keys = {key for keys in key_sets for key in keys}
+        result = await db.execute(
+            select(ResourceVersion.key, ResourceVersion.version).where(ResourceVersion.key.in_(all_keys))
+        )
+        counters = dict(result.all())
+        window = int(time() // self.window_seconds) if self.window_seconds > 0 else 0
+        return [f"{window}." + ".".join(str(counters.get(key, 0)) for key in keys) for keys in key_sets]
+
+    async def bump(self, keys: Sequence[str]) -> None:
+        async with self.sessionmaker() as db:
+            # Sorted so concurrent bumps lock rows in the same order
+            stmt = upsert_insert(ResourceVersion, db.bind.dialect.name).values(
+                [{"key": key, "version": 1} for key in sorted(set(keys))]
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[ResourceVersion.key],
+                set_={"version": ResourceVersion.version + 1}
+            )
+            await db.execute(stmt)
+            await db.commit()
+
+
+class ResourceVersions:
+    """Per-kind, per-umbrella version counters and the ETags derived from them."""
+
+    def __init__(self, backend: VersionBackend):
+        self.backend = backend
+
+    async def bump(self, kind: str, umbrella_id: int | None):
+        """Record a change to a `kind` resource; `umbrella_id=None` means it may touch any umbrella."""
+        keys = []
+        for dependent in DEPENDENTS[kind]:
+            if umbrella_id is None:
+                keys.append(f"{dependent}:all")
+            else:
+                keys.extend((f"{dependent}:umbrella:{umbrella_id}", f"{dependent}:*"))
+        await self.backend.bump(keys)
+
+    async def token(self, db: AsyncSession, keys: Sequence[str]) -> str:
+        return (await self.backend.tokens(db, [keys]))[0]
+
+    def keys(self, kind: str, scope: str) -> tuple[str, str]:
+        """Counters behind the ETags of `kind` reads in a principal scope."""
+        return (f"{kind}:{scope}", f"{kind}:all")
+
+    def etag(self, token: str, scope: str, request: Request) -> str:
+        # The route and query are part of the tag, so one tag never validates another resource
+        key = f"{token}|{scope}|{request.url.path}?{request.url.query}"
+        return f'W/"{hashlib.blake2b(key.encode(), digest_size=12).hexdigest()}"'
+
+
+class ResponseCache:
+    """Serialized bodies keyed by (scope, route, ETag); a bumped version simply stops matching."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple[str, str, str], bytes] = OrderedDict()
+
+    def get(self, key: tuple[str, str, str]) -> bytes | None:
+        body = self._entries.get(key)
+        if body is not None:
+            self._entries.move_to_end(key)
+        return body
+
+    def set(self, key: tuple[str, str, str], body: bytes):
+        if self.max_entries <= 0 or len(body) > MAX_CACHED_BODY_BYTES:
+            return
+        self._entries[key] = body
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+resource_versions = ResourceVersions(
+    DatabaseVersionBackend(async_session, window_seconds=settings.resource_version_window_seconds)
+)
+response_cache = ResponseCache(max_entries=settings.response_cache_max_entries)
+
+
+def _dump_model(value):
+    # Schemas are dumped as FastAPI would for a response_model
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json", by_alias=True)
+    raise TypeError
+
+
+def _etag_matches(header: str | None, etag: str) -> bool:
+    # Weak comparison (RFC 9110 13.1.2): the W/ prefix is ignored
+    if not header:
+        return False
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in header.split(","))
+
+
+class ConditionalGet:
+    """
+    The version check of one read. `cached` is a ready 304, or a 200 from the
+    response cache, when the resource query can be skipped; otherwise build
+    the payload and return `respond(payload)`. `hierarchy_version` is the
+    version of the principal's umbrella hierarchy, read in the same lookup,
+    for routes that go on to use hierarchy_index.
+    """
+
+    def __init__(
+        self,
+        scope: str,
+        route: str,
+        etag: str,
+        cached: Response | None,
+        hierarchy_version: str | None = None
+    ):
+        self.scope = scope
+        self.route = route
+        self.etag = etag
+        self.cached = cached
+        self.hierarchy_version = hierarchy_version
+
+    @property
+    def headers(self) -> dict[str, str]:
+        return {"ETag": self.etag, "Cache-Control": CACHE_CONTROL}
+
+    def respond(self, payload) -> Response:
+        body = orjson.dumps(payload, default=_dump_model)
+        response_cache.set((self.scope, self.route, self.etag), body)
+        return Response(body, media_type="application/json", headers=self.headers)
+
+
+async def conditional_get(
+    request: Request,
+    db: AsyncSession,
+    kind: str,
+    principal: Principal
+) -> ConditionalGet:
+    scope = principal_scope(principal)
+    route = f"{request.url.path}?{request.url.query}"
+    key_sets = [resource_versions.keys(kind, scope)]
+    if principal.umbrella_id is not None:
+        key_sets.append(hierarchy_keys(principal.umbrella_id))
+    tokens = await resource_versions.backend.tokens(db, key_sets)
+    etag = resource_versions.etag(tokens[0], scope, request)
+    check = ConditionalGet(scope, route, etag, None, tokens[1] if len(tokens) > 1 else None)
+
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        check.cached = Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=check.headers)
+    else:
+        body = response_cache.get((scope, route, etag))
+        if body is not None:
+            check.cached = Response(body, media_type="application/json", headers=check.headers)
+    return check
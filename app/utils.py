@@ -1,21 +1,219 @@
+import json
+import logging
+from contextvars import ContextVar
+from time import perf_counter
 from passlib.context import CryptContext
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url, URL
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.ext.asyncio import async_sessionmaker
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from .config import settings
+from .metrics.instruments import db_pool_checkout_wait
 
 
 SQLALCHEMY_DATABASE_URL = settings.db_url
 
 
-engine = create_async_engine(SQLALCHEMY_DATABASE_URL, echo=True)
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long callers wait to check out a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def connect(self):
+        start = perf_counter()
+        try:
+            return super().connect()
+        finally:
+            elapsed = perf_counter() - start
+            self.checkouts += 1
+            self.wait_seconds_total += elapsed
+            self.wait_seconds_max = max(self.wait_seconds_max, elapsed)
+            db_pool_checkout_wait.observe(elapsed)
+
+
+def _pool_sizing() -> tuple[int, int]:
+    per_worker = max(2, settings.db_max_connections // max(1, settings.web_concurrency))
+    pool_size = settings.db_pool_size
+    if pool_size is None:
+        pool_size = max(1, per_worker * 2 // 3)
+    max_overflow = settings.db_max_overflow
+    if max_overflow is None:
+        max_overflow = max(0, per_worker - pool_size)
+    return pool_size, max_overflow
+
+
+def _engine_url(url: URL) -> URL:
+    # asyncpg caches prepared statements per connection
+    if url.get_driver_name() == "asyncpg" and "prepared_statement_cache_size" not in url.query:
+        url = url.update_query_dict({"prepared_statement_cache_size": str(settings.db_statement_cache_size)})
+    return url
+
+
+def _engine_options(url: URL) -> dict:
+    options = {
+        "echo": settings.db_echo,
+        "query_cache_size": settings.db_query_cache_size,
+    }
+    # SQLite uses per-file NullPool/StaticPool, which take no sizing options
+    if url.get_backend_name() == "sqlite":
+        return options
+
+    pool_size, max_overflow = _pool_sizing()
+    options.update(
+        poolclass=InstrumentedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+    )
+    return options
+
+
+_url = _engine_url(make_url(SQLALCHEMY_DATABASE_URL))
+
+engine = create_async_engine(_url, **_engine_options(_url))
 
 async_session = async_sessionmaker(engine, expire_on_commit=False)
 
 Base = declarative_base()
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# -------------------
+# Query instrumentation
+# -------------------
+sql_logger = logging.getLogger("app.sql")
+
+
+class QueryStats:
+    """Statements executed on behalf of one request."""
+
+    __slots__ = ("label", "count", "seconds_total", "slowest_seconds", "slowest_statement")
+
+    def __init__(self, label: str):
+        self.label = label
+        self.count = 0
+        self.seconds_total = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_statement: str | None = None
+
+    def record(self, statement: str, elapsed: float):
+        self.count += 1
+        self.seconds_total += elapsed
+        if elapsed > self.slowest_seconds:
+            self.slowest_seconds = elapsed
+            self.slowest_statement = statement
+
+
+# Set by QueryStatsMiddleware for the duration of a request
+request_query_stats: ContextVar[QueryStats | None] = ContextVar("request_query_stats", default=None)
+
+
+def compact_statement(statement: str, limit: int = 1000) -> str:
+    statement = " ".join(statement.split())
+    return statement if len(statement) <= limit else statement[:limit] + "..."
+
+
+def redact_parameters(parameters, executemany: bool = False):
+    """The shape of the bound parameters without their values."""
+    if executemany:
+        return f"<{len(parameters)} parameter sets>"
+    if isinstance(parameters, dict):
+        return {key: "?" for key in parameters}
+    if isinstance(parameters, (list, tuple)):
+        return ["?"] * len(parameters)
+    return "?"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started_at", []).append(perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = perf_counter() - conn.info["query_started_at"].pop()
+    stats = request_query_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+
+    if elapsed * 1000 >= settings.slow_query_ms:
+        sql_logger.warning(json.dumps({
+            "event": "slow_query",
+            "request": stats.label if stats else None,
+            "duration_ms": round(elapsed * 1000, 2),
+            "statement": compact_statement(statement),
+            "parameters": redact_parameters(parameters, executemany),
+        }))
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_started_at"):
+        conn.info["query_started_at"].pop()
+
+
+if settings.query_instrumentation:
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine.sync_engine, "handle_error", _handle_error)
+
+
+def upsert_insert(table, dialect_name: str):
+    """Dialect-specific INSERT supporting ON CONFLICT (PostgreSQL and SQLite)."""
+    if dialect_name == "postgresql":
+        return postgresql.insert(table)
+    if dialect_name == "sqlite":
+        return sqlite.insert(table)
+    raise NotImplementedError(f"Upserts are not supported on the {dialect_name} dialect")
+
+
+async def stream_partitions(stmt, chunk_size: int, scalars: bool = False):
+    """
+    Yield chunks of results from a server-side cursor, for streaming
+    responses. The request's session is closed once the endpoint returns,
+    so the stream owns a session for as long as the client is reading. ORM
+    objects are dropped from the identity map after each chunk, so memory
+    stays flat.
+    """
+    async with async_session() as db:
+        result = await db.stream(stmt.execution_options(yield_per=chunk_size))
+        if scalars:
+            result = result.scalars()
+        async for chunk in result.partitions():
+            yield chunk
+            db.expunge_all()
+
+
+def pool_stats() -> dict:
+    """Snapshot of the engine's connection pool, for sizing pools per node."""
+    pool = engine.sync_engine.pool
+    stats = {"pool": type(pool).__name__, "status": pool.status()}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+            max_overflow=pool._max_overflow,
+        )
+    if isinstance(pool, InstrumentedQueuePool):
+        stats.update(
+            checkouts=pool.checkouts,
+            wait_seconds_avg=pool.wait_seconds_total / pool.checkouts if pool.checkouts else 0.0,
+            wait_seconds_max=pool.wait_seconds_max,
+        )
+    return stats
+
+
+# Changing bcrypt_rounds marks existing hashes as needing an update; they are
+# re-hashed transparently on the next successful login.
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds)
 
 def hash_password(password: str):
     hashed_password = pwd_context.hash(password)
@@ -1,8 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from ..database import get_db
-from ..models import User, Zone, Block, UserRole
+from ..models import Zone, UserRole
 from .schema import ZoneCreate, ZoneResponse, ZoneUpdate
+from .utils import zone_rows
 from ..auth.Oauth2 import get_current_admin, get_current_user
+from ..auth.cache import Principal
+from ..auth.ownership import block_in_umbrella
+from ..umbrellas.hierarchy import hierarchy_index
+from ..umbrellas.versions import conditional_get, resource_versions
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
@@ -16,11 +21,10 @@ async def create_zone(
     zone: ZoneCreate,
     block_id: int,
     db: AsyncSession = Depends(get_db),
-    current_admin: User = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin)
 ):
     # Verify block belongs to admin's umbrella
-    block = await db.get(Block, block_id)
-    if not block or block.parent_umbrella_id != current_admin.umbrella.id:
+    if not await block_in_umbrella(db, block_id, current_admin.umbrella_id, fresh=True):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Block not found"
@@ -34,6 +38,8 @@ async def create_zone(
     db.add(new_zone)
     await db.commit()
     await db.refresh(new_zone)
+    await hierarchy_index.invalidate(current_admin.umbrella_id)
+    await resource_versions.bump("zones", current_admin.umbrella_id)
     
     # Re-query the zone with eager loading of both members and parent_block
     result = await db.execute(
@@ -53,42 +59,43 @@ async def create_zone(
 
 @router.get("/", response_model=list[ZoneResponse])
 async def get_all_zones(
+    request: Request,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
-    # Eagerly load both parent_block and members
-    options = [selectinload(Zone.parent_block), selectinload(Zone.members)]
-    
+    # Unchanged since the client's copy, or already serialized: answer from the
+    # version counters without querying the resource
+    check = await conditional_get(request, db, "zones", current_user)
+    if check.cached is not None:
+        return check.cached
+
+    # Column projections serialized straight to JSON, skipping ORM objects and response validation
     if current_user.role == UserRole.SUPERUSER:
-        result = await db.execute(
-            select(Zone)
-            .options(*options)
-            .order_by(Zone.created_at)
-        )
-        return result.scalars().all()
+        return check.respond(await zone_rows(db))
 
     # For admins, return zones only within their umbrella's blocks
-    if not current_user.umbrella:
+    if current_user.umbrella_id is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No umbrella found for this admin"
         )
 
-    result = await db.execute(
-        select(Zone)
-        .options(*options)
-        .join(Block)
-        .where(Block.parent_umbrella_id == current_user.umbrella.id)
-    )
-    return result.scalars().all()
+    # The umbrella's block ids come from the hierarchy cache, so no join is needed
+    hierarchy = await hierarchy_index.get(db, current_user.umbrella_id, version=check.hierarchy_version)
+    return check.respond(await zone_rows(db, hierarchy.block_ids))
 
 
 @router.get("/{zone_id}", response_model=ZoneResponse)
 async def get_zone_by_id(
     zone_id: int,
+    request: Request,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
+    check = await conditional_get(request, db, "zones", current_user)
+    if check.cached is not None:
+        return check.cached
+
     result = await db.execute(
         select(Zone)
         .options(
@@ -107,14 +114,14 @@ async def get_zone_by_id(
 
     # Authorization: Admins can only access their own zones
     if current_user.role == UserRole.ADMIN:
-        block = await db.get(Block, zone.parent_block_id)
-        if not block or block.parent_umbrella_id != current_user.umbrella.id:
+        # parent_block is already loaded, so no extra query is needed
+        if zone.parent_block.parent_umbrella_id != current_user.umbrella_id:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Not authorized to access this zone"
             )
 
-    return zone
+    return check.respond(ZoneResponse.model_validate(zone))
 
 
 
@@ -125,12 +132,12 @@ async def update_zone(
     zone_id: int,
     zone_data: ZoneUpdate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     result = await db.execute(
         select(Zone)
         .options(
-            selectinload(Zone.parent_block).selectinload(Block.parent_umbrella),
+            selectinload(Zone.parent_block),
             selectinload(Zone.members)  # Eagerly load members to avoid lazy loading during response serialization
         )
         .where(Zone.id == zone_id)
@@ -140,7 +147,8 @@ async def update_zone(
     if not zone:
         raise HTTPException(status_code=404, detail="Zone not found")
     
-    if current_user.role == UserRole.ADMIN and current_user.id != zone.parent_block.parent_umbrella.admin_id:
+    # parent_block is already loaded, so the check needs no query
+    if current_user.role == UserRole.ADMIN and zone.parent_block.parent_umbrella_id != current_user.umbrella_id:
         raise HTTPException(status_code=403, detail="Not authorized to update this zone")
     
     # Check for name uniqueness within the same block
@@ -160,6 +168,7 @@ async def update_zone(
         await db.rollback()
         raise HTTPException(status_code=400, detail="Database integrity error")
     
+    await resource_versions.bump("zones", zone.parent_block.parent_umbrella_id)
     return zone
 
 # Delete Zone
@@ -167,11 +176,11 @@ async def update_zone(
 async def delete_zone(
     zone_id: int,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     result = await db.execute(
         select(Zone)
-        .options(selectinload(Zone.members))
+        .options(selectinload(Zone.members), selectinload(Zone.parent_block))
         .where(Zone.id == zone_id)
     )
     zone = result.scalar_one_or_none()
@@ -179,7 +188,8 @@ async def delete_zone(
     if not zone:
         raise HTTPException(status_code=404, detail="Zone not found")
     
-    if current_user.role == UserRole.ADMIN and current_user.id != zone.parent_block.parent_umbrella.admin_id:
+    # parent_block is already loaded, so the check needs no query
+    if current_user.role == UserRole.ADMIN and zone.parent_block.parent_umbrella_id != current_user.umbrella_id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this zone")
     
     if zone.members:
@@ -192,5 +202,8 @@ async def delete_zone(
     except IntegrityError:
         await db.rollback()
         raise HTTPException(status_code=400, detail="Cannot delete zone due to database constraints")
+
+    await hierarchy_index.invalidate(zone.parent_block.parent_umbrella_id)
+    await resource_versions.bump("zones", zone.parent_block.parent_umbrella_id)
     
     return {"message": "Zone deleted successfully"}
\ No newline at end of file
@@ -0,0 +1,41 @@
+from collections import defaultdict
+from typing import Iterable
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models import Block, Zone, MemberBlockAssociation
+
+
+async def zone_rows(db: AsyncSession, block_ids: Iterable[int] | None = None) -> list[dict]:
+    """
+    ZoneResponse-shaped dicts built from two column projections (zones with
+    their block, then member ids per zone) instead of ORM objects, ready to
+    be serialized as-is. `block_ids` limits the zones to those blocks.
+    """
+    zones_stmt = (
+        select(Zone.id, Zone.name, Zone.created_at, Block.id, Block.name)
+        .join(Block, Block.id == Zone.parent_block_id)
+        .order_by(Zone.created_at, Zone.id)
+    )
+    members_stmt = (
+        select(MemberBlockAssociation.zone_id, MemberBlockAssociation.id, MemberBlockAssociation.id_number)
+        .where(MemberBlockAssociation.zone_id.is_not(None))
+        .order_by(MemberBlockAssociation.id)
+    )
+    if block_ids is not None:
+        zones_stmt = zones_stmt.where(Zone.parent_block_id.in_(block_ids))
+        members_stmt = members_stmt.where(MemberBlockAssociation.block_id.in_(block_ids))
+
+    members = defaultdict(list)
+    for zone_id, assoc_id, id_number in await db.execute(members_stmt):
+        members[zone_id].append({"id": assoc_id, "id_number": id_number})
+
+    return [
+        {
+            "id": zone_id,
+            "name": name,
+            "parent_block": {"id": block_id, "name": block_name},
+            "created_at": created_at,
+            "members": members.get(zone_id, []),
+        }
+        for zone_id, name, created_at, block_id, block_name in await db.execute(zones_stmt)
+    ]
@@ -0,0 +1,263 @@
+"""
+Load test for the main API endpoints. Seeds a database with synthetic data,
+drives the app in-process through an ASGI client and reports latency
+percentiles, throughput and SQL queries per request for each scenario.
+
+    python -m benchmarks.bench_api [--requests 200] [--concurrency 10]
+                                   [--db-url postgresql+asyncpg://...]
+                                   [--output results.json] [--compare old.json]
+
+Needs the packages in requirements-dev.txt. Without --db-url a scratch
+SQLite database is used. A --db-url database is
+dropped and recreated, so only point it at a throwaway database.
+
+Results are written as JSON (by default to benchmarks/results/) so runs can
+be compared with --compare.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import platform
+import subprocess
+import time
+from datetime import datetime
+from pathlib import Path
+
+from .common import configure, percentile
+
+RESULTS_DIR = Path(__file__).with_name("results")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-url", help="database to seed and test against (default: scratch SQLite)")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=10, help="requests in flight per scenario")
+    parser.add_argument("--umbrellas", type=int, default=2)
+    parser.add_argument("--blocks", type=int, default=5, help="blocks per umbrella")
+    parser.add_argument("--zones", type=int, default=4, help="zones per block")
+    parser.add_argument("--members", type=int, default=50, help="members per zone")
+    parser.add_argument("--meetings", type=int, default=12, help="meetings per block")
+    parser.add_argument("--scenario", action="append", help="run only these scenarios (repeatable)")
+    parser.add_argument("--output", type=Path, help="where to write the JSON results")
+    parser.add_argument("--compare", type=Path, help="earlier results file to compare against")
+    return parser.parse_args()
+
+
+args = parse_args()
+db_url = configure(args.db_url)
+
+import httpx
+from sqlalchemy import event
+from app.main import app
+from app.database import engine
+from .seed import ADMIN_PASSWORD, SeedSpec, member_name, seed
+
+
+class QueryCounter:
+    """Counts statements sent to the database by this process."""
+
+    def __init__(self):
+        self.count = 0
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *_):
+        self.count += 1
+
+
+class Scenario:
+    """A named request factory; `request(client, n)` sends the n-th request."""
+
+    def __init__(self, name, request):
+        self.name = name
+        self.request = request
+
+
+def build_scenarios(data, tokens: dict[str, str]) -> list[Scenario]:
+    admins = itertools.cycle(data.admin_emails)
+    counter = itertools.count(1)
+
+    def auth(email):
+        return {"Authorization": f"Bearer {tokens[email]}"}
+
+    async def login(client, n):
+        email = data.admin_emails[n % len(data.admin_emails)]
+        return await client.post("/auth/login", data={"username": email, "password": ADMIN_PASSWORD})
+
+    async def list_members(client, n):
+        return await client.get("/members/", params={"limit": 100}, headers=auth(next(admins)))
+
+    async def list_zones(client, n):
+        return await client.get("/zones/", headers=auth(next(admins)))
+
+    async def search_members(client, n):
+        email = next(admins)
+        members = data.member_ids[email]
+        member_id = members[(n * 7919) % len(members)]
+        # Alternate name prefixes, full names and phone numbers in another format
+        queries = (
+            member_name(member_id).split()[0][:3],
+            " ".join(member_name(member_id).split()[:2]),
+            f"+254 7{member_id:08d}",
+        )
+        return await client.get("/members/search", params={"q": queries[n % 3]}, headers=auth(email))
+
+    async def create_member(client, n):
+        email = next(admins)
+        zones = data.zone_ids[email]
+        unique = f"{next(counter):08d}"
+        return await client.post(
+            "/members/add-member/",
+            params={"zone_id": zones[n % len(zones)]},
+            json={
+                "full_name": f"New Member {unique}",
+                "bank_id": 1,
+                "phone_number": f"08{unique}",
+                "id_number": f"NEW{unique}",
+                "acc_number": f"NACC{unique}",
+            },
+            headers=auth(email)
+        )
+
+    async def update_member(client, n):
+        email = next(admins)
+        members = data.member_ids[email]
+        return await client.put(
+            f"/members/{members[n % len(members)]}",
+            json={"full_name": f"Renamed Member {n}"},
+            headers=auth(email)
+        )
+
+    async def schedule_meetings(client, n):
+        # A year of weekly meetings for every block of the umbrella, planned but not saved
+        return await client.post(
+            "/meetings/schedule",
+            params={"preview": "true"},
+            json={"start": "2026-01-08T18:00:00", "end": "2026-12-31T18:00:00"},
+            headers=auth(next(admins))
+        )
+
+    return [
+        Scenario("login", login),
+        Scenario("GET /members/", list_members),
+        Scenario("GET /zones/", list_zones),
+        Scenario("GET /members/search", search_members),
+        Scenario("POST /members/add-member/", create_member),
+        Scenario("PUT /members/{id}", update_member),
+        Scenario("POST /meetings/schedule", schedule_meetings),
+    ]
+
+
+async def run_scenario(client, scenario: Scenario, queries: QueryCounter, total: int, concurrency: int) -> dict:
+    latencies: list[float] = []
+    statuses: dict[str, int] = {}
+    sequence = iter(range(total))
+
+    async def worker():
+        for n in sequence:
+            start = time.perf_counter()
+            response = await scenario.request(client, n)
+            latencies.append(time.perf_counter() - start)
+            key = str(response.status_code)
+            statuses[key] = statuses.get(key, 0) + 1
+
+    queries_before = queries.count
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    # Every query in this window came from this scenario, so the average is exact
+    latencies.sort()
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "errors": sum(count for status, count in statuses.items() if not status.startswith("2")),
+        "statuses": statuses,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": latencies[-1] * 1000 if latencies else 0.0,
+        "throughput_rps": total / elapsed if elapsed else 0.0,
+        "queries_per_request": (queries.count - queries_before) / total if total else 0.0,
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=Path(__file__).parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: dict, baseline: dict | None):
+    header = f"{'scenario':<28}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>9}{'queries':>9}{'errors':>8}"
+    if baseline:
+        header += f"{'p95 vs base':>13}"
+    print(header)
+    for name, stats in results["scenarios"].items():
+        line = (
+            f"{name:<28}{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}"
+            f"{stats['throughput_rps']:>9.1f}{stats['queries_per_request']:>9.1f}{stats['errors']:>8}"
+        )
+        base = (baseline or {}).get("scenarios", {}).get(name)
+        if base and base["p95_ms"]:
+            line += f"{(stats['p95_ms'] / base['p95_ms'] - 1) * 100:>+12.0f}%"
+        print(line)
+
+
+async def main():
+    spec = SeedSpec(
+        umbrellas=args.umbrellas,
+        blocks=args.blocks,
+        zones=args.zones,
+        members=args.members,
+        meetings=args.meetings
+    )
+    print(f"Seeding {engine.url.render_as_string(hide_password=True)} ...")
+    data = await seed(spec)
+    print(", ".join(f"{table}: {rows}" for table, rows in data.rows.items()))
+
+    queries = QueryCounter()
+    results = {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "dialect": engine.dialect.name,
+        "seed": spec.__dict__,
+        "rows": data.rows,
+        "scenarios": {},
+    }
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            tokens = {}
+            for email in data.admin_emails:
+                response = await client.post("/auth/login", data={"username": email, "password": ADMIN_PASSWORD})
+                response.raise_for_status()
+                tokens[email] = response.json()["access_token"]
+
+            for scenario in build_scenarios(data, tokens):
+                if args.scenario and scenario.name not in args.scenario:
+                    continue
+                results["scenarios"][scenario.name] = await run_scenario(
+                    client, scenario, queries, args.requests, args.concurrency
+                )
+
+    await engine.dispose()
+
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+    print_results(results, baseline)
+
+    output = args.output or RESULTS_DIR / f"bench-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,137 @@
+"""
+CPU cost of the list endpoints' serialization paths, per 1k rows: ORM
+objects validated through the response models (the old path) against
+column projections dumped with orjson (the current path).
+
+    python -m benchmarks.bench_serialization [--rows 1000] [--repeat 20]
+
+Runs against a throwaway SQLite database; nothing else needs to be running.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from .common import configure
+
+configure()
+
+import orjson
+from pydantic import TypeAdapter
+from sqlalchemy import insert, select
+from sqlalchemy.orm import selectinload
+from app.database import Base, engine, async_session
+from app.models import Bank, Block, Member, MemberBlockAssociation, Umbrella, User, UserRole, Zone
+from app.banks.catalogue import bank_catalogue
+from app.members.schema import MemberPage, MemberResponse
+from app.members.utils import member_rows
+from app.zones.schema import ZoneResponse
+from app.zones.utils import zone_rows
+
+MEMBERS_PER_ZONE = 5
+
+
+async def seed(rows: int):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(Bank), [{"id": 1, "name": "Bench Bank", "paybill_no": "000000"}])
+        await conn.execute(insert(User), [{"id": 1, "email": "admin@example.com", "role": UserRole.ADMIN}])
+        await conn.execute(insert(Umbrella), [{"id": 1, "name": "Bench", "admin_id": 1}])
+        await conn.execute(insert(Block), [{"id": 1, "name": "Block", "parent_umbrella_id": 1}])
+        await conn.execute(insert(Zone), [{"id": z, "name": f"Zone {z}", "parent_block_id": 1} for z in range(1, rows + 1)])
+        await conn.execute(insert(Member), [{"id": m, "full_name": f"Member {m}", "bank_id": 1} for m in range(1, rows + 1)])
+        await conn.execute(insert(MemberBlockAssociation), [
+            {
+                "member_id": m,
+                "block_id": 1,
+                "zone_id": (m - 1) // MEMBERS_PER_ZONE + 1,
+                "phone_number": f"07{m:08d}",
+                "id_number": f"ID{m:08d}",
+                "acc_number": f"AC{m:08d}",
+            }
+            for m in range(1, rows + 1)
+        ])
+    await bank_catalogue.refresh()
+
+
+# Old paths: ORM objects with selectinload, validated and dumped like a response_model
+zone_adapter = TypeAdapter(list[ZoneResponse])
+page_adapter = TypeAdapter(MemberPage)
+
+
+async def zones_orm(db) -> bytes:
+    result = await db.execute(
+        select(Zone).options(selectinload(Zone.parent_block), selectinload(Zone.members)).order_by(Zone.created_at)
+    )
+    content = zone_adapter.validate_python(result.scalars().all(), from_attributes=True)
+    return json.dumps(zone_adapter.dump_python(content, mode="json")).encode()
+
+
+async def members_orm(db, rows: int) -> bytes:
+    result = await db.execute(
+        select(Member).options(selectinload(Member.block_associations)).order_by(Member.registered_at, Member.id).limit(rows)
+    )
+    page = MemberPage(items=[MemberResponse.from_member(member) for member in result.scalars()])
+    content = page_adapter.validate_python(page, from_attributes=True)
+    return json.dumps(page_adapter.dump_python(content, mode="json")).encode()
+
+
+# Current paths: column projections dumped with orjson
+async def zones_projection(db) -> bytes:
+    return orjson.dumps(await zone_rows(db))
+
+
+async def members_projection(db, rows: int) -> bytes:
+    result = await db.execute(
+        select(Member.id, Member.full_name, Member.bank_id, Member.registered_at)
+        .order_by(Member.registered_at, Member.id)
+        .limit(rows)
+    )
+    return orjson.dumps({"items": await member_rows(db, result.all()), "next_cursor": None})
+
+
+async def measure(run, repeat: int) -> float:
+    """Median process CPU seconds of one call, each in a fresh session."""
+    samples = []
+    for _ in range(repeat):
+        async with async_session() as db:
+            start = time.process_time()
+            await run(db)
+            samples.append(time.process_time() - start)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    await seed(args.rows)
+    try:
+        cases = [
+            ("GET /zones/", zones_orm, zones_projection),
+            (
+                "GET /members/",
+                lambda db: members_orm(db, args.rows),
+                lambda db: members_projection(db, args.rows),
+            ),
+        ]
+        print(f"{'endpoint':<16}{'orm ms/1k':>12}{'projection ms/1k':>18}{'speedup':>10}")
+        for name, old, new in cases:
+            # Warm up query compilation and caches before measuring
+            for run in (old, new):
+                async with async_session() as db:
+                    await run(db)
+            scale = 1000 / args.rows * 1000
+            old_ms = await measure(old, args.repeat) * scale
+            new_ms = await measure(new, args.repeat) * scale
+            print(f"{name:<16}{old_ms:>12.2f}{new_ms:>18.2f}{old_ms / new_ms:>9.1f}x")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
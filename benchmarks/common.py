@@ -0,0 +1,41 @@
+"""
+Shared setup for the benchmarks. Settings are read when `app` is first
+imported, so call configure() before importing anything from the app.
+"""
+import os
+import tempfile
+
+
+def configure(db_url: str | None = None) -> str:
+    """
+    Point the app at `db_url`, or at a scratch SQLite database, and fill in
+    the other required settings unless they are already set. Benchmarks
+    drop and recreate every table, so an existing DB_URL is never reused
+    implicitly. Returns the database URL in use.
+    """
+    if not db_url:
+        scratch = tempfile.mkdtemp(prefix="tabpay-bench-")
+        db_url = f"sqlite+aiosqlite:///{scratch}/bench.db"
+    os.environ["DB_URL"] = db_url
+
+    for key, value in {
+        "ALGORITHM": "HS256",
+        "SECRET_KEY": "bench",
+        "ACCESS_TOKEN_EXPIRES_MINUTES": "30",
+        "SUPERUSER_EMAIL": "bench@example.com",
+        "SUPERUSER_PASSWORD": "bench",
+        # Seeding runs multi-second statements that are not worth logging
+        "SLOW_QUERY_MS": "60000",
+        # Load tests drive a few principals far past the per-client limits
+        "RATE_LIMIT_ENABLED": "false",
+    }.items():
+        os.environ.setdefault(key, value)
+    return os.environ["DB_URL"]
+
+
+def percentile(sorted_samples: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_samples:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_samples)))
+    return sorted_samples[min(rank, len(sorted_samples)) - 1]
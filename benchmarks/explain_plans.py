@@ -0,0 +1,203 @@
+"""
+Query plans for the API's main access paths on a large synthetic dataset.
+Each query lists the index it is expected to use; the run reports the plan
+and whether that index appears in it.
+
+    python -m benchmarks.explain_plans [--db-url postgresql+asyncpg://...]
+                                       [--output plans.json]
+
+Without --db-url a scratch SQLite database is used. A --db-url database is
+dropped and recreated, so only point it at a throwaway database.
+"""
+import argparse
+import asyncio
+import json
+from datetime import datetime
+from pathlib import Path
+
+from .common import configure
+
+RESULTS_DIR = Path(__file__).with_name("results")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-url", help="database to seed and explain against (default: scratch SQLite)")
+    parser.add_argument("--umbrellas", type=int, default=10)
+    parser.add_argument("--blocks", type=int, default=10, help="blocks per umbrella")
+    parser.add_argument("--zones", type=int, default=5, help="zones per block")
+    parser.add_argument("--members", type=int, default=20, help="members per zone")
+    parser.add_argument("--meetings", type=int, default=26, help="meetings per block")
+    parser.add_argument("--output", type=Path, help="where to write the JSON results")
+    return parser.parse_args()
+
+
+args = parse_args()
+configure(args.db_url)
+
+from sqlalchemy import select, exists, or_, text, tuple_
+from app.database import engine
+from app.models import Block, Contribution, Meeting, Member, MemberBlockAssociation, Umbrella, User, UserRole, Zone
+from .seed import SeedSpec, seed
+
+
+def access_paths(block_ids: list[int]) -> list[tuple[str, str | tuple[str, ...], object]]:
+    """(name, expected index or alternatives, statement) mirroring the queries the routers run."""
+    first_block = block_ids[0]
+    return [
+        (
+            "principal lookup (umbrella of admin)",
+            "ix_umbrellas_admin_id",
+            select(User.id, User.email, User.role, User.is_approved, Umbrella.id)
+            .outerjoin(Umbrella, Umbrella.admin_id == User.id)
+            .where(User.email == "admin1@bench.example.com"),
+        ),
+        (
+            "pending admins",
+            "ix_users_pending_admins",
+            select(User.id).where(User.role == UserRole.ADMIN, User.is_approved.is_(False)),
+        ),
+        (
+            "umbrella hierarchy",
+            "ix_blocks_parent_umbrella_created",
+            select(Block.id, Zone.id)
+            .outerjoin(Zone, Zone.parent_block_id == Block.id)
+            .where(Block.parent_umbrella_id == 1),
+        ),
+        (
+            "zones of blocks",
+            "ix_zones_parent_block_created",
+            select(Zone.id, Zone.name).where(Zone.parent_block_id.in_(block_ids)).order_by(Zone.created_at, Zone.id),
+        ),
+        (
+            "members of blocks (semi-join)",
+            "ix_member_block_associations_block_member",
+            select(MemberBlockAssociation.member_id).where(MemberBlockAssociation.block_id.in_(block_ids)),
+        ),
+        (
+            "members page (keyset)",
+            "ix_members_registered_at_id",
+            select(Member.id, Member.full_name, Member.bank_id, Member.registered_at)
+            .where(tuple_(Member.registered_at, Member.id) > tuple_(datetime(2024, 12, 1), 100))
+            .order_by(Member.registered_at, Member.id)
+            .limit(101),
+        ),
+        (
+            "member in umbrella",
+            # The unique constraint's index; SQLite names it automatically
+            ("_member_block_uc", "sqlite_autoindex_member_block_associations_1"),
+            select(exists().where(
+                MemberBlockAssociation.member_id == 1,
+                MemberBlockAssociation.block_id == Block.id,
+                Block.parent_umbrella_id == 1
+            )),
+        ),
+        (
+            "member search by phone",
+            "ix_member_block_associations_phone_key",
+            select(MemberBlockAssociation.member_id)
+            .where(MemberBlockAssociation.phone_key == "700000001", MemberBlockAssociation.block_id.in_(block_ids)),
+        ),
+        (
+            "duplicate check at add-member (ID or phone)",
+            "ix_member_block_associations_id_key",
+            select(MemberBlockAssociation.member_id, Member.full_name)
+            .join(Member, Member.id == MemberBlockAssociation.member_id)
+            .where(or_(MemberBlockAssociation.id_key == "id0000001", MemberBlockAssociation.phone_key == "700000001")),
+        ),
+        (
+            "zone members",
+            "ix_member_block_associations_zone_id",
+            select(MemberBlockAssociation.id).where(MemberBlockAssociation.zone_id == 1),
+        ),
+        (
+            "meeting contributions",
+            "ix_contributions_meeting_payer_amount",
+            select(Contribution.payer_id, Contribution.amount_minor).where(Contribution.meeting_id == 1),
+        ),
+        (
+            "block meetings by date",
+            "ix_meetings_block_date",
+            select(Meeting.id, Meeting.meeting_date)
+            .where(Meeting.block_id == first_block, Meeting.meeting_date >= datetime(2025, 3, 1))
+            .order_by(Meeting.meeting_date, Meeting.id),
+        ),
+        (
+            "member contribution history",
+            "ix_contributions_payer_date",
+            select(Contribution.id, Contribution.amount_minor).where(Contribution.payer_id == 1).order_by(Contribution.date),
+        ),
+        (
+            "block ledger export (date range)",
+            "ix_contributions_block_date",
+            select(Contribution.id)
+            .where(Contribution.block_id == first_block, Contribution.date >= datetime(2025, 3, 1)),
+        ),
+        (
+            "batch summary",
+            "ix_contributions_batch_id",
+            select(Contribution.id).where(Contribution.batch_id == 1),
+        ),
+    ]
+
+
+async def explain(conn, stmt) -> list[str]:
+    sql = str(stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+    if conn.dialect.name == "sqlite":
+        result = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")
+        return [row[-1] for row in result]
+    result = await conn.exec_driver_sql(f"EXPLAIN {sql}")
+    return [row[0] for row in result]
+
+
+async def main():
+    spec = SeedSpec(
+        umbrellas=args.umbrellas,
+        blocks=args.blocks,
+        zones=args.zones,
+        members=args.members,
+        meetings=args.meetings
+    )
+    print(f"Seeding {engine.url.render_as_string(hide_password=True)} ...")
+    data = await seed(spec)
+    print(", ".join(f"{table}: {rows}" for table, rows in data.rows.items()))
+
+    results = {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "dialect": engine.dialect.name,
+        "seed": spec.__dict__,
+        "rows": data.rows,
+        "plans": {},
+    }
+
+    async with engine.connect() as conn:
+        # Planner statistics, as a long-running database would have
+        await conn.execute(text("ANALYZE"))
+        result = await conn.execute(select(Block.id).where(Block.parent_umbrella_id == 1).order_by(Block.id))
+        block_ids = list(result.scalars())
+
+        for name, index, stmt in access_paths(block_ids):
+            names = (index,) if isinstance(index, str) else index
+            plan = await explain(conn, stmt)
+            uses_index = any(candidate in line for candidate in names for line in plan)
+            results["plans"][name] = {"expected_index": names[0], "uses_index": uses_index, "plan": plan}
+
+            print(f"\n[{'ok' if uses_index else 'MISSING'}] {name} (expects {names[0]})")
+            for line in plan:
+                print(f"    {line}")
+
+    await engine.dispose()
+
+    missing = [name for name, plan in results["plans"].items() if not plan["uses_index"]]
+    print(f"\n{len(results['plans']) - len(missing)}/{len(results['plans'])} access paths use their index")
+
+    output = args.output or RESULTS_DIR / f"plans-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"Results written to {output}")
+    if missing:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
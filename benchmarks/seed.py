@@ -0,0 +1,176 @@
+"""
+Synthetic data for the benchmarks: umbrellas, each with one approved admin,
+blocks, zones, members, weekly meetings and one contribution per member per
+meeting. Rows are written with multi-row INSERTs and explicit ids, so a
+seed of a few hundred thousand rows takes seconds.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from sqlalchemy import insert, text
+from app.database import Base, engine, async_session
+from app.models import (
+    Bank, Block, Contribution, Meeting, Member, MemberBlockAssociation, SchemaMigration, Umbrella, User,
+    UserRole, Zone
+)
+from app.migrations import MIGRATIONS
+from app.contributions.rollups import rebuild_rollups
+from app.utils import pwd_context
+
+ADMIN_PASSWORD = "bench-password"
+
+# Rows per multi-row INSERT
+SEED_BATCH_SIZE = 5000
+
+# Member names are drawn from these, so name searches match realistic numbers of rows
+FIRST_NAMES = (
+    "Achieng", "Amina", "Brian", "Chebet", "Daniel", "Esther", "Faith", "George", "Hassan", "Irene",
+    "James", "Joseph", "Kevin", "Lucy", "Mary", "Njeri", "Otieno", "Peter", "Wanjiru", "Zawadi",
+)
+LAST_NAMES = (
+    "Akinyi", "Barasa", "Cheruiyot", "Kamau", "Kariuki", "Kiprop", "Mutua", "Muthoni", "Mwangi", "Njoroge",
+    "Nyambura", "Ochieng", "Odhiambo", "Omondi", "Onyango", "Too", "Wafula", "Wambui", "Wekesa", "Wanyama",
+)
+
+
+def member_name(member_id: int) -> str:
+    first = FIRST_NAMES[member_id % len(FIRST_NAMES)]
+    last = LAST_NAMES[(member_id // len(FIRST_NAMES)) % len(LAST_NAMES)]
+    return f"{first} {last} {member_id}"
+
+
+@dataclass
+class SeedSpec:
+    umbrellas: int = 2
+    blocks: int = 5         # per umbrella
+    zones: int = 4          # per block
+    members: int = 50       # per zone
+    meetings: int = 12      # per block, one a week
+
+
+@dataclass
+class SeededData:
+    admin_emails: list[str] = field(default_factory=list)
+    zone_ids: dict[str, list[int]] = field(default_factory=dict)     # admin email -> zones
+    member_ids: dict[str, list[int]] = field(default_factory=dict)   # admin email -> members
+    rows: dict[str, int] = field(default_factory=dict)               # table -> rows written
+
+
+async def _insert(conn, model, rows: list[dict]):
+    for start in range(0, len(rows), SEED_BATCH_SIZE):
+        await conn.execute(insert(model), rows[start:start + SEED_BATCH_SIZE])
+
+
+async def seed(spec: SeedSpec) -> SeededData:
+    """Drop and recreate every table, mark the migrations applied, then fill them according to `spec`."""
+    data = SeededData()
+    password = pwd_context.hash(ADMIN_PASSWORD)
+    first_meeting = datetime(2025, 1, 6)
+
+    users, umbrellas, blocks, zones, members, associations, meetings, contributions = ([] for _ in range(8))
+    block_id = zone_id = member_id = meeting_id = contribution_id = 0
+
+    for u in range(1, spec.umbrellas + 1):
+        email = f"admin{u}@bench.example.com"
+        data.admin_emails.append(email)
+        data.zone_ids[email] = []
+        data.member_ids[email] = []
+        users.append({
+            "id": u,
+            "full_name": f"Admin {u}",
+            "email": email,
+            "phone_number": f"+2547{u:08d}",
+            "password": password,
+            "role": UserRole.ADMIN,
+            "is_active": True,
+            "is_approved": True,
+        })
+        umbrellas.append({"id": u, "name": f"Umbrella {u}", "location": "Nairobi", "admin_id": u})
+
+        for _ in range(spec.blocks):
+            block_id += 1
+            blocks.append({"id": block_id, "name": f"Block {block_id}", "parent_umbrella_id": u})
+            block_members = []
+
+            for _ in range(spec.zones):
+                zone_id += 1
+                zones.append({"id": zone_id, "name": f"Zone {zone_id}", "parent_block_id": block_id})
+                data.zone_ids[email].append(zone_id)
+
+                for _ in range(spec.members):
+                    member_id += 1
+                    members.append({
+                        "id": member_id,
+                        "full_name": member_name(member_id),
+                        "bank_id": 1,
+                        "registered_at": first_meeting - timedelta(days=30, seconds=member_id),
+                    })
+                    associations.append({
+                        "member_id": member_id,
+                        "block_id": block_id,
+                        "zone_id": zone_id,
+                        "phone_number": f"07{member_id:08d}",
+                        "id_number": f"ID{member_id:08d}",
+                        "acc_number": f"AC{member_id:08d}",
+                    })
+                    block_members.append(member_id)
+                    data.member_ids[email].append(member_id)
+
+            for week in range(spec.meetings):
+                meeting_id += 1
+                meeting_date = first_meeting + timedelta(weeks=week)
+                host_id = block_members[week % len(block_members)] if block_members else None
+                if host_id is None:
+                    continue
+                meetings.append({
+                    "id": meeting_id,
+                    "meeting_date": meeting_date,
+                    "block_id": block_id,
+                    "host_id": host_id,
+                })
+                for payer_id in block_members:
+                    contribution_id += 1
+                    contributions.append({
+                        "id": contribution_id,
+                        "amount_minor": 50000 + (payer_id % 7) * 1000,
+                        "date": meeting_date,
+                        "meeting_id": meeting_id,
+                        "payer_id": payer_id,
+                        "block_id": block_id,
+                        "bank_id": 1,
+                    })
+
+    tables = [
+        (Bank, [{"id": 1, "name": "Bench Bank", "paybill_no": "000000"}]),
+        (User, users),
+        (Umbrella, umbrellas),
+        (Block, blocks),
+        (Zone, zones),
+        (Member, members),
+        (MemberBlockAssociation, associations),
+        (Meeting, meetings),
+        (Contribution, contributions),
+    ]
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        # create_all has built the current schema, so every migration counts as applied
+        await conn.execute(insert(SchemaMigration), [{"name": name} for name, _ in MIGRATIONS])
+        for model, rows in tables:
+            await _insert(conn, model, rows)
+            data.rows[model.__tablename__] = len(rows)
+
+        # Explicit ids leave PostgreSQL sequences behind, so move them past the seeded rows
+        if conn.dialect.name == "postgresql":
+            for model, rows in tables:
+                if rows:
+                    table = model.__tablename__
+                    await conn.execute(text(
+                        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT max(id) FROM {table}))"
+                    ))
+
+    async with async_session() as db:
+        await rebuild_rollups(db)
+        await db.commit()
+
+    return data